@@ -0,0 +1,274 @@
+"""
+CodeGenerator・EntityGeneratorのベンチマークを実行し、結果をJSONで保存する
+
+使い方:
+    PYTHONPATH=. python -m benchmarks.run --output benchmarks/results/latest.json \\
+        --baseline benchmarks/baseline.json
+
+notes:
+    * 各シナリオをrepeat回実行し、Profilerで計測したフェーズごとの最小時間を記録する
+    * ピークメモリはtracemallocを有効にした別の1回の実行で計測する
+    * --baselineを指定した場合、追跡対象の指標がthresholdを超えて悪化していれば終了コード1を返す
+    * ベースラインは計測したマシンに依存するため、環境を変えた場合は--update-baselineで更新する
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from benchmarks.synthetic import generate_openapi_fixture, write_ddl
+from src.code_generator import CodeGenerator
+from src.entity_generator import EntityGenerator
+from src.loader import clear_document_cache
+from src.profiling import Profiler
+
+MODEL_PARAMETERS = ["--use-union-operator", "--use-double-quotes"]
+
+SCENARIOS: dict[str, dict[str, Any]] = {
+    "models_small": {
+        "kind": "models",
+        "schemas": 20,
+        "ref_depth": 2,
+        "fan_out": 2,
+        "include_models": 10,
+    },
+    "models_deep_refs": {
+        "kind": "models",
+        "schemas": 20,
+        "ref_depth": 6,
+        "fan_out": 2,
+        "include_models": 0,
+    },
+    "models_wide": {
+        "kind": "models",
+        "schemas": 150,
+        "ref_depth": 1,
+        "fan_out": 4,
+        "include_models": 50,
+    },
+    "entities_sqlite": {
+        "kind": "entities",
+        "tables": 200,
+        "columns": 20,
+        "dialect": "sqlite",
+    },
+    "entities_mysql": {
+        "kind": "entities",
+        "tables": 200,
+        "columns": 20,
+        "dialect": "mysql",
+    },
+    "entities_postgres_wide": {
+        "kind": "entities",
+        "tables": 20,
+        "columns": 200,
+        "dialect": "postgres",
+    },
+    "entities_mysql_dump": {
+        "kind": "entities",
+        "tables": 50,
+        "columns": 10,
+        "rows": 20000,
+        "dialect": "mysql",
+    },
+}
+
+# 回帰判定の対象とする指標
+TRACKED_METRICS = ("time.total", "peak_memory_mb")
+DEFAULT_THRESHOLD = 0.25
+# 計測誤差とみなす絶対差(これ以下の悪化は回帰としない)
+ABSOLUTE_TOLERANCE = {"time": 0.05, "peak_memory_mb": 1.0}
+
+
+def _reset_peak_memory():
+    """
+    入力の生成に使ったメモリをピークメモリに含めないよう、計測中であればピークをリセットする
+    """
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def _run_models(work_dir: str, settings: dict[str, Any]) -> dict[str, float]:
+    spec, include_dir = generate_openapi_fixture(
+        os.path.join(work_dir, "input"),
+        schemas=settings["schemas"],
+        ref_depth=settings["ref_depth"],
+        fan_out=settings["fan_out"],
+        include_models=settings["include_models"],
+    )
+    output_dir = os.path.join(work_dir, "output")
+    _reset_peak_memory()
+    clear_document_cache()
+
+    profiler = Profiler()
+    CodeGenerator(
+        spec,
+        output_dir,
+        MODEL_PARAMETERS,
+        include_dir,
+        engine="inprocess",
+        profiler=profiler,
+    ).execute()
+    return profiler.report()["phases"]
+
+
+def _run_entities(work_dir: str, settings: dict[str, Any]) -> dict[str, float]:
+    sql_file = write_ddl(
+        os.path.join(work_dir, "input"),
+        tables=settings["tables"],
+        columns=settings["columns"],
+        dialect=settings["dialect"],
+        rows=settings.get("rows", 0),
+    )
+    output_dir = os.path.join(work_dir, "output")
+    _reset_peak_memory()
+
+    profiler = Profiler()
+    EntityGenerator(
+        sql_file,
+        output_dir,
+        settings["dialect"],
+        profiler=profiler,
+        parse_workers=None,
+        render_workers=None,
+    ).execute()
+    return profiler.report()["phases"]
+
+
+RUNNERS: dict[str, Callable[[str, dict[str, Any]], dict[str, float]]] = {
+    "models": _run_models,
+    "entities": _run_entities,
+}
+
+
+def run_scenario(settings: dict[str, Any], repeat: int = 3) -> dict[str, float]:
+    """
+    1シナリオを計測し、指標名 → 値 の辞書を返す
+    """
+    runner = RUNNERS[settings["kind"]]
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as work_dir:
+            gc.collect()
+            phases = runner(work_dir, settings)
+        phases["total"] = sum(phases.values())
+        for name, elapsed in phases.items():
+            key = f"time.{name}"
+            best[key] = min(best.get(key, elapsed), elapsed)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            runner(work_dir, settings)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    best["peak_memory_mb"] = peak / (1024 * 1024)
+    return best
+
+
+def run_benchmarks(names: list[str] | None = None, repeat: int = 3) -> dict[str, Any]:
+    """
+    シナリオを実行し、JSONに保存する形式の結果を返す
+    """
+    results: dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": repeat,
+        },
+        "scenarios": {},
+    }
+    # datamodel-code-generatorなどのimport時間を最初のシナリオに含めないよう事前にimportする
+    from src.codegen_engine import _import_cli
+
+    _import_cli()
+
+    for name in names or list(SCENARIOS):
+        settings = SCENARIOS[name]
+        metrics = run_scenario(settings, repeat)
+        results["scenarios"][name] = {"settings": settings, "metrics": metrics}
+        print(
+            f"{name}: "
+            + ", ".join(f"{key}={value:.3f}" for key, value in metrics.items()),
+            file=sys.stderr,
+        )
+    return results
+
+
+def find_regressions(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """
+    ベースラインと比べて、追跡対象の指標がthreshold(比率)を超えて悪化したものを返す
+    """
+    regressions: list[str] = []
+    for name, scenario in results["scenarios"].items():
+        baseline_scenario = baseline.get("scenarios", {}).get(name)
+        if not baseline_scenario:
+            continue
+        for metric in TRACKED_METRICS:
+            current = scenario["metrics"].get(metric)
+            previous = baseline_scenario["metrics"].get(metric)
+            if current is None or previous is None:
+                continue
+            tolerance = ABSOLUTE_TOLERANCE[metric.split(".")[0]]
+            if current > previous * (1 + threshold) and current - previous > tolerance:
+                regressions.append(
+                    f"{name} {metric}: {previous:.3f} -> {current:.3f} "
+                    f"(+{(current / previous - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run code generation benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results to --baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenario, args.repeat)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
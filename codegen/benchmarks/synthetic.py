@@ -0,0 +1,214 @@
+"""
+ベンチマーク用の合成入力(OpenAPI仕様・DDL)を生成する
+"""
+
+import os
+from pathlib import Path
+
+import yaml
+
+PROPERTY_TYPES = [
+    {"type": "string"},
+    {"type": "integer"},
+    {"type": "number"},
+    {"type": "boolean"},
+    {"type": "string", "format": "date-time"},
+]
+
+COLUMN_TYPES = [
+    "VARCHAR(100)",
+    "INT",
+    "TEXT",
+    "BOOLEAN",
+    "FLOAT",
+    "DATE",
+    "TIMESTAMP",
+]
+
+DIALECTS = ("sqlite", "mysql", "postgres")
+
+# sqlglotでMySQLのTIMESTAMPはTIMESTAMPTZとして解釈されるため、方言ごとに日時型を変える
+DATETIME_TYPES = {"sqlite": "TIMESTAMP", "mysql": "DATETIME", "postgres": "TIMESTAMP"}
+
+# generate_ddlで1つのINSERT文にまとめるデータ行の数
+ROWS_PER_INSERT = 1000
+
+# 1階層あたりの参照先ファイル数の上限(fan_out ** depth の爆発を防ぐ)
+MAX_FILES_PER_LEVEL = 256
+
+
+def _properties(prefix: str, count: int) -> dict:
+    return {
+        f"{prefix}_field_{i}": dict(PROPERTY_TYPES[i % len(PROPERTY_TYPES)])
+        for i in range(count)
+    }
+
+
+def _dump(path: Path, document: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(document, f, sort_keys=False)
+
+
+def _level_size(level: int, fan_out: int) -> int:
+    return min(max(fan_out, 1) ** level, MAX_FILES_PER_LEVEL)
+
+
+def generate_openapi_fixture(
+    directory: str | Path,
+    schemas: int = 50,
+    ref_depth: int = 2,
+    fan_out: int = 2,
+    include_models: int = 0,
+    properties: int = 5,
+) -> tuple[str, str | None]:
+    """
+    合成したopenapiファイルと外部スキーマファイルを作成し、(openapiファイル, include_models_dir)を返す
+
+    notes:
+        * components.schemasにschemas個のスキーマを作成し、各スキーマは外部ファイルの
+        スキーマをfan_out個ずつ$refで参照する。参照はref_depth階層まで続く
+        * include_models > 0 の場合、include_models_dirにその数のスキーマファイルを作成する
+        * 同じ引数に対しては常に同じ内容を生成する
+    """
+    directory = Path(directory)
+    refs_dir = directory / "refs"
+
+    def ref_to(level: int, index: int, from_level: int) -> str:
+        prefix = "./" if from_level > 0 else "./refs/"
+        return f"{prefix}Level{level}Item{index}.yaml"
+
+    for level in range(1, ref_depth + 1):
+        for index in range(_level_size(level, fan_out)):
+            schema: dict = {
+                "type": "object",
+                "properties": _properties(f"l{level}_{index}", properties),
+            }
+            if level < ref_depth:
+                size = _level_size(level + 1, fan_out)
+                for j in range(fan_out):
+                    target = (index * fan_out + j) % size
+                    schema["properties"][f"child_{j}"] = {
+                        "$ref": ref_to(level + 1, target, level)
+                    }
+            _dump(refs_dir / f"Level{level}Item{index}.yaml", schema)
+
+    components: dict = {}
+    for index in range(schemas):
+        schema = {
+            "type": "object",
+            "required": [f"model{index}_field_0"],
+            "properties": _properties(f"model{index}", properties),
+        }
+        if ref_depth > 0:
+            size = _level_size(1, fan_out)
+            for j in range(fan_out):
+                schema["properties"][f"ref_{j}"] = {
+                    "$ref": ref_to(1, (index * fan_out + j) % size, 0)
+                }
+        if index > 0:
+            schema["properties"]["previous"] = {
+                "$ref": f"#/components/schemas/Model{index - 1}"
+            }
+        components[f"Model{index}"] = schema
+
+    spec = {
+        "openapi": "3.0.0",
+        "info": {"title": "Synthetic API", "version": "1.0.0"},
+        "paths": {
+            "/models/0": {
+                "get": {
+                    "responses": {
+                        "200": {
+                            "description": "OK",
+                            "content": {
+                                "application/json": {
+                                    "schema": {"$ref": "#/components/schemas/Model0"}
+                                }
+                            },
+                        }
+                    }
+                }
+            }
+        },
+        "components": {"schemas": components},
+    }
+    spec_path = directory / "openapi.yaml"
+    _dump(spec_path, spec)
+
+    include_dir: str | None = None
+    if include_models > 0:
+        include_path = directory / "include"
+        for index in range(include_models):
+            schema = {
+                "type": "object",
+                "properties": _properties(f"shared{index}", properties),
+            }
+            if index > 0:
+                schema["properties"]["previous"] = {
+                    "$ref": f"./SharedModel{index - 1}.yaml"
+                }
+            _dump(include_path / f"SharedModel{index}.yaml", schema)
+        include_dir = str(include_path)
+
+    return str(spec_path), include_dir
+
+
+def generate_ddl(
+    tables: int = 50, columns: int = 10, dialect: str = "sqlite", rows: int = 0
+) -> str:
+    """
+    tables個のテーブルを持つCREATE TABLE文を生成する
+
+    notes:
+        * 各テーブルは主キー(id)とcolumns個のカラムを持ち、型・NOT NULL・UNIQUE・DEFAULTを
+        順に割り当てる
+        * rowsを指定した場合、ダンプファイルのように各テーブルのrows行分のINSERT文を続ける
+        (値には引用符・セミコロンを含める)
+    """
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unsupported dialect: {dialect}")
+
+    statements: list[str] = []
+    for table in range(tables):
+        lines = ["    id INT PRIMARY KEY"]
+        for index in range(columns):
+            column_type = COLUMN_TYPES[index % len(COLUMN_TYPES)]
+            if column_type == "TIMESTAMP":
+                column_type = DATETIME_TYPES[dialect]
+            line = f"    column_{index} {column_type}"
+            if index % 3 == 0:
+                line += " NOT NULL"
+            if index % 7 == 1:
+                line += " UNIQUE"
+            if column_type == DATETIME_TYPES[dialect]:
+                line += " DEFAULT CURRENT_TIMESTAMP"
+            lines.append(line)
+        statements.append(
+            f"CREATE TABLE table_{table} (\n" + ",\n".join(lines) + "\n);"
+        )
+        for start in range(0, rows, ROWS_PER_INSERT):
+            values = ",".join(
+                f"({row}, 'row {row}; it''s (\"quoted\")')"
+                for row in range(start, min(start + ROWS_PER_INSERT, rows))
+            )
+            statements.append(
+                f"INSERT INTO table_{table} (id, column_0) VALUES {values};"
+            )
+    return "\n\n".join(statements) + "\n"
+
+
+def write_ddl(
+    directory: str | Path,
+    tables: int = 50,
+    columns: int = 10,
+    dialect: str = "sqlite",
+    rows: int = 0,
+) -> str:
+    """
+    generate_ddlの結果をファイルに書き出し、そのパスを返す
+    """
+    path = Path(directory) / f"schema_{dialect}.sql"
+    os.makedirs(path.parent, exist_ok=True)
+    path.write_text(generate_ddl(tables, columns, dialect, rows), encoding="utf-8")
+    return str(path)
@@ -11,6 +11,13 @@ def test(session):
     session.run("uv", "run", "--dev", "pytest", *args)
 
 
+@nox.session(venv_backend="uv", python=["3.12"], tags=["slow"])
+def test_slow(session):
+    session.run("uv", "sync", "--dev")
+    session.env["PYTHONPATH"] = os.path.abspath(".")
+    session.run("uv", "run", "--dev", "pytest", "-m", "slow", "tests")
+
+
 @nox.session(venv_backend="uv", python=["3.12"], tags=["coverage"])
 def test_coverage(session):
     session.run("uv", "sync", "--dev")
@@ -18,3 +25,22 @@ def test_coverage(session):
     session.run(
         "uv", "run", "--dev", "pytest", "--cov=src", "--cov-report=json:coverage.json"
     )
+
+
+@nox.session(venv_backend="uv", python=["3.12"], tags=["benchmark"])
+def benchmark(session):
+    session.run("uv", "sync", "--dev")
+    session.env["PYTHONPATH"] = os.path.abspath(".")
+    session.run(
+        "uv",
+        "run",
+        "--dev",
+        "python",
+        "-m",
+        "benchmarks.run",
+        "--output",
+        "benchmarks/results/latest.json",
+        "--baseline",
+        "benchmarks/baseline.json",
+        *session.posargs,
+    )
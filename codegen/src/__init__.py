@@ -1,4 +1,33 @@
-from .code_generator import CodeGenerator
-from .entity_generator import EntityGenerator
+# 生成器はsqlalchemy・sqlglot・jinja2・yamlなどをimportするため、
+# 初回アクセス時に定義しているモジュールだけをimportする(PEP 562)
+from __future__ import annotations
+
+import importlib
+
+# typingのimportも起動時間に含まれるため、typing.TYPE_CHECKINGの代わりに定義する
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any
+
+    from .code_generator import CodeGenerator
+    from .entity_generator import EntityGenerator
 
 __all__ = ["CodeGenerator", "EntityGenerator"]
+
+_MODULES: dict[str, str] = {
+    "CodeGenerator": "code_generator",
+    "EntityGenerator": "entity_generator",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
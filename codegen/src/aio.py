@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+from functools import partial
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+async def run_cancellable(func: Callable[..., T]) -> T:
+    """
+    funcをスレッドで実行し、イベントループをブロックせずに結果を待つ
+
+    notes:
+        * funcにはキーワード引数cancelled(threading.Event)を渡す。funcはこれを確認し、
+        setされていれば処理を中止してconcurrent.futures.CancelledErrorを送出すること
+        * awaitしているタスクがキャンセルされた場合はcancelledをsetし、funcが終わるのを
+        待ってからasyncio.CancelledErrorを送出する(中途半端な出力を残さないため)
+    """
+    cancelled = threading.Event()
+    future = asyncio.get_running_loop().run_in_executor(
+        None, partial(func, cancelled=cancelled)
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancelled.set()
+        # funcが送出したCancelledError(Exceptionのサブクラス)を含め、結果は破棄する
+        with contextlib.suppress(Exception):
+            await future
+        raise
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import re
+
+BACKEND_PYDANTIC = "pydantic"
+BACKEND_DATACLASS = "dataclass"
+BACKEND_MSGSPEC = "msgspec"
+
+OUTPUT_MODEL_TYPE_OPTION = "--output-model-type"
+
+# 生成されたクラスのdataclassデコレータ(datamodel-codegenは1行で出力する)
+_DATACLASS_DECORATOR_PATTERN = re.compile(
+    r"^@(?P<name>(?:dataclasses\.)?dataclass)(?:\((?P<arguments>.*)\))?[ \t]*$",
+    re.MULTILINE,
+)
+
+
+class ModelBackend:
+    """
+    分割して出力するモデルクラスの種類ごとの処理
+
+    notes:
+        * output_model_type: datamodel-codegenの--output-model-type(Noneの場合はparametersのまま)
+        * 循環参照している依存先は、クラス定義後にimportしてから
+        rebuild_statementで型ヒントを解決する
+    """
+
+    name = BACKEND_PYDANTIC
+    output_model_type: str | None = None
+
+    def parameters(self, parameters: list[str]) -> list[str]:
+        """
+        datamodel-codegenに渡すparametersを返す
+        """
+        if self.output_model_type is None:
+            return parameters
+
+        specified = _option_value(parameters, OUTPUT_MODEL_TYPE_OPTION)
+        if specified is None:
+            return [*parameters, OUTPUT_MODEL_TYPE_OPTION, self.output_model_type]
+        if specified != self.output_model_type:
+            raise ValueError(
+                f"{OUTPUT_MODEL_TYPE_OPTION} {specified} "
+                f"conflicts with backend: {self.name}"
+            )
+        return parameters
+
+    def render_class(self, class_source_code: str) -> str:
+        """
+        分割したクラスのソースコードを出力する形に変換する
+        """
+        return class_source_code
+
+    def rebuild_statement(self, class_name: str) -> str | None:
+        """
+        循環参照している依存先をimportした後に、型ヒントを解決する文を返す
+        """
+        return f"{class_name}.model_rebuild()"
+
+
+class DataclassBackend(ModelBackend):
+    """
+    @dataclass(slots=True)のクラスを出力する
+
+    notes:
+        * 型ヒントはクラス定義時に評価されないため、model_rebuildに相当する処理は不要
+        (typing.get_type_hintsで解決できるよう、循環参照している依存先もimportはする)
+    """
+
+    name = BACKEND_DATACLASS
+    output_model_type = "dataclasses.dataclass"
+
+    def render_class(self, class_source_code: str) -> str:
+        return _DATACLASS_DECORATOR_PATTERN.sub(_add_slots, class_source_code, count=1)
+
+    def rebuild_statement(self, class_name: str) -> str | None:
+        return None
+
+
+class MsgspecBackend(ModelBackend):
+    """
+    msgspec.Structのクラスを出力する
+
+    notes:
+        * msgspecは初回のエンコード・デコード時にモジュールの名前空間から型ヒントを解決するため、
+        model_rebuildに相当する処理は不要
+    """
+
+    name = BACKEND_MSGSPEC
+    output_model_type = "msgspec.Struct"
+
+    def rebuild_statement(self, class_name: str) -> str | None:
+        return None
+
+
+BACKENDS: dict[str, type[ModelBackend]] = {
+    BACKEND_PYDANTIC: ModelBackend,
+    BACKEND_DATACLASS: DataclassBackend,
+    BACKEND_MSGSPEC: MsgspecBackend,
+}
+
+
+def get_backend(name: str) -> ModelBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unsupported backend: {name}")
+    return BACKENDS[name]()
+
+
+def _option_value(parameters: list[str], option: str) -> str | None:
+    for index, parameter in enumerate(parameters):
+        if parameter == option and index + 1 < len(parameters):
+            return parameters[index + 1]
+        if parameter.startswith(f"{option}="):
+            return parameter.split("=", 1)[1]
+    return None
+
+
+def _add_slots(match: re.Match[str]) -> str:
+    arguments = match.group("arguments")
+    if arguments and re.search(r"\bslots\s*=", arguments):
+        return match.group(0)
+    arguments = f"{arguments}, slots=True" if arguments else "slots=True"
+    return f"@{match.group('name')}({arguments})"
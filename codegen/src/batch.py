@@ -0,0 +1,558 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from .backends import BACKEND_PYDANTIC
+from .cache import DEFAULT_CACHE_MAX_BYTES
+from .codegen_engine import ENGINE_INPROCESS, ENGINES, Engine
+
+R = TypeVar("R")
+
+SHARED_RESULT_NAME = "<shared>"
+
+
+class BatchJob:
+    """
+    バッチで生成する1仕様分の設定(CodeGeneratorの引数に対応)
+    """
+
+    openapi_file_path: str
+    output_dir: str
+    parameters: list[str]
+    include_models_dir: str | None
+    name: str
+    backend: str
+
+    def __init__(
+        self,
+        openapi_file_path: str,
+        output_dir: str,
+        parameters: list[str] | None = None,
+        include_models_dir: str | None = None,
+        name: str | None = None,
+        backend: str = BACKEND_PYDANTIC,
+    ):
+        self.openapi_file_path = openapi_file_path
+        self.output_dir = output_dir
+        self.parameters = list(parameters or [])
+        self.include_models_dir = include_models_dir
+        self.name = name or openapi_file_path
+        self.backend = backend
+
+    def __repr__(self) -> str:
+        return f"BatchJob(name={self.name}, openapi_file_path={self.openapi_file_path}, output_dir={self.output_dir})"
+
+
+class BatchResult:
+    """
+    1ジョブ分の実行結果。失敗した場合はerrorにエラーメッセージが入る
+    """
+
+    name: str
+    output_dir: str
+    elapsed: float
+    report: dict[str, list[str]] | None
+    error: str | None
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: str,
+        elapsed: float,
+        report: dict[str, list[str]] | None = None,
+        error: str | None = None,
+    ):
+        self.name = name
+        self.output_dir = output_dir
+        self.elapsed = elapsed
+        self.report = report
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "output_dir": self.output_dir,
+            "ok": self.ok,
+            "elapsed": self.elapsed,
+            "report": self.report,
+            "error": self.error,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"BatchResult(name={self.name}, ok={self.ok}, elapsed={self.elapsed:.3f})"
+        )
+
+
+class SharedModel:
+    """
+    共有パッケージへの出力候補となる1モデル(ワーカーから親プロセスに返す)
+
+    notes:
+        * dependenciesは、依存しているモデルのフィンガープリント
+        * contentは共有パッケージ向けにレンダリングした内容、reexportはジョブの出力先に
+        置く再exportファイルの(ファイル名, 内容)
+    """
+
+    name: str
+    fingerprint: str
+    dependencies: list[str]
+    file_name: str
+    content: str
+    reexport: tuple[str, str]
+
+    def __init__(
+        self,
+        name: str,
+        fingerprint: str,
+        dependencies: list[str],
+        file_name: str,
+        content: str,
+        reexport: tuple[str, str],
+    ):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.dependencies = dependencies
+        self.file_name = file_name
+        self.content = content
+        self.reexport = reexport
+
+    def __repr__(self) -> str:
+        return f"SharedModel(name={self.name}, fingerprint={self.fingerprint[:12]})"
+
+
+def load_manifest(manifest_path: str) -> list[BatchJob]:
+    """
+    マニフェスト(YAMLまたはJSON)からジョブ一覧を読み込む
+
+    notes:
+        * 形式は {"defaults": {...}, "jobs": [{"input", "output", "parameters",
+        "include_models_dir", "name", "backend"}, ...]}、またはジョブのリスト
+        * defaultsの値は各ジョブで未指定の項目に適用する
+        * 相対パスはマニフェストファイルのディレクトリを基準に解決する
+    """
+    from .loader import load_document
+
+    manifest = load_document(manifest_path)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("jobs"), list):
+        raise ValueError(f"Invalid batch manifest: {manifest_path}")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults") or {}
+
+    def resolve(path: str | None) -> str | None:
+        return os.path.join(base_dir, path) if path else None
+
+    jobs: list[BatchJob] = []
+    for entry in manifest["jobs"]:
+        settings = {**defaults, **entry}
+        if "input" not in settings or "output" not in settings:
+            raise ValueError(f"Batch job requires input and output: {entry}")
+        jobs.append(
+            BatchJob(
+                openapi_file_path=resolve(settings["input"]) or "",
+                output_dir=resolve(settings["output"]) or "",
+                parameters=settings.get("parameters"),
+                include_models_dir=resolve(settings.get("include_models_dir")),
+                name=settings.get("name") or settings["input"],
+                backend=settings.get("backend") or BACKEND_PYDANTIC,
+            )
+        )
+    return jobs
+
+
+def _shared_documents(jobs: list[BatchJob]) -> dict[str, tuple[int, int, Any]]:
+    """
+    複数のジョブから参照されるスキーマファイルを読み込み、ワーカーに渡す形で返す
+
+    notes:
+        * 参照されるファイルはscan_ref_files($refを正規表現で読み取る)で数え、
+        2つ以上のジョブが参照するファイルだけをパースする(それ以外はワーカーでパースする)
+        * 読み込めない・パースできないファイルは共有から外す(ワーカーでの実行時に
+        ジョブ単位のエラーとして報告される)
+    """
+    import yaml
+
+    from .loader import export_documents, load_document
+    from .ref_resolver import scan_ref_files
+
+    usage: Counter[str] = Counter()
+    for job in jobs:
+        try:
+            usage.update(scan_ref_files(job.openapi_file_path, job.include_models_dir))
+        except (OSError, ValueError, yaml.YAMLError):
+            continue
+
+    shared = [file for file, count in usage.items() if count > 1]
+    for file in shared:
+        try:
+            load_document(file)
+        except (OSError, ValueError, yaml.YAMLError):
+            continue
+    return export_documents(shared)
+
+
+def _format_error(e: BaseException) -> str:
+    if isinstance(e, SystemExit):
+        # datamodel-code-generatorは不正なパラメータに対してSystemExitを送出する
+        return f"datamodel-code-generator exited with status {e.code}"
+    return "".join(traceback.format_exception_only(e)).strip()
+
+
+def _init_worker(documents: dict[str, tuple[int, int, Any]]) -> None:
+    from .loader import seed_document_cache
+
+    seed_document_cache(documents)
+
+
+def run_job(
+    job: BatchJob,
+    engine: Engine = ENGINE_INPROCESS,
+    cache_dir: str | None = None,
+    cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+    delete_stale: bool = False,
+) -> BatchResult:
+    """
+    1ジョブを実行する。例外(datamodel-code-generatorのSystemExitを含む)は送出せず、
+    BatchResultのerrorとして返す
+    """
+    from .code_generator import CodeGenerator
+
+    started = time.perf_counter()
+    try:
+        generator = CodeGenerator(
+            openapi_file_path=job.openapi_file_path,
+            output_dir=job.output_dir,
+            parameters=job.parameters,
+            include_models_dir=job.include_models_dir,
+            engine=engine,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            backend=job.backend,
+        )
+        report = generator.execute(max_workers=1, delete_stale=delete_stale)
+    except (Exception, SystemExit) as e:
+        return BatchResult(
+            job.name,
+            job.output_dir,
+            time.perf_counter() - started,
+            error=_format_error(e),
+        )
+    return BatchResult(
+        job.name, job.output_dir, time.perf_counter() - started, report.to_dict()
+    )
+
+
+def render_job(
+    job: BatchJob, shared_dir: str, engine: Engine = ENGINE_INPROCESS
+) -> tuple[BatchResult, dict[str, str], list[SharedModel]]:
+    """
+    1ジョブの出力ファイルを書き込まずにレンダリングし、共有パッケージへの出力候補と共に返す。
+    例外は送出せず、BatchResultのerrorとして返す
+    """
+    from .code_generator import CodeGenerator
+
+    started = time.perf_counter()
+    try:
+        generator = CodeGenerator(
+            openapi_file_path=job.openapi_file_path,
+            output_dir=job.output_dir,
+            parameters=job.parameters,
+            include_models_dir=job.include_models_dir,
+            engine=engine,
+            backend=job.backend,
+        )
+        files = generator.render()
+        fingerprints = generator.model_fingerprints()
+        dependencies = generator.model_dependencies()
+        shared_files = generator.render_models(fingerprints, shared_dir)
+        models: list[SharedModel] = []
+        for name, fingerprint in fingerprints.items():
+            reexport = generator.render_reexport(name, shared_dir)
+            models.append(
+                SharedModel(
+                    name,
+                    fingerprint,
+                    [fingerprints[dependency] for dependency in dependencies[name]],
+                    reexport[0],
+                    shared_files[reexport[0]],
+                    reexport,
+                )
+            )
+    except (Exception, SystemExit) as e:
+        return (
+            BatchResult(
+                job.name,
+                job.output_dir,
+                time.perf_counter() - started,
+                error=_format_error(e),
+            ),
+            {},
+            [],
+        )
+    return (
+        BatchResult(job.name, job.output_dir, time.perf_counter() - started),
+        files,
+        models,
+    )
+
+
+def select_shared_models(job_models: list[list[SharedModel]]) -> set[str]:
+    """
+    共有パッケージに出力するモデルのフィンガープリントを返す
+
+    notes:
+        * 2つ以上のジョブで同じフィンガープリントになったモデルを共有する
+        * 同じファイル名で内容の異なるモデルがある場合は、先のジョブのものだけを共有する
+        * 依存先が共有されないモデルは共有しない(共有パッケージ内のimportが解決できないため)
+    """
+    usage: Counter[str] = Counter()
+    for models in job_models:
+        usage.update({model.fingerprint for model in models})
+
+    candidates: dict[str, SharedModel] = {}
+    owners: dict[str, str] = {}
+    for models in job_models:
+        for model in models:
+            if usage[model.fingerprint] < 2 or model.fingerprint in candidates:
+                continue
+            if owners.setdefault(model.file_name, model.fingerprint) != (
+                model.fingerprint
+            ):
+                continue
+            candidates[model.fingerprint] = model
+
+    shared = set(candidates)
+    changed = True
+    while changed:
+        changed = False
+        for fingerprint in list(shared):
+            if any(
+                dependency not in shared
+                for dependency in candidates[fingerprint].dependencies
+            ):
+                shared.discard(fingerprint)
+                changed = True
+    return shared
+
+
+def run_batch(
+    jobs: list[BatchJob],
+    max_workers: int | None = None,
+    engine: Engine = ENGINE_INPROCESS,
+    cache_dir: str | None = None,
+    cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+    delete_stale: bool = False,
+    shared_dir: str | None = None,
+) -> list[BatchResult]:
+    """
+    ジョブをプロセスプールで並列に実行し、ジョブの順に結果を返す
+
+    notes:
+        * 各ワーカーはdatamodel-code-generatorのimportを1回だけ行い、複数のジョブを処理する
+        * 複数のジョブが参照する共有スキーマは親プロセスで1回だけパースし、ワーカーに渡す
+        * 1つのジョブが失敗しても他のジョブは継続する
+        * max_workers=1の場合はプロセスプールを使わずに逐次実行する
+        * shared_dirを指定した場合、複数のジョブで同じになったモデル(クラスのソースコード・
+        import・依存先が同じもの、select_shared_modelsを参照)をshared_dirに1回だけ出力し、
+        各ジョブの出力先にはそれを再exportするファイルを出力する。ワーカーはレンダリングのみを
+        行い、書き込みは親プロセスで行う。共有パッケージの結果は最後の要素
+        (name=SHARED_RESULT_NAME)として返す。cache_dirは使用しない
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    if shared_dir is not None:
+        return _run_shared_batch(jobs, max_workers, engine, delete_stale, shared_dir)
+
+    run = partial(
+        run_job,
+        engine=engine,
+        cache_dir=cache_dir,
+        cache_max_bytes=cache_max_bytes,
+        delete_stale=delete_stale,
+    )
+    return _map_jobs(
+        run,
+        jobs,
+        max_workers,
+        lambda job, e: BatchResult(
+            job.name, job.output_dir, 0.0, error=_format_error(e)
+        ),
+    )
+
+
+def _run_shared_batch(
+    jobs: list[BatchJob],
+    max_workers: int | None,
+    engine: Engine,
+    delete_stale: bool,
+    shared_dir: str,
+) -> list[BatchResult]:
+    from .output import write_outputs
+
+    rendered = _map_jobs(
+        partial(render_job, shared_dir=shared_dir, engine=engine),
+        jobs,
+        max_workers,
+        lambda job, e: (
+            BatchResult(job.name, job.output_dir, 0.0, error=_format_error(e)),
+            {},
+            [],
+        ),
+    )
+    shared = select_shared_models([models for _, _, models in rendered])
+
+    # 再exportが参照する共有パッケージを先に書き出す
+    started = time.perf_counter()
+    shared_files = {
+        model.file_name: model.content
+        for _, _, models in rendered
+        for model in models
+        if model.fingerprint in shared
+    }
+    shared_report = write_outputs(shared_dir, shared_files, delete_stale)
+    shared_result = BatchResult(
+        SHARED_RESULT_NAME,
+        shared_dir,
+        time.perf_counter() - started,
+        shared_report.to_dict(),
+    )
+
+    results: list[BatchResult] = []
+    for result, files, models in rendered:
+        if not result.ok:
+            results.append(result)
+            continue
+        started = time.perf_counter()
+        files = dict(files)
+        files.update(model.reexport for model in models if model.fingerprint in shared)
+        try:
+            report = write_outputs(result.output_dir, files, delete_stale)
+        except Exception as e:
+            results.append(
+                BatchResult(
+                    result.name,
+                    result.output_dir,
+                    result.elapsed,
+                    error=_format_error(e),
+                )
+            )
+            continue
+        results.append(
+            BatchResult(
+                result.name,
+                result.output_dir,
+                result.elapsed + time.perf_counter() - started,
+                report.to_dict(),
+            )
+        )
+    results.append(shared_result)
+    return results
+
+
+def _map_jobs(
+    run: Callable[[BatchJob], R],
+    jobs: list[BatchJob],
+    max_workers: int | None,
+    failed: Callable[[BatchJob, BaseException], R],
+) -> list[R]:
+    """
+    ジョブをプロセスプールでrunに渡し、ジョブの順に結果を返す
+
+    notes:
+        * ワーカーが異常終了した場合や、runが例外(SystemExitを含む)を送出した場合、
+        そのジョブの結果はfailedで作成する
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        results: list[R] = []
+        for job in jobs:
+            try:
+                results.append(run(job))
+            except (Exception, SystemExit) as e:
+                results.append(failed(job, e))
+        return results
+
+    documents = _shared_documents(jobs)
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers or os.cpu_count() or 1, len(jobs)),
+        initializer=_init_worker,
+        initargs=(documents,),
+    ) as executor:
+        futures: list[Future[R]] = [executor.submit(run, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except (Exception, SystemExit) as e:
+                # BrokenProcessPool(ワーカーの異常終了)を含む
+                results.append(failed(job, e))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    バッチ生成のCLI。いずれかのジョブが失敗した場合は1を返す
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate pydantic models for many OpenAPI specs at once"
+    )
+    add_batch_arguments(parser)
+    return run_batch_command(parser.parse_args(argv))
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("manifest", help="batch manifest file (YAML or JSON)")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE_INPROCESS)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--delete-stale", action="store_true")
+    parser.add_argument(
+        "--shared-dir",
+        default=None,
+        help="write models identical across specs once into this package",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print results as JSON to stdout"
+    )
+
+
+def run_batch_command(args: argparse.Namespace) -> int:
+    results = run_batch(
+        load_manifest(args.manifest),
+        max_workers=args.workers,
+        engine=args.engine,
+        cache_dir=args.cache_dir,
+        delete_stale=args.delete_stale,
+        shared_dir=args.shared_dir,
+    )
+
+    if args.json:
+        json.dump([result.to_dict() for result in results], sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for result in results:
+            status = "ok" if result.ok else "FAILED"
+            print(f"[{status}] {result.name} ({result.elapsed:.2f}s)")
+            if result.error:
+                print(f"    {result.error}")
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
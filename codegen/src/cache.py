@@ -0,0 +1,332 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Iterable
+
+from .schema_ir import SCHEMA_IR_SUFFIX, SchemaIR, dumps_schema, loads_schema
+
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_ENTRY_SUFFIX = ".json"
+PARSE_CACHE_ENTRY_SUFFIX = ".parse.json"
+# jinja2のFileSystemBytecodeCacheが書き出すファイル(__jinja2_<hash>.cache)
+TEMPLATE_BYTECODE_PREFIX = "__jinja2_"
+TEMPLATE_BYTECODE_SUFFIX = ".cache"
+
+
+def tool_version(*distributions: str) -> str:
+    """
+    キャッシュキーに含めるツールのバージョン文字列を返す
+    """
+    versions = [f"cache-format={CACHE_FORMAT_VERSION}"]
+    for distribution in ("modelgen", *distributions):
+        try:
+            versions.append(f"{distribution}={version(distribution)}")
+        except PackageNotFoundError:
+            versions.append(f"{distribution}=unknown")
+    return ";".join(versions)
+
+
+def compute_cache_key(parts: Iterable[bytes | str]) -> str:
+    """
+    入力の内容からキャッシュキー(sha256)を計算する
+
+    notes:
+        * 各要素は長さ付きでハッシュするため、区切り位置が異なる入力は衝突しない
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_input_files(
+    files: Iterable[Path], base_dir: Path | None = None
+) -> list[bytes | str]:
+    """
+    キャッシュキー用に、ファイルのパスと内容を順序を固定して列挙する
+    """
+    parts: list[bytes | str] = []
+    for file in sorted(set(files)):
+        name = Path(os.path.relpath(file, base_dir)) if base_dir else file
+        parts.append(name.as_posix())
+        parts.append(file.read_bytes())
+    return parts
+
+
+def file_digest(path: str | Path) -> str:
+    """
+    ファイルの内容のsha256を、ファイル全体をメモリに載せずに計算する
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class _CacheIndex:
+    """
+    root_dir配下のキャッシュファイルのサイズを、最も使われていないものから順に保持する索引
+    """
+
+    entries: dict[str, int]
+    total_bytes: int
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.entries = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def scan(self, root_dir: Path) -> None:
+        """
+        root_dir配下を走査し、mtimeが古い順に索引を作り直す
+        """
+        found: list[tuple[float, str, int]] = []
+        for dirpath, _, file_names in os.walk(os.path.abspath(root_dir)):
+            for file_name in file_names:
+                if not _is_cache_file(file_name):
+                    continue
+                path = os.path.join(dirpath, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+
+        with self.lock:
+            self.entries = {path: size for _, path, size in sorted(found)}
+            self.total_bytes = sum(self.entries.values())
+
+    def add(self, path: str, size: int) -> None:
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(path, 0)
+            self.entries[path] = size
+
+    def touch(self, path: str) -> None:
+        with self.lock:
+            if path in self.entries:
+                self.entries[path] = self.entries.pop(path)
+
+    def evict(self, max_bytes: int) -> None:
+        with self.lock:
+            while self.total_bytes > max_bytes and self.entries:
+                path = next(iter(self.entries))
+                self.total_bytes -= self.entries.pop(path)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_indexes: dict[str, _CacheIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _open_index(root_dir: Path) -> _CacheIndex:
+    """
+    root_dirの索引を作り直して返す(同じroot_dirのキャッシュは同じ索引を共有する)
+    """
+    with _indexes_lock:
+        index = _indexes.setdefault(os.path.abspath(root_dir), _CacheIndex())
+    index.scan(root_dir)
+    return index
+
+
+class EntryCache:
+    """
+    1キー1ファイルのエントリをディスクに保存するキャッシュの基底クラス
+    (エントリの形式はサブクラスのget・putで決める)
+
+    notes:
+        * ヒット時にエントリのmtimeを更新する
+        * 書き込むたびに、root_dir(省略時はcache_dir)配下のキャッシュファイルの合計サイズが
+        max_bytesを超えていれば、最も使われていない順に削除する
+        * 合計サイズは、キャッシュを開いたときにroot_dirを1回だけ走査して作る索引
+        (同じroot_dirのキャッシュで共有)で管理し、書き込み・ヒット・削除のたびに更新する。
+        開いた後に他のプロセスやjinja2が書き出したファイルは、次に開くまで数えない
+        * cache_dirのサブディレクトリに置くキャッシュ(中間表現・パース結果)には
+        root_dir=cache_dirを指定し、テンプレートのバイトコードを含めて上限を共有する
+    """
+
+    entry_suffix = CACHE_ENTRY_SUFFIX
+
+    cache_dir: Path
+    root_dir: Path
+    max_bytes: int | None
+    _index: _CacheIndex | None
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+        root_dir: str | None = None,
+    ):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = Path(cache_dir)
+        self.root_dir = Path(root_dir or cache_dir)
+        self.max_bytes = max_bytes
+        self._index = None if max_bytes is None else _open_index(self.root_dir)
+
+    def _write_entry(self, key: str, data: bytes) -> None:
+        # 複数のワーカーで共有されるため、一時ファイルに書き出してからrenameする
+        fd, temporary_path = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=".tmp-", suffix=self.entry_suffix
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temporary_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        if self._index is not None:
+            self._index.add(os.path.abspath(self._entry_path(key)), len(data))
+
+    def _touch(self, entry_path: Path) -> None:
+        # LRUのため、最終利用時刻を更新
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return
+        if self._index is not None:
+            self._index.touch(os.path.abspath(entry_path))
+
+    def _entry_path(self, key: str) -> Path:
+        return Path(self.cache_dir, f"{key}{self.entry_suffix}")
+
+    def _evict(self) -> None:
+        """
+        root_dir配下の合計サイズがmax_bytes以下になるまで、最も使われていないファイルから削除する
+        """
+        if self._index is not None and self.max_bytes is not None:
+            self._index.evict(self.max_bytes)
+
+
+def _is_cache_file(file_name: str) -> bool:
+    """
+    キャッシュが書き出したファイルか(書き込み中の一時ファイル・それ以外のファイルは削除しない)
+    """
+    if file_name.startswith(".tmp-"):
+        return False
+    if file_name.startswith(TEMPLATE_BYTECODE_PREFIX):
+        return file_name.endswith(TEMPLATE_BYTECODE_SUFFIX)
+    return file_name.endswith(
+        (CACHE_ENTRY_SUFFIX, PARSE_CACHE_ENTRY_SUFFIX, SCHEMA_IR_SUFFIX)
+    )
+
+
+class GenerationCache(EntryCache):
+    """
+    生成結果(出力ファイル名 → 内容)を、入力のハッシュをキーとしてディスクに保存するキャッシュ
+    """
+
+    def get(self, key: str) -> dict[str, str] | None:
+        """
+        キャッシュされた出力ファイルを返す。存在しない場合はNone
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if entry.get("version") != CACHE_FORMAT_VERSION:
+            return None
+
+        self._touch(entry_path)
+        return entry["files"]
+
+    def put(self, key: str, files: dict[str, str]) -> None:
+        """
+        出力ファイルをキャッシュに保存し、上限を超えた分を削除する
+        """
+        entry = {"version": CACHE_FORMAT_VERSION, "files": files}
+        self._write_entry(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        self._evict()
+
+
+class ParseCache(EntryCache):
+    """
+    入力ファイルごとのパース結果を、ファイルの内容のハッシュをキーとして保存するキャッシュ
+
+    notes:
+        * 変更されていないファイルのパースをスキップし、追加・変更されたファイルだけをパースする
+        * 値はJSONで書き出せるもの(リスト・辞書・文字列・数値・None)に限る。
+        エントリはデータのみで、読み込み時にコードは実行されない(共有のキャッシュディレクトリでもよい)
+        * 読み込めないエントリはキャッシュミスとして扱う
+    """
+
+    entry_suffix = PARSE_CACHE_ENTRY_SUFFIX
+
+    def get(self, key: str) -> Any | None:
+        """
+        キャッシュされたパース結果を返す。存在しない場合はNone
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # 存在しない・壊れているエントリ
+            return None
+
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_FORMAT_VERSION:
+            return None
+
+        self._touch(entry_path)
+        return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        パース結果をキャッシュに保存し、上限を超えた分を削除する
+        """
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[tuple[str, Any]]) -> None:
+        """
+        複数のパース結果を保存し、最後に1回だけ上限を超えた分を削除する
+        """
+        for key, value in items:
+            entry = {"version": CACHE_FORMAT_VERSION, "value": value}
+            self._write_entry(
+                key, json.dumps(entry, ensure_ascii=False).encode("utf-8")
+            )
+        self._evict()
+
+
+class SchemaCache(EntryCache):
+    """
+    生成結果と同じキーで、スキーマの中間表現(SchemaIR)を保存するキャッシュ
+
+    notes:
+        * エントリはdump_schemaと同じ形式のファイルで、読み込めないものはキャッシュミスとして扱う
+    """
+
+    entry_suffix = SCHEMA_IR_SUFFIX
+
+    def get(self, key: str) -> SchemaIR | None:
+        """
+        キャッシュされた中間表現を返す。存在しない場合はNone
+        """
+        entry_path = self._entry_path(key)
+        try:
+            schema = loads_schema(entry_path.read_bytes())
+        except (OSError, ValueError):
+            return None
+
+        self._touch(entry_path)
+        return schema
+
+    def put(self, key: str, schema: SchemaIR) -> None:
+        """
+        中間表現をキャッシュに保存し、上限を超えた分を削除する
+        """
+        self._write_entry(key, dumps_schema(schema))
+        self._evict()
@@ -0,0 +1,239 @@
+"""
+modelgenコマンド
+
+使い方:
+    modelgen models openapi.yaml models/ -- --use-union-operator
+    modelgen entities schema.sql entities/ --db-type postgres
+    modelgen batch manifest.yaml -j 4
+
+notes:
+    * 起動を速くするため、このモジュールは標準ライブラリのargparseのみをimportする。
+    sqlalchemy・sqlglot・jinja2・yaml・datamodel-code-generatorは、実行するサブコマンドが
+    使う場合にだけimportする(modelgen --helpではいずれもimportしない)
+    * サブコマンドの引数は、サブコマンドが決まってから定義する
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+# typingのimportも起動時間に含まれるため、typing.TYPE_CHECKINGの代わりに定義する
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable
+
+    from .output import WriteReport
+    from .profiling import Profiler
+    from .schema_ir import SchemaIR
+
+COMMANDS = {
+    "models": "generate model classes from an OpenAPI spec, one file per class",
+    "entities": "generate SQLAlchemy entities from SQL DDL or migrations",
+    "batch": "generate models for many OpenAPI specs listed in a manifest",
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    modelgenのCLI。終了コードを返す
+    """
+    parser = argparse.ArgumentParser(
+        prog="modelgen",
+        description="Generate Python models from OpenAPI specs and SQL schemas",
+        epilog="commands:\n"
+        + "\n".join(f"  {name:<10}{help}" for name, help in COMMANDS.items())
+        + "\n\nrun 'modelgen <command> --help' for the options of each command",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    add_arguments, run = _COMMAND_HANDLERS[args.command]
+    command_parser = argparse.ArgumentParser(
+        prog=f"modelgen {args.command}", description=COMMANDS[args.command]
+    )
+    add_arguments(command_parser)
+    # "--"より後ろは、そのまま生成ツールに渡す引数(parameters)とする
+    arguments: list[str] = args.arguments
+    passthrough: list[str] = []
+    if "--" in arguments:
+        separator = arguments.index("--")
+        arguments, passthrough = arguments[:separator], arguments[separator + 1 :]
+    command_args = command_parser.parse_args(arguments)
+    if passthrough:
+        if not hasattr(command_args, "parameters"):
+            command_parser.error(f"unrecognized arguments: -- {' '.join(passthrough)}")
+        command_args.parameters = passthrough
+    try:
+        return run(command_args)
+    except (ValueError, FileNotFoundError) as e:
+        command_parser.error(str(e))
+    return 2  # pragma: no cover
+
+
+def add_models_arguments(parser: argparse.ArgumentParser) -> None:
+    from .backends import BACKEND_PYDANTIC, BACKENDS
+    from .codegen_engine import ENGINE_SUBPROCESS, ENGINES
+
+    parser.add_argument("input", help="OpenAPI spec (YAML or JSON)")
+    parser.add_argument("output", help="output directory")
+    parser.usage = "%(prog)s [options] input output [-- datamodel-codegen options]"
+    parser.set_defaults(parameters=[])
+    parser.add_argument("--include-models-dir", default=None)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE_SUBPROCESS)
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND_PYDANTIC)
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="write classes while reading the generated source",
+    )
+    _add_output_arguments(parser)
+
+
+def run_models_command(args: argparse.Namespace) -> int:
+    from .code_generator import CodeGenerator
+
+    profiler = _profiler(args)
+    generator = CodeGenerator(
+        openapi_file_path=args.input,
+        output_dir=args.output,
+        parameters=args.parameters,
+        include_models_dir=args.include_models_dir,
+        engine=args.engine,
+        cache_dir=args.cache_dir,
+        profiler=profiler,
+        streaming=args.streaming,
+        package_init=args.package_init,
+        backend=args.backend,
+    )
+    report = generator.execute(max_workers=args.workers, delete_stale=args.delete_stale)
+    return _finish(args, report, generator.schema_ir, profiler)
+
+
+def add_entities_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("input", help="SQL file, or directory of SQL files")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument(
+        "--db-type",
+        required=True,
+        help="SQL dialect of the input (sqlglot name: sqlite, postgres, mysql, ...)",
+    )
+    parser.add_argument(
+        "--migrations",
+        action="store_true",
+        help="replay the input directory as ordered migrations",
+    )
+    parser.add_argument(
+        "--relationship-loading",
+        default="raise",
+        help="lazy= of generated relationships, or 'none' to omit them",
+    )
+    parser.add_argument(
+        "--eager-defaults",
+        action="store_true",
+        help="fetch server-side defaults with RETURNING on insert",
+    )
+    parser.add_argument("--template-dir", default=None)
+    # CLIは呼び出し元のスクリプトを持たないため、既定でCPU数のワーカープロセスを使う
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--render-workers", type=int, default=None)
+    _add_output_arguments(parser)
+
+
+def run_entities_command(args: argparse.Namespace) -> int:
+    from .entity_generator import EntityGenerator
+
+    profiler = _profiler(args)
+    generator = EntityGenerator(
+        file_path=args.input,
+        output_dir=args.output,
+        db_type=args.db_type,
+        cache_dir=args.cache_dir,
+        profiler=profiler,
+        package_init=args.package_init,
+        parse_workers=args.parse_workers,
+        template_dir=args.template_dir,
+        render_workers=args.render_workers,
+        relationship_loading=(
+            None if args.relationship_loading == "none" else args.relationship_loading
+        ),
+        migrations=args.migrations,
+        eager_defaults=args.eager_defaults,
+    )
+    report = generator.execute(max_workers=args.workers, delete_stale=args.delete_stale)
+    return _finish(args, report, generator.schema_ir, profiler)
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    from .batch import add_batch_arguments
+
+    add_batch_arguments(parser)
+
+
+def run_batch_command(args: argparse.Namespace) -> int:
+    from .batch import run_batch_command
+
+    return run_batch_command(args)
+
+
+def _add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--package-init", action="store_true")
+    parser.add_argument("--delete-stale", action="store_true")
+    parser.add_argument(
+        "--schema-ir", default=None, help="also write the schema IR to this file"
+    )
+    parser.add_argument(
+        "--profile", default=None, help="write a profile report (JSON) to this file"
+    )
+
+
+def _profiler(args: argparse.Namespace) -> Profiler | None:
+    if not args.profile:
+        return None
+    from .profiling import Profiler
+
+    return Profiler()
+
+
+def _finish(
+    args: argparse.Namespace,
+    report: WriteReport,
+    schema_ir: Callable[[], SchemaIR],
+    profiler: Profiler | None,
+) -> int:
+    """
+    書き込み結果を表示し、指定された中間表現・プロファイルを書き出す
+    """
+    print(
+        f"{len(report.added)} added, {len(report.changed)} changed, "
+        f"{len(report.removed)} removed, {len(report.unchanged)} unchanged"
+    )
+    if args.schema_ir:
+        from .schema_ir import dump_schema
+
+        dump_schema(schema_ir(), args.schema_ir)
+    if profiler is not None:
+        profiler.write_json(args.profile)
+        profiler.close()
+    return 0
+
+
+_COMMAND_HANDLERS: dict[
+    str,
+    tuple[
+        Callable[[argparse.ArgumentParser], None],
+        Callable[[argparse.Namespace], int],
+    ],
+] = {
+    "models": (add_models_arguments, run_models_command),
+    "entities": (add_entities_arguments, run_entities_command),
+    "batch": (add_batch_arguments, run_batch_command),
+}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
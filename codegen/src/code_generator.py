@@ -1,22 +1,69 @@
 import ast
+import asyncio
+import io
 import os
 import re
+import shutil
 import subprocess  # nosec B404
+import tempfile
+import threading
+import weakref
 from copy import copy
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import IO, Any, Iterable
 
 import yaml
 
+from .aio import run_cancellable
+from .backends import BACKEND_PYDANTIC, ModelBackend, get_backend
+from .cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    GenerationCache,
+    SchemaCache,
+    compute_cache_key,
+    hash_input_files,
+    tool_version,
+)
+from .codegen_engine import (
+    ENGINE_INPROCESS,
+    ENGINE_SUBPROCESS,
+    ENGINES,
+    Engine,
+    generate_source,
+    resolve_engine,
+)
+from .graph import strongly_connected_components
+from .output import DEFAULT_BATCH_SIZE, OutputSink, WriteReport
+from .package_index import PackageIndex, render_package_init
+from .profiling import NULL_PROFILER, Profiler
+from .ref_resolver import RefResolver, scan_ref_files
+from .schema_ir import SchemaIR
+from .streaming import split_stream
+from .symbol_index import ClassSource, SymbolIndex
+
 TEMPORARY_MODEL_FILE_NAME = "temporary_model.py"
 TEMPORARY_API_FILE_NAME = "temporary_api.yaml"
 
 
 class CodeGenerator:
     output_dir: str
+    input_files: list[str]
+    cache_hit: bool
+    profiler: Profiler
     _source_code: str
     _imports: list[ast.Import | ast.ImportFrom]
     _classes: list[ast.ClassDef]
+    _index: SymbolIndex | None
+    _cache: GenerationCache | None
+    _cache_key: str | None
+    _cached_files: dict[str, str] | None
+    _streaming: bool
+    _package_init: bool
+    _backend: ModelBackend
+    _source_path: str | None
+    _schema_cache: SchemaCache | None
+    _schema: SchemaIR | None
 
     def __init__(
         self,
@@ -24,24 +71,253 @@ class CodeGenerator:
         output_dir: str,
         parameters: list[str],
         include_models_dir: str | None = None,
+        engine: Engine = ENGINE_SUBPROCESS,
+        cache_dir: str | None = None,
+        cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+        profiler: Profiler | None = None,
+        streaming: bool = False,
+        package_init: bool = False,
+        backend: str = BACKEND_PYDANTIC,
     ):
         """
         notes:
             * parametersは、datemodel-code-generatorに準拠
             https://github.com/koxudaxi/datamodel-code-generator/
+            * engine="inprocess"の場合、datamodel-code-generatorをプロセス内で実行し、
+            output_dirに一時ファイルを作成しない。datamodel-codegenが未importで、
+            メインスレッド以外から作成した場合はengine="subprocess"で生成する
+            * cache_dirを指定した場合、入力の内容が前回と同じであれば生成をスキップし、
+            キャッシュされた出力ファイルをexecuteで書き出す。モデルの中間表現
+            (schema_irを参照)もcache_dir/schemaに保存し、生成せずに返す
+            * profilerを指定した場合、フェーズ(load_refs, cache_lookup, merge, dump_yaml,
+            codegen, split, emit, cache_store)ごとの時間とカウンタを記録する
+            * streaming=Trueの場合、生成されたソースコードをASTに変換せず、executeで
+            トップレベルの文ごとに読みながら、依存関係が確定したクラスから順に書き出す。
+            メモリ使用量はソース全体ではなく最大のクラスの大きさで抑えられる
+            (engine="inprocess"では、生成されたソースコード自体は保持する)。
+            出力ファイルの内容を保持しないため、生成結果はキャッシュに保存しない
+            * package_init=Trueの場合、モデルを初回アクセス時に遅延importする
+            __init__.pyと、型チェッカー向けの__init__.pyiをexecuteで出力する
+            * backendで出力するモデルクラスの種類を指定する("pydantic", "dataclass",
+            "msgspec")。"dataclass"は@dataclass(slots=True)、"msgspec"はmsgspec.Structの
+            クラスを出力し、分割・モデル同士のimportの規則はpydanticと同じ
         """
+        engine = resolve_engine(engine)
+        prepared = self._prepare(
+            openapi_file_path,
+            output_dir,
+            parameters,
+            include_models_dir,
+            engine,
+            cache_dir,
+            cache_max_bytes,
+            profiler,
+            streaming,
+            package_init,
+            backend,
+        )
+        if prepared is None:
+            return
+        resolver, parameters = prepared
+
+        openapi_spec = self._merge(resolver)
+        if engine == ENGINE_INPROCESS:
+            source_code = self._generate_source_in_process(
+                openapi_spec, parameters, Path(openapi_file_path).name
+            )
+        elif streaming:
+            self._set_source_path(
+                self._generate_source_file_with_subprocess(openapi_spec, parameters)
+            )
+            return
+        else:
+            source_code = self._generate_source_with_subprocess(
+                openapi_spec, parameters
+            )
+        self._load_source(source_code)
+
+    @classmethod
+    async def create(
+        cls,
+        openapi_file_path: str,
+        output_dir: str,
+        parameters: list[str],
+        include_models_dir: str | None = None,
+        engine: Engine = ENGINE_SUBPROCESS,
+        cache_dir: str | None = None,
+        cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+        profiler: Profiler | None = None,
+        streaming: bool = False,
+        package_init: bool = False,
+        backend: str = BACKEND_PYDANTIC,
+    ) -> "CodeGenerator":
+        """
+        イベントループをブロックせずにCodeGeneratorを作成する(引数は__init__と同じ)
+
+        notes:
+            * $refの読み込み・キャッシュの確認・統合・パースはスレッドで実行し、
+            datamodel-codegenのCLIはasyncioのサブプロセスとして実行する
+            * タスクがキャンセルされた場合、実行中のdatamodel-codegenのプロセスを終了し、
+            一時ファイルを削除してからCancelledErrorを送出する。スレッドで実行中の処理
+            (engine="inprocess"の生成を含む)は終わるまで続くが、結果は破棄される
+            * 並行して作成する場合、output_dir・profilerはそれぞれ別のものを指定すること
+            * engine="inprocess"の場合、datamodel-codegenのCLIはスレッドに渡す前に
+            イベントループのスレッドでimportする(import時にsignal.signalを呼ぶため)
+        """
+        self = cls.__new__(cls)
+        engine = resolve_engine(engine)
+        prepared = await asyncio.to_thread(
+            self._prepare,
+            openapi_file_path,
+            output_dir,
+            parameters,
+            include_models_dir,
+            engine,
+            cache_dir,
+            cache_max_bytes,
+            profiler,
+            streaming,
+            package_init,
+            backend,
+        )
+        if prepared is None:
+            return self
+        resolver, parameters = prepared
+
+        openapi_spec = await asyncio.to_thread(self._merge, resolver)
+        if engine == ENGINE_INPROCESS:
+            source_code = await asyncio.to_thread(
+                self._generate_source_in_process,
+                openapi_spec,
+                parameters,
+                Path(openapi_file_path).name,
+            )
+        else:
+            source_path = await self._agenerate_source_file_with_subprocess(
+                openapi_spec, parameters
+            )
+            if streaming:
+                self._set_source_path(source_path)
+                return self
+            try:
+                source_code = await asyncio.to_thread(
+                    self._import_temporary_file, source_path
+                )
+            finally:
+                os.remove(source_path)
+        await asyncio.to_thread(self._load_source, source_code)
+        return self
+
+    def _prepare(
+        self,
+        openapi_file_path: str,
+        output_dir: str,
+        parameters: list[str],
+        include_models_dir: str | None,
+        engine: str,
+        cache_dir: str | None,
+        cache_max_bytes: int | None,
+        profiler: Profiler | None,
+        streaming: bool,
+        package_init: bool,
+        backend: str,
+    ) -> tuple[RefResolver, list[str]] | None:
+        """
+        属性を初期化し、キャッシュを確認してから$refを読み込む
+
+        notes:
+            * キャッシュにヒットした場合はNone、それ以外は生成に使う
+            RefResolverとparametersを返す
+            * キャッシュキーは、scan_ref_filesで集めたファイルの内容から計算する。
+            ヒットした場合はドキュメントのパース・$refの書き換えを行わない
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
+        self._backend = get_backend(backend)
+        parameters = self._backend.parameters(parameters)
+
         os.makedirs(output_dir, exist_ok=True)
         self.output_dir = output_dir
-        temporary_model_filepath = os.path.join(output_dir, TEMPORARY_MODEL_FILE_NAME)
-        temporary_api_filepath = os.path.join(output_dir, TEMPORARY_API_FILE_NAME)
-        self._generate_merged_openapi_file(openapi_file_path, include_models_dir)
-        self._generate_temporary_model_file(temporary_model_filepath, parameters)
-        source_code = self._import_temporary_file(temporary_model_filepath)
-        self._imports = self._extract_imports(source_code)
-        self._classes = self._extract_classes(source_code)
+        self.cache_hit = False
+        self.profiler = profiler or NULL_PROFILER
+        self._source_code = ""
+        self._imports = []
+        self._classes = []
+        self._index = None
+        self._cache = None
+        self._cache_key = None
+        self._cached_files = None
+        self._streaming = streaming
+        self._package_init = package_init
+        self._source_path = None
+        self._schema_cache = None
+        self._schema = None
+
+        if cache_dir:
+            with self.profiler.span("cache_lookup"):
+                self.input_files = scan_ref_files(openapi_file_path, include_models_dir)
+                self._cache = GenerationCache(cache_dir, cache_max_bytes)
+                self._cache_key = self._compute_cache_key(
+                    self.input_files, openapi_file_path, parameters
+                )
+                self._cached_files = self._cache.get(self._cache_key)
+                self._schema_cache = SchemaCache(
+                    os.path.join(cache_dir, "schema"),
+                    cache_max_bytes,
+                    root_dir=cache_dir,
+                )
+                if self._cached_files is not None:
+                    self._schema = self._schema_cache.get(self._cache_key)
+                    if self._schema is None:
+                        # 中間表現がない場合は、生成からやり直す
+                        self._cached_files = None
+            if self._cached_files is not None:
+                self.profiler.count("cache_hits")
+                self.cache_hit = True
+                self.profiler.count("files_loaded", len(self.input_files))
+                return None
+
+        with self.profiler.span("load_refs"):
+            resolver = RefResolver(openapi_file_path, include_models_dir)
+        self.input_files = resolver.files()
+        self.profiler.count("files_loaded", len(self.input_files))
+        self.profiler.count(
+            "refs_resolved", sum(len(refs) for refs in resolver.graph.values())
+        )
+        return resolver, parameters
+
+    def _merge(self, resolver: RefResolver) -> dict[str, Any]:
+        with self.profiler.span("merge"):
+            return resolver.merge()
+
+    def _generate_source_in_process(
+        self, openapi_spec: dict[str, Any], parameters: list[str], input_filename: str
+    ) -> str:
+        with self.profiler.span("codegen", engine=ENGINE_INPROCESS):
+            return generate_source(openapi_spec, parameters, input_filename)
+
+    def _set_source_path(self, source_path: str) -> None:
+        """
+        streamingモードで、subprocessが生成したファイルを読み込み元とする
+        (インスタンスが破棄されたときに削除する)
+        """
+        self._source_path = source_path
+        weakref.finalize(self, _remove_file, source_path)
+
+    def _load_source(self, source_code: str) -> None:
+        """
+        生成されたソースコードを保持し、streamingモード以外ではクラスに分割する
+        """
+        if self._streaming:
+            self._source_code = source_code
+            return
+
+        with self.profiler.span("split"):
+            self._index = SymbolIndex(source_code)
+        self._imports = self._index.imports
+        self._classes = self._index.classes
         self._source_code = source_code
-        os.remove(temporary_model_filepath)
-        os.remove(temporary_api_filepath)
+        self.profiler.count("classes_found", len(self._classes))
 
     def filter_import_node(
         self, import_node: ast.Import | ast.ImportFrom, used_imports: set[str]
@@ -61,163 +337,424 @@ class CodeGenerator:
 
         return new_node if new_node.names else None
 
-    def execute(self):
-        class_names = {node.name for node in self._classes}
+    def execute(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        delete_stale: bool = False,
+        cancelled: threading.Event | None = None,
+    ) -> WriteReport:
+        """
+        クラスごとにファイルを分割して出力する
 
-        for class_node in self._classes:
-            class_source_code: str | None = ast.get_source_segment(
-                self._source_code, class_node
-            )
+        notes:
+            * レンダリングは呼び出し元のスレッドで行い、batch_sizeファイルごとにまとめて
+            max_workersのワーカープールでステージングする
+            * 内容が変わったファイルだけを書き込み、delete_stale=Trueの場合は
+            前回出力して今回出力しなかったファイルを削除する
+            * cancelledがsetされた場合、出力先に反映する前であれば出力先を変更せずに
+            CancelledErrorを送出する(OutputSinkを参照)
+        """
+        with (
+            self.profiler.span("emit"),
+            OutputSink(
+                self.output_dir, delete_stale, max_workers, batch_size, cancelled
+            ) as sink,
+        ):
+            package_index = PackageIndex()
+            if self._cached_files is not None:
+                files = sink.write_all(self._cached_files)
+            elif self._streaming:
+                with self._open_source() as lines:
+                    file_names = sink.write_stream(
+                        package_index.track(
+                            split_stream(
+                                lines,
+                                self.profiler.timed(
+                                    "render", self._render_class_content
+                                ),
+                            )
+                        )
+                    )
+                files = dict.fromkeys(file_names, "")
+            else:
+                files = sink.emit(
+                    self._classes,
+                    self.profiler.timed("render", self._render_class_file),
+                )
+            if self._package_init:
+                if not package_index.exports:
+                    # streaming以外は、出力したファイルの内容から公開する名前を集める
+                    package_index.update(files.items())
+                sink.write_all(package_index.render())
+            report = sink.commit()
+        self.profiler.count("classes_emitted", len(files))
+        self.profiler.count("files_written", len(report.written))
+        self.profiler.count("bytes_written", report.bytes_written)
+
+        if (
+            self._cached_files is None
+            and not self._streaming
+            and self._cache
+            and self._cache_key
+        ):
+            with self.profiler.span("cache_store"):
+                self._cache.put(self._cache_key, files)
+                if self._schema_cache:
+                    self._schema_cache.put(self._cache_key, self.schema_ir())
+        return report
+
+    async def aexecute(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        delete_stale: bool = False,
+    ) -> WriteReport:
+        """
+        イベントループをブロックせずにexecuteを実行する
 
-            if not class_source_code:
-                continue
+        notes:
+            * レンダリング・書き込みはexecuteと同じワーカープールで行い、全体をスレッドで待つ
+            * タスクがキャンセルされた場合、出力先に反映する前であれば書き込みを中止し、
+            出力先を変更せずにCancelledErrorを送出する(反映中の場合は反映を終えてから送出する)
+        """
+        return await run_cancellable(
+            partial(self.execute, max_workers, batch_size, delete_stale)
+        )
 
-            # クラスの型ヒントから、importを取得
-            class_imports = set()
-            class_annotations = [
-                attr.annotation
-                for attr in class_node.body
-                if isinstance(attr, ast.AnnAssign)
-            ]
-            for annotation in class_annotations:
-                if isinstance(annotation, ast.Name) and annotation.id in class_names:
-                    class_imports.add(annotation.id)
-
-                if isinstance(annotation, ast.BinOp):
-                    left = annotation.left
-                    right = annotation.right
-
-                    if isinstance(left, ast.Name) and isinstance(right, ast.Constant):
-                        if left.id in class_names:
-                            class_imports.add(left.id)
-
-            # インポートのソースコード生成
-            used_imports: set[str] = self._get_imports_for_class(class_node)
-            import_nodes: list[ast.Import | ast.ImportFrom | None] = [
-                self.filter_import_node(import_node, used_imports)
-                for import_node in self._imports
+    def schema_ir(self) -> SchemaIR:
+        """
+        モデル・フィールド・モデル間の参照の中間表現を返す
+
+        notes:
+            * dump_schemaでファイルに書き出すと、他のツールからOpenAPIを読み込まずに読み込める
+            * streaming=Trueの場合は、生成されたソースコード全体をパースする
+        """
+        if self._schema is None:
+            index = self._index
+            if index is None:
+                with self._open_source() as f:
+                    index = SymbolIndex(f.read())
+            self._schema = SchemaIR(models=index.models())
+        return self._schema
+
+    def render(self) -> dict[str, str]:
+        """
+        ファイルへの書き込みは行わずに、クラスごとの出力ファイル名と内容を返す
+        """
+        files: dict[str, str] = {}
+        if self._cached_files is not None:
+            files = dict(self._cached_files)
+        elif self._streaming:
+            with self._open_source() as lines:
+                files = dict(split_stream(lines, self._render_class_content))
+        else:
+            for class_node in self._classes:
+                if rendered := self._render_class_file(class_node):
+                    file_name, content = rendered
+                    files[file_name] = content
+
+        if self._package_init:
+            files.update(render_package_init(files.items()))
+        return files
+
+    def model_fingerprints(self) -> dict[str, str]:
+        """
+        出力するモデルクラスごとに、クラス名 → フィンガープリント(sha256)を返す
+
+        notes:
+            * クラスのソースコード・使用しているimport文・backend・依存先のモデルクラスの
+            フィンガープリントから計算する。出力先には依存しないため、異なる仕様から
+            生成された同じモデルは同じ値になる
+            * 循環参照しているクラスは、強連結成分のクラス全体から計算する
+            * 生成されたソースコードをパースしたもの(キャッシュヒット・streamingモード以外)
+            でのみ使用できる
+        """
+        index = self._index
+        if index is None:
+            raise RuntimeError("Fingerprints require the parsed generated source")
+
+        sources = {
+            class_source.name: class_source
+            for class_source in map(index.class_source, self._classes)
+            if class_source.source
+        }
+        graph = {
+            name: [
+                dependency
+                for dependency in source.dependencies
+                if dependency in sources
             ]
-            import_source_codes = [ast.unparse(node) for node in import_nodes if node]
-
-            # モデル同士のインポート追加
-            if class_imports:
-                module = self.output_dir.replace("/", ".")
-                if module[-1] != ".":
-                    module = module + "."
-                class_import_source_codes = [
-                    f"from {module}{str(class_import).lower()} import {class_import}"
-                    for class_import in class_imports
-                ]
-                import_source_codes.extend(class_import_source_codes)
-
-            content = "\n\n\n".join(
-                [
-                    "\n".join(import_source_codes),
-                    class_source_code,
-                ]
+            for name, source in sources.items()
+        }
+        fingerprints: dict[str, str] = {}
+        # 強連結成分は依存先から順に返るため、依存先のフィンガープリントは計算済み
+        for component in strongly_connected_components(graph):
+            members = sorted(component)
+            parts = [self._backend.name]
+            for name in members:
+                parts.append(name)
+                parts.append(sources[name].source)
+                parts.append(
+                    "\n".join(ast.unparse(node) for node in sources[name].imports)
+                )
+            parts.extend(
+                sorted(
+                    f"{dependency}={fingerprints[dependency]}"
+                    for name in members
+                    for dependency in graph[name]
+                    if dependency not in component
+                )
             )
+            component_key = compute_cache_key(parts)
+            for name in members:
+                fingerprints[name] = compute_cache_key([component_key, name])
+        return fingerprints
 
-            with open(
-                Path(
-                    self.output_dir,
-                    f"{self._convert_to_snake_case(class_node.name)}.py",
-                ),
-                "w",
-                encoding="utf-8",
-            ) as f:
-                f.write(content + "\n")
-
-    def _get_imports_for_class(self, class_node: ast.ClassDef) -> set[str]:
-        used_names = set()
-        for node in ast.walk(class_node):
-            if isinstance(node, ast.Name):
-                used_names.add(node.id)
-        return used_names
+    def model_dependencies(self) -> dict[str, list[str]]:
+        """
+        出力するモデルクラスごとに、依存しているモデルクラスの名前を返す
+        """
+        index = self._index
+        if index is None:
+            raise RuntimeError("Dependencies require the parsed generated source")
+        return {
+            class_source.name: list(class_source.dependencies)
+            for class_source in map(index.class_source, self._classes)
+            if class_source.source
+        }
+
+    def render_models(self, names: Iterable[str], models_dir: str) -> dict[str, str]:
+        """
+        namesのクラスを、モデル同士のimportをmodels_dirに向けてレンダリングする
+        (共有パッケージへの出力用)
+        """
+        index = self._index
+        if index is None:
+            raise RuntimeError("Rendering requires the parsed generated source")
+        targets = set(names)
+        files: dict[str, str] = {}
+        for class_node in self._classes:
+            if class_node.name not in targets:
+                continue
+            class_source = index.class_source(class_node)
+            if class_source.source:
+                file_name, content = self._render_class_content(
+                    class_source, models_dir
+                )
+                files[file_name] = content
+        return files
+
+    def render_reexport(self, class_name: str, models_dir: str) -> tuple[str, str]:
+        """
+        models_dirに出力したクラスを再exportするファイルの名前と内容を返す
 
-    @staticmethod
-    def _find_refs(obj):
-        """再帰的に $ref の値を取得する"""
-        refs = set()
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if k == "$ref":
-                    refs.add(v)
-                else:
-                    refs.update(CodeGenerator._find_refs(v))
-        elif isinstance(obj, list):
-            for item in obj:
-                refs.update(CodeGenerator._find_refs(item))
-        return refs
-
-    def _generate_merged_openapi_file(
-        self, openapi_filepath: str, include_models_dir: str | None
-    ):
+        notes:
+            * 出力先のモジュールからのimport(from <output_dir>.user import User)は
+            そのまま使え、クラスの実体は共有パッケージの1つだけになる
         """
-        $refを用いて、別ファイルを参照しているopenapiファイルを、1つのファイルに統合する
+        return (
+            self.model_file_name(class_name),
+            f"{self._model_import(class_name, models_dir)}\n\n"
+            f'__all__ = ["{class_name}"]\n',
+        )
+
+    def model_file_name(self, class_name: str) -> str:
         """
+        モデルクラスの出力ファイル名を返す
+        """
+        return f"{self._convert_to_snake_case(class_name)}.py"
 
-        # モデル内の$refを探索し、componentに置き換え
-        def convert_ref_to_stem(data):
-            if isinstance(data, dict):
-                new_dict = {}
-                for key, value in data.items():
-                    if key == "$ref" and isinstance(value, str):
-                        # stemに置き換え
-                        new_dict[key] = (
-                            f"#/components/schemas/{Path(value.split('#', 1)[0]).stem}"
-                        )
-                    else:
-                        new_dict[key] = convert_ref_to_stem(value)
-                return new_dict
-            elif isinstance(data, list):
-                return [convert_ref_to_stem(item) for item in data]
-            else:
-                return data
+    def _open_source(self) -> IO[str]:
+        """
+        streamingモードで、生成されたソースコードを1行ずつ読むためのファイルを開く
+        """
+        if self._source_path is not None:
+            return open(self._source_path, "r", encoding="utf-8")
+        return io.StringIO(self._source_code)
+
+    def _render_class_file(self, class_node: ast.ClassDef) -> tuple[str, str] | None:
+        """
+        1クラス分の出力ファイル名と内容を生成する
+        """
+        index = self._index
+        if index is None:
+            return None
 
-        with open(openapi_filepath, "r", encoding="utf-8") as f:
-            openapi_spec = yaml.safe_load(f)
+        class_source = index.class_source(class_node)
 
-        # $refのパスを抽出
-        refs = self._find_refs(openapi_spec)
-        model_files = set(Path(os.path.dirname(openapi_filepath), ref) for ref in refs)
+        if not class_source.source:
+            return None
 
-        if include_models_dir:
-            # include_models_dir内のファイルパスを取得
-            include_model_files = set(
-                f for f in Path(include_models_dir).rglob("*") if f.is_file()
+        return self._render_class_content(class_source)
+
+    def _render_class_content(
+        self, class_source: ClassSource, models_dir: str | None = None
+    ) -> tuple[str, str]:
+        """
+        クラスのソースコード・使用しているimport文・依存しているモデルクラスから、
+        出力ファイル名と内容を生成する
+
+        notes:
+            * 依存しているモデルクラスはmodels_dir(省略時はoutput_dir)からimportする
+            * pydanticはモデルの構築時に型ヒントを評価するため、循環していない依存先は
+            通常どおりモジュールの先頭でimportする
+            * 循環参照している依存先は、型ヒントのみで使用している場合に限り
+            先頭ではTYPE_CHECKING内でimportし、クラス定義後にimportしてから
+            backendの方法(pydanticではmodel_rebuild())で型ヒントを解決する
+            (import時の循環を避けるため)
+        """
+        # インポートのソースコード生成
+        import_source_codes = [ast.unparse(node) for node in class_source.imports]
+
+        deferred = [
+            dependency
+            for dependency in class_source.cyclic_dependencies
+            if dependency not in class_source.runtime_references
+        ]
+        if deferred:
+            # 型ヒントの評価を遅延させないと、クラス定義時に未importの名前を参照してしまう
+            if "from __future__ import annotations" not in import_source_codes:
+                import_source_codes.insert(0, "from __future__ import annotations")
+            import_source_codes.append("from typing import TYPE_CHECKING")
+
+        # モデル同士のインポート追加
+        import_source_codes.extend(
+            self._model_import(dependency, models_dir)
+            for dependency in class_source.dependencies
+            if dependency not in deferred
+        )
+        if deferred:
+            import_source_codes.append(
+                "if TYPE_CHECKING:\n"
+                + "\n".join(
+                    f"    {self._model_import(dependency, models_dir)}"
+                    for dependency in deferred
+                )
+            )
+
+        sections = [
+            "\n".join(import_source_codes),
+            self._backend.render_class(class_source.source),
+        ]
+        if deferred:
+            deferred_imports = "\n".join(
+                f"{self._model_import(dependency, models_dir)}  # noqa: E402"
+                for dependency in deferred
             )
+            if rebuild := self._backend.rebuild_statement(class_source.name):
+                deferred_imports += f"\n\n{rebuild}"
+            sections.append(deferred_imports)
+        content = "\n\n\n".join(sections)
+
+        return self.model_file_name(class_source.name), content + "\n"
+
+    def _model_import(self, class_name: str, models_dir: str | None = None) -> str:
+        """
+        出力先(models_dir、省略時はoutput_dir)の他のモデルクラスをimportする文を返す
+        """
+        module = (models_dir or self.output_dir).replace("/", ".")
+        if module[-1] != ".":
+            module = module + "."
+        return f"from {module}{self._convert_to_snake_case(class_name)} import {class_name}"
+
+    def _compute_cache_key(
+        self, input_files: list[str], openapi_file_path: str, parameters: list[str]
+    ) -> str:
+        """
+        入力仕様・$ref先のファイル(推移的な参照を含む)・include_models_dir・parameters・
+        ツールのバージョンからキャッシュキーを計算する
+        """
+        return compute_cache_key(
+            [
+                tool_version("datamodel-code-generator"),
+                self.output_dir,
+                self._backend.name,
+                "\0".join(parameters),
+                *hash_input_files(
+                    (Path(file) for file in input_files),
+                    Path(os.path.dirname(os.path.abspath(openapi_file_path))),
+                ),
+            ]
+        )
 
-            # $refファイルとモデルファイルを統合
-            model_files |= include_model_files
-
-        # 抽出した$refが指すファイルからschemaを移動し、$refの値も合わせて変更
-        components_schemas = {}
-        for model_file in model_files:
-            schema_name = model_file.stem
-            with open(model_file, "r", encoding="utf-8") as rf:
-                ref_spec = yaml.safe_load(rf)
-            ref_spec = convert_ref_to_stem(ref_spec)
-            components_schemas.update({schema_name: ref_spec})
-
-        # api_spec の components.schemas を置き換え
-        openapi_spec["components"] = {"schemas": components_schemas}
-
-        # paths 内の $ref を更新
-        def update_refs(obj):
-            if isinstance(obj, dict):
-                for k, v in obj.items():
-                    if k == "$ref" and isinstance(v, str):
-                        ref_file = Path(v).stem
-                        obj[k] = f"#/components/schemas/{ref_file}"
-                    else:
-                        update_refs(v)
-            elif isinstance(obj, list):
-                for item in obj:
-                    update_refs(item)
-
-        update_refs(openapi_spec["paths"])
-
-        # 統合 YAML を書き出す
+    def _generate_source_with_subprocess(
+        self, openapi_spec: dict[str, Any], parameters: list[str]
+    ) -> str:
+        """
+        統合したopenapiファイルを一時ファイルに書き出し、datamodel-codegenのCLIでモデルを生成する
+        """
+        source_path = self._generate_source_file_with_subprocess(
+            openapi_spec, parameters
+        )
+        try:
+            return self._import_temporary_file(source_path)
+        finally:
+            os.remove(source_path)
+
+    def _generate_source_file_with_subprocess(
+        self, openapi_spec: dict[str, Any], parameters: list[str]
+    ) -> str:
+        """
+        datamodel-codegenのCLIでモデルを生成し、output_dirの外に移した生成ファイルのパスを返す
+
+        notes:
+            * 返したファイルは呼び出し側で削除すること
+        """
+        temporary_model_filepath = os.path.join(
+            self.output_dir, TEMPORARY_MODEL_FILE_NAME
+        )
+        temporary_api_filepath = os.path.join(self.output_dir, TEMPORARY_API_FILE_NAME)
+        with self.profiler.span("dump_yaml"):
+            self._generate_merged_openapi_file(openapi_spec)
+        try:
+            with self.profiler.span("codegen", engine=ENGINE_SUBPROCESS):
+                self._generate_temporary_model_file(
+                    temporary_model_filepath, parameters
+                )
+            fd, source_path = tempfile.mkstemp(prefix="modelgen-", suffix=".py")
+            os.close(fd)
+            shutil.move(temporary_model_filepath, source_path)
+            return source_path
+        finally:
+            if os.path.exists(temporary_model_filepath):
+                os.remove(temporary_model_filepath)
+            os.remove(temporary_api_filepath)
+
+    async def _agenerate_source_file_with_subprocess(
+        self, openapi_spec: dict[str, Any], parameters: list[str]
+    ) -> str:
+        """
+        _generate_source_file_with_subprocessのasyncio版。datamodel-codegenのCLIを
+        asyncioのサブプロセスとして実行する
+        """
+        temporary_model_filepath = os.path.join(
+            self.output_dir, TEMPORARY_MODEL_FILE_NAME
+        )
+        temporary_api_filepath = os.path.join(self.output_dir, TEMPORARY_API_FILE_NAME)
+        try:
+            with self.profiler.span("dump_yaml"):
+                await asyncio.to_thread(
+                    self._generate_merged_openapi_file, openapi_spec
+                )
+            with self.profiler.span("codegen", engine=ENGINE_SUBPROCESS):
+                await self._agenerate_temporary_model_file(
+                    temporary_model_filepath, parameters
+                )
+            fd, source_path = tempfile.mkstemp(prefix="modelgen-", suffix=".py")
+            os.close(fd)
+            shutil.move(temporary_model_filepath, source_path)
+            return source_path
+        finally:
+            # キャンセル時は書き出し中のスレッドが残っている場合があるため、存在を確認する
+            for path in (temporary_model_filepath, temporary_api_filepath):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _generate_merged_openapi_file(self, openapi_spec: dict[str, Any]) -> None:
+        """
+        統合したopenapi仕様を一時ファイルに書き出す
+        """
         with open(
             os.path.join(self.output_dir, TEMPORARY_API_FILE_NAME),
             "w",
@@ -227,7 +764,7 @@ class CodeGenerator:
 
     def _generate_temporary_model_file(
         self, temporary_model_filepath: str, parameters: list[str]
-    ):
+    ) -> None:
         """
         datamodel-codegenを使用して、一時モデルファイルを生成
         """
@@ -249,26 +786,53 @@ class CodeGenerator:
             check=True,
         )  # nosec B603, B607
 
-    @staticmethod
-    def _import_temporary_file(temporary_filename: str):
-        with open(temporary_filename, "r", encoding="utf-8") as f:
-            return f.read()
+    async def _agenerate_temporary_model_file(
+        self, temporary_model_filepath: str, parameters: list[str]
+    ) -> None:
+        """
+        datamodel-codegenをasyncioのサブプロセスとして実行し、一時モデルファイルを生成
 
-    @staticmethod
-    def _extract_imports(source_code: str) -> List[ast.Import | ast.ImportFrom]:
-        """ソースコードからimport文を抽出し、そのテキストリストを返す"""
-        tree = ast.parse(source_code)
-        return [
-            node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+        notes:
+            * 失敗した場合はsubprocess.runのcheck=Trueと同じくCalledProcessErrorを送出する
+            * キャンセルされた場合はプロセスを終了(kill)し、終了を待ってから
+            CancelledErrorを送出する
+        """
+        openapi_file_path = Path(self.output_dir, TEMPORARY_API_FILE_NAME).resolve(
+            strict=True
+        )
+        temporary_file_path = Path(temporary_model_filepath).resolve()
+        command = [
+            "datamodel-codegen",
+            "--input",
+            str(openapi_file_path),
+            "--input-file-type",
+            "openapi",
+            "--output",
+            str(temporary_file_path),
+            *parameters,
         ]
+        process = await asyncio.create_subprocess_exec(*command)  # nosec B603, B607
+        try:
+            return_code = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command)
 
     @staticmethod
-    def _extract_classes(source_code: str) -> List[ast.ClassDef]:
-        """ソースコードからトップレベルのクラス定義のASTノードを抽出する"""
-        tree = ast.parse(source_code)
-        return [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    def _import_temporary_file(temporary_filename: str) -> str:
+        with open(temporary_filename, "r", encoding="utf-8") as f:
+            return f.read()
 
-    def _convert_to_snake_case(self, string: str):
+    def _convert_to_snake_case(self, string: str) -> str:
         s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", string)
         s2 = re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1)
         return s2.lower()
+
+
+def _remove_file(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,167 @@
+import contextlib
+import inspect
+import io
+import json
+import signal
+import sys
+import threading
+from argparse import Namespace
+from collections import defaultdict
+from pathlib import Path
+from typing import IO, Any, Final, Literal
+
+ENGINE_SUBPROCESS: Final = "subprocess"
+ENGINE_INPROCESS: Final = "inprocess"
+ENGINES = (ENGINE_SUBPROCESS, ENGINE_INPROCESS)
+Engine = Literal["subprocess", "inprocess"]
+
+# generate()の引数名と、datamodel-codegenのConfigのフィールド名が異なるもの
+_RENAMED_CONFIG_FIELDS = {
+    "use_default": "apply_default_values_for_required_fields",
+    "force_optional": "force_optional_for_required_fields",
+}
+# JSONファイルとして渡され、generate()には読み込んだ値を渡すもの
+_JSON_FILE_CONFIG_FIELDS = (
+    "aliases",
+    "extra_template_data",
+    "custom_formatters_kwargs",
+)
+# 入出力はエンジン側で指定するため、parametersからは受け付けない
+_IGNORED_CONFIG_FIELDS = ("input", "output", "url", "input_file_type")
+
+_lock = threading.Lock()
+
+
+def _import_cli() -> Any:
+    """
+    datamodel_code_generator.__main__ をimportする
+
+    notes:
+        * __main__ はimport時にSIGINTハンドラを差し替えるため、元のハンドラに戻す
+        * signal.signalはメインスレッドでしか呼べないため、初回のimportはメインスレッドで
+        行うこと(resolve_engineを参照。import済みの場合はハンドラに触れずに返す)
+    """
+    with _lock:
+        cli = sys.modules.get("datamodel_code_generator.__main__")
+        if cli is not None:
+            return cli
+        original_handler = signal.getsignal(signal.SIGINT)
+        import datamodel_code_generator.__main__ as cli
+
+        if original_handler is not None:
+            signal.signal(signal.SIGINT, original_handler)
+    return cli
+
+
+def resolve_engine(engine: Engine) -> Engine:
+    """
+    実際に使うエンジンを返す。engine="inprocess"の場合、datamodel-codegenのCLIを
+    呼び出し元のスレッドでimportする
+
+    notes:
+        * 生成をスレッドで実行する前に、呼び出し元のスレッドで呼ぶ
+        * CLIが未importで、メインスレッド以外から呼ばれた場合はimportできないため
+        (import時にsignal.signalを呼ぶ)、"subprocess"を返す
+    """
+    if engine != ENGINE_INPROCESS:
+        return engine
+    if threading.current_thread() is threading.main_thread():
+        _import_cli()
+    elif "datamodel_code_generator.__main__" not in sys.modules:
+        return ENGINE_SUBPROCESS
+    return engine
+
+
+class _ThreadStdout(io.StringIO):
+    """
+    作成したスレッドの標準出力だけを捕捉し、他のスレッドの出力は元の標準出力に渡す
+    """
+
+    _thread_id: int
+    _stdout: IO[str]
+
+    def __init__(self, stdout: IO[str]) -> None:
+        super().__init__()
+        self._thread_id = threading.get_ident()
+        self._stdout = stdout
+
+    def write(self, text: str) -> int:
+        if threading.get_ident() == self._thread_id:
+            return super().write(text)
+        return self._stdout.write(text)
+
+    def flush(self) -> None:
+        if threading.get_ident() != self._thread_id:
+            self._stdout.flush()
+
+
+def _build_generate_kwargs(parameters: list[str]) -> dict[str, Any]:
+    """
+    CLIのparametersを、datamodel-codegenのCLIと同じ規則でgenerate()の引数に変換する
+    """
+    cli = _import_cli()
+    from datamodel_code_generator import generate
+    from datamodel_code_generator.arguments import arg_parser
+
+    namespace = Namespace(no_color=False)
+    arg_parser.parse_args(parameters, namespace=namespace)
+
+    config = cli.Config.parse_obj(cli._get_pyproject_toml_config(Path.cwd()))
+    config.merge_args(namespace)
+
+    generate_parameters = inspect.signature(generate).parameters
+    kwargs: dict[str, Any] = {}
+    for field_name in config.get_fields():
+        argument_name = _RENAMED_CONFIG_FIELDS.get(field_name, field_name)
+        if (
+            field_name in _IGNORED_CONFIG_FIELDS
+            or argument_name not in generate_parameters
+        ):
+            continue
+        value = getattr(config, field_name)
+        if field_name in _JSON_FILE_CONFIG_FIELDS:
+            if value is None:
+                continue
+            with value as data:
+                if field_name == "extra_template_data":
+                    value = json.load(
+                        data, object_hook=lambda d: defaultdict(dict, **d)
+                    )
+                else:
+                    value = json.load(data)
+        kwargs[argument_name] = value
+    return kwargs
+
+
+def generate_source(
+    openapi_spec: dict[str, Any], parameters: list[str], input_filename: str
+) -> str:
+    """
+    統合済みのopenapi仕様から、datamodel-codegenをプロセス内で実行してモデルのソースコードを返す
+
+    notes:
+        * parametersは、datamodel-codegenのCLI引数に準拠
+        * 一時ファイルは作成せず、結果は標準出力を捕捉して文字列として受け取る
+        * generate()は標準出力(sys.stdout)に書き出すため、生成はロックで1つずつ実行する。
+        捕捉するのは実行中のスレッドの出力だけで、他のスレッドの出力はそのまま
+        標準出力に書き出される
+        * 呼び出す前にresolve_engineでエンジンを確認すること
+    """
+    from datamodel_code_generator import InputFileType, generate
+
+    kwargs = _build_generate_kwargs(parameters)
+
+    # JSONはYAMLのサブセットのため、datamodel-codegen側のlibyamlローダーでそのまま読み込める
+    input_text = json.dumps(openapi_spec, ensure_ascii=False)
+
+    with _lock:
+        buffer = _ThreadStdout(sys.stdout)
+        with contextlib.redirect_stdout(buffer):
+            generate(
+                input_text,
+                input_filename=input_filename,
+                input_file_type=InputFileType.OpenAPI,
+                output=None,
+                **kwargs,
+            )
+    return buffer.getvalue()
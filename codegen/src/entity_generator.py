@@ -1,58 +1,104 @@
 from __future__ import annotations
 
+import asyncio
+import copy
 import os
+import threading
+from collections import Counter
 from datetime import date, datetime, time
+from decimal import Decimal
 from enum import Enum
-from pathlib import Path
+from functools import partial
+from itertools import chain
+from typing import Any, Iterable, Iterator
+from uuid import UUID
 
-from jinja2 import Template
-from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, Time
-from sqlglot import Expression, parse
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    Numeric,
+    String,
+    Time,
+    Uuid,
+)
+from sqlalchemy.types import TypeEngine
+from sqlglot import Expression, exp, parse
 from sqlglot.expressions import ColumnDef
 
-BASE_ENTITY = """\
-from sqlalchemy.orm import DeclarativeBase
-
-
-class BaseEntity(DeclarativeBase):
-    pass
-"""
-
-ENTITY_TEMPLATE = """\
-{%- set dt_imports = [] -%}
-{%- if has_datetime %}{% set _ = dt_imports.append("datetime") %}{% endif -%}
-{%- if has_date %}{% set _ = dt_imports.append("date") %}{% endif -%}
-{%- if has_time %}{% set _ = dt_imports.append("time") %}{% endif -%}
-{%- if dt_imports -%}
-from datetime import {{ dt_imports | join(", ") }}
-{% endif %}
-from sqlalchemy import {{ sqlalchemy_imports | join(', ') }}
-from sqlalchemy.orm import Mapped, mapped_column
-
-from {{ output_dir -}}.base_entity import BaseEntity
-
-
-class {{ table.name.split('_') | map('capitalize') | join('') }}Entity(BaseEntity):
-    __tablename__ = "{{ table.name }}"
-{% for column in table.columns %}
-    {{ column.name }}: Mapped[{{ column.data_type.to_python_type().__qualname__ -}}
-        {{ '| None' if column.nullable else '' }}] = mapped_column( \
-        {{- column.data_type.to_sqlalchemy().__name__ }}
-        {%- if column.length %}({{ column.length -}}){% endif -%}
-        , nullable={{ 'True' if column.nullable else 'False' -}}
-        {%- if column.primary_key %}, primary_key=True{% endif -%}
-        {%- if column.unique %}, unique=True{% endif -%}
-        {%- if column.default -%}
-            {%- if column.default == "CURRENT_TIMESTAMP()" -%}
-            , default=datetime.utcnow
-            {%- else -%}
-            , default={{ column.default -}}
-            {%- endif -%}
-        {%- endif -%}
-    )
-{%- endfor %}
+from .aio import run_cancellable
+from .cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    GenerationCache,
+    ParseCache,
+    SchemaCache,
+    compute_cache_key,
+    file_digest,
+    tool_version,
+)
+from .output import DEFAULT_BATCH_SIZE, OutputSink, WriteReport, write_outputs
+from .package_index import render_package_init
+from .parallel import DEFAULT_CHUNK_SIZE, map_chunks
+from .profiling import NULL_PROFILER, Profiler
+from .schema_ir import (
+    AlterTableIR,
+    ColumnChangeIR,
+    ColumnIR,
+    CreateIndexIR,
+    CreateTableIR,
+    DropTableIR,
+    ForeignKeyIR,
+    IndexIR,
+    OperationIR,
+    ParseResultIR,
+    SchemaIR,
+    TableIR,
+    UniqueConstraintIR,
+    decode_ir,
+    encode_ir,
+)
+from .sql_splitter import drop_table_names, iter_schema_statements, iter_sql_files
+from .templates import (
+    BASE_ENTITY_TEMPLATE_NAME,
+    ENTITY_TEMPLATE_NAME,
+    render_templates,
+    template_sources,
+)
 
-"""
+# ワーカープロセスに1回で渡す文・テーブルの数
+DEFAULT_PARSE_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+DEFAULT_RENDER_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+# ファイル単位でパースする場合に、ワーカープロセスに1回で渡すファイルの数
+DEFAULT_FILE_CHUNK_SIZE = 1
+# パース結果(Table・AlterTableなど)のクラスの構成を変えた場合に上げる(ParseCacheのキーに含める)
+SCHEMA_IR_VERSION = 3
+# relationshipのlazyに指定できる読み込み方法
+RELATIONSHIP_LOADING_STRATEGIES = (
+    "select",
+    "joined",
+    "selectin",
+    "subquery",
+    "immediate",
+    "raise",
+    "raise_on_sql",
+    "noload",
+)
+DEFAULT_RELATIONSHIP_LOADING = "raise"
+# カラム定義のCURRENT_TIMESTAMPのデフォルト値
+CURRENT_TIMESTAMP_DEFAULT = "CURRENT_TIMESTAMP()"
+# server_defaultをtext()ではなくfuncで出力するデフォルト値(現在日時の関数)
+SERVER_DEFAULT_FUNCTIONS = {
+    CURRENT_TIMESTAMP_DEFAULT: "func.now()",
+    "CURRENT_DATE": "func.current_date()",
+    "CURRENT_TIME()": "func.current_time()",
+}
+# 連番(autoincrement)のカラムの型
+_SERIAL_TYPES = ("SERIAL", "SMALLSERIAL", "BIGSERIAL")
+# #をコメント、引用符内のバックスラッシュをエスケープとして扱う方言
+_MYSQL_DIALECTS = ("mysql", "doris", "starrocks", "singlestore")
 
 
 class DataType(Enum):
@@ -63,8 +109,11 @@ class DataType(Enum):
     DATE = "date"
     DATETIME = "datetime"
     TIME = "time"
+    BIGINT = "bigint"
+    DECIMAL = "decimal"
+    UUID = "uuid"
 
-    def __eq__(self, other):
+    def __eq__(self, other: object) -> bool:
         if isinstance(other, DataType):
             return self.value == other.value
         elif isinstance(other, str):
@@ -77,25 +126,31 @@ class DataType(Enum):
         return DataType(value)
 
     @staticmethod
-    def from_columndef(type_str: str):
-        if type_str in ["INT", "INTEGER", "SERIAL", "BIGINT"]:
+    def from_columndef(type_str: str) -> DataType:
+        if type_str in ["INT", "INTEGER", "SERIAL", "SMALLSERIAL"]:
             return DataType.INT
+        elif type_str in ["BIGINT", "UBIGINT", "BIGSERIAL"]:
+            return DataType.BIGINT
         elif type_str in ["VARCHAR", "CHAR", "TEXT"]:
             return DataType.STRING
         elif type_str in ["BOOLEAN", "BOOL", "TINYINT"]:
             return DataType.BOOL
-        elif type_str in ["FLOAT", "DOUBLE", "REAL", "NUMERIC", "DECIMAL"]:
+        elif type_str in ["FLOAT", "DOUBLE", "REAL"]:
             return DataType.FLOAT
+        elif type_str in ["NUMERIC", "DECIMAL"]:
+            return DataType.DECIMAL
         elif type_str in ["DATE"]:
             return DataType.DATE
         elif type_str in ["DATETIME", "TIMESTAMP"]:
             return DataType.DATETIME
         elif type_str in ["TIME"]:
             return DataType.TIME
+        elif type_str in ["UUID"]:
+            return DataType.UUID
         else:
             raise ValueError(f"Unsupported data type: {type_str}")
 
-    def to_sqlalchemy(self):
+    def to_sqlalchemy(self) -> type[TypeEngine[Any]]:
         """
         SQLAlchemy の Column 型を返す
         """
@@ -113,10 +168,16 @@ class DataType(Enum):
             return DateTime
         elif self is DataType.TIME:
             return Time
+        elif self is DataType.BIGINT:
+            return BigInteger
+        elif self is DataType.DECIMAL:
+            return Numeric
+        elif self is DataType.UUID:
+            return Uuid
         else:
             raise ValueError(f"Unsupported data type: {self}")
 
-    def to_python_type(self):
+    def to_python_type(self) -> type:
         """
         Python の型を返す
         """
@@ -134,11 +195,30 @@ class DataType(Enum):
             return datetime
         elif self is DataType.TIME:
             return time
+        elif self is DataType.BIGINT:
+            return int
+        elif self is DataType.DECIMAL:
+            return Decimal
+        elif self is DataType.UUID:
+            return UUID
         else:
             raise ValueError(f"Unsupported data type: {self}")
 
 
 class Column:
+    """
+    カラム定義
+
+    notes:
+        * lengthは型の1つ目の引数(VARCHARの長さ・NUMERICの精度)、scaleはNUMERICの位取り
+        * defaultはDEFAULTの式のSQL(現在日時の関数はSERVER_DEFAULT_FUNCTIONSのキー)
+        * autoincrementはSERIAL・AUTO_INCREMENT・nextval()の連番、identityは
+        GENERATED ... AS IDENTITYの種類(IDENTITY_ALWAYS・IDENTITY_BY_DEFAULT)
+    """
+
+    IDENTITY_ALWAYS = "always"
+    IDENTITY_BY_DEFAULT = "by default"
+
     name: str
     data_type: DataType
     length: int | None
@@ -146,6 +226,9 @@ class Column:
     primary_key: bool
     unique: bool
     default: str | None
+    scale: int | None
+    autoincrement: bool
+    identity: str | None
 
     def __init__(
         self,
@@ -156,6 +239,9 @@ class Column:
         primary_key: bool = False,
         unique: bool = False,
         default: str | None = None,
+        scale: int | None = None,
+        autoincrement: bool = False,
+        identity: str | None = None,
     ):
         self.name = name
         self.data_type = data_type
@@ -164,11 +250,43 @@ class Column:
         self.primary_key = primary_key
         self.unique = unique
         self.default = default
+        self.scale = scale
+        self.autoincrement = autoincrement
+        self.identity = identity
 
-    def __repr__(self):
-        return f"Column(name={self.name}, data_type={self.data_type}, length={self.length}, nullable={self.nullable}, primary_key={self.primary_key}, unique={self.unique}, default={self.default})"
+    def to_ir(self) -> ColumnIR:
+        return ColumnIR(
+            self.name,
+            self.data_type.value,
+            self.length,
+            self.scale,
+            self.nullable,
+            self.primary_key,
+            self.unique,
+            self.default,
+            self.autoincrement,
+            self.identity,
+        )
 
-    def __eq__(self, other):
+    @classmethod
+    def from_ir(cls, ir: ColumnIR) -> Column:
+        return cls(
+            ir.name,
+            DataType(ir.data_type),
+            ir.length,
+            ir.nullable,
+            ir.primary_key,
+            ir.unique,
+            ir.default,
+            ir.scale,
+            ir.autoincrement,
+            ir.identity,
+        )
+
+    def __repr__(self) -> str:
+        return f"Column(name={self.name}, data_type={self.data_type}, length={self.length}, nullable={self.nullable}, primary_key={self.primary_key}, unique={self.unique}, default={self.default}, scale={self.scale}, autoincrement={self.autoincrement}, identity={self.identity})"
+
+    def __eq__(self, other: object) -> bool:
         if not isinstance(other, Column):
             return super().__eq__(other)
 
@@ -181,134 +299,1724 @@ class Column:
                 self.primary_key == other.primary_key,
                 self.unique == other.unique,
                 self.default == other.default,
+                self.scale == other.scale,
+                self.autoincrement == other.autoincrement,
+                self.identity == other.identity,
             )
         )
 
 
+class ForeignKey:
+    """
+    外部キー制約。columnsからreferred_tableのreferred_columnsを参照する
+    """
+
+    columns: list[str]
+    referred_table: str
+    referred_columns: list[str]
+    name: str | None
+    ondelete: str | None
+    onupdate: str | None
+
+    def __init__(
+        self,
+        columns: list[str],
+        referred_table: str,
+        referred_columns: list[str],
+        name: str | None = None,
+        ondelete: str | None = None,
+        onupdate: str | None = None,
+    ):
+        self.columns = columns
+        self.referred_table = referred_table
+        self.referred_columns = referred_columns
+        self.name = name
+        self.ondelete = ondelete
+        self.onupdate = onupdate
+
+    def to_ir(self) -> ForeignKeyIR:
+        return ForeignKeyIR(
+            tuple(self.columns),
+            self.referred_table,
+            tuple(self.referred_columns),
+            self.name,
+            self.ondelete,
+            self.onupdate,
+        )
+
+    @classmethod
+    def from_ir(cls, ir: ForeignKeyIR) -> ForeignKey:
+        return cls(
+            list(ir.columns),
+            ir.referred_table,
+            list(ir.referred_columns),
+            ir.name,
+            ir.ondelete,
+            ir.onupdate,
+        )
+
+    def __repr__(self) -> str:
+        return f"ForeignKey(columns={self.columns}, referred_table={self.referred_table}, referred_columns={self.referred_columns}, name={self.name}, ondelete={self.ondelete}, onupdate={self.onupdate})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ForeignKey):
+            return super().__eq__(other)
+        return repr(self) == repr(other)
+
+
+class UniqueConstraint:
+    """
+    複数カラムの一意制約(1カラムの場合はColumn.uniqueで表す)
+    """
+
+    columns: list[str]
+    name: str | None
+
+    def __init__(self, columns: list[str], name: str | None = None):
+        self.columns = columns
+        self.name = name
+
+    def to_ir(self) -> UniqueConstraintIR:
+        return UniqueConstraintIR(tuple(self.columns), self.name)
+
+    @classmethod
+    def from_ir(cls, ir: UniqueConstraintIR) -> UniqueConstraint:
+        return cls(list(ir.columns), ir.name)
+
+    def __repr__(self) -> str:
+        return f"UniqueConstraint(columns={self.columns}, name={self.name})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UniqueConstraint):
+            return super().__eq__(other)
+        return repr(self) == repr(other)
+
+
+class Index:
+    """
+    インデックス(CREATE INDEX文、MySQLのテーブル定義内のINDEX・KEY)
+    """
+
+    table_name: str
+    columns: list[str]
+    name: str | None
+    unique: bool
+
+    def __init__(
+        self,
+        table_name: str,
+        columns: list[str],
+        name: str | None = None,
+        unique: bool = False,
+    ):
+        self.table_name = table_name
+        self.columns = columns
+        self.name = name
+        self.unique = unique
+
+    def to_ir(self) -> IndexIR:
+        return IndexIR(tuple(self.columns), self.name, self.unique)
+
+    @classmethod
+    def from_ir(cls, table_name: str, ir: IndexIR) -> Index:
+        return cls(table_name, list(ir.columns), ir.name, ir.unique)
+
+    def __repr__(self) -> str:
+        return f"Index(table_name={self.table_name}, columns={self.columns}, name={self.name}, unique={self.unique})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Index):
+            return super().__eq__(other)
+        return repr(self) == repr(other)
+
+
+class ColumnChange:
+    """
+    ALTER TABLEによるカラムの変更(ADD / DROP / RENAME COLUMN)
+
+    notes:
+        * kind=ADDの場合はcolumn、kind=RENAMEの場合はnew_nameを持つ
+    """
+
+    ADD = "add"
+    DROP = "drop"
+    RENAME = "rename"
+
+    kind: str
+    name: str
+    column: Column | None
+    new_name: str | None
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        column: Column | None = None,
+        new_name: str | None = None,
+    ):
+        self.kind = kind
+        self.name = name
+        self.column = column
+        self.new_name = new_name
+
+    def __repr__(self) -> str:
+        return f"ColumnChange(kind={self.kind}, name={self.name}, column={self.column}, new_name={self.new_name})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ColumnChange):
+            return super().__eq__(other)
+        return repr(self) == repr(other)
+
+
+class AlterTable:
+    """
+    テーブルに対する変更(ALTER TABLE文、CREATE TABLE文のテーブル制約)
+
+    notes:
+        * パース時には対象のテーブルのカラムが分からないため、変更を集めておき、
+        applyでテーブルに反映する
+        * カラムの変更(column_changes)を順に反映してから制約を追加する
+        * テーブル名の変更(new_name)は、他のテーブルからの参照も変わるためbuild_tablesで反映する
+    """
+
+    table_name: str
+    column_changes: list[ColumnChange]
+    primary_key: list[str]
+    foreign_keys: list[ForeignKey]
+    unique_constraints: list[UniqueConstraint]
+    indexes: list[Index]
+    new_name: str | None
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.column_changes = []
+        self.primary_key = []
+        self.foreign_keys = []
+        self.unique_constraints = []
+        self.indexes = []
+        self.new_name = None
+
+    def __repr__(self) -> str:
+        return f"AlterTable(table_name={self.table_name}, column_changes={self.column_changes}, primary_key={self.primary_key}, foreign_keys={self.foreign_keys}, unique_constraints={self.unique_constraints}, indexes={self.indexes}, new_name={self.new_name})"
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.column_changes
+            or self.primary_key
+            or self.foreign_keys
+            or self.unique_constraints
+            or self.indexes
+            or self.new_name
+        )
+
+    def apply(self, table: Table) -> None:
+        """
+        カラムの変更・制約をテーブルに反映する
+
+        notes:
+            * 削除したカラムを含むインデックス・制約は削除し、名前を変えたカラムは
+            インデックス・制約のカラム名も変える(PostgreSQLと同じ)
+            * 1カラムの主キーはカラムの制約と同じ扱い(一意・NOT NULL)とし、
+            複合主キーは各カラムのprimary_keyで表す
+            * 無名の1カラムの一意制約はColumn.uniqueで表す
+            * 存在しないカラムに対する変更・一意制約・インデックスは無視する
+        """
+        for change in self.column_changes:
+            _apply_column_change(table, change)
+
+        columns = {column.name: column for column in table.columns}
+        for column_name in self.primary_key:
+            if column_name in columns:
+                column = columns[column_name]
+                column.primary_key = True
+                column.nullable = False
+                column.unique = column.unique or len(self.primary_key) == 1
+
+        for unique_constraint in self.unique_constraints:
+            names = unique_constraint.columns
+            if any(column_name not in columns for column_name in names):
+                continue
+            if len(names) == 1 and unique_constraint.name is None:
+                columns[names[0]].unique = True
+            else:
+                table.unique_constraints.append(unique_constraint)
+
+        table.foreign_keys.extend(self.foreign_keys)
+        table.indexes.extend(
+            index
+            for index in self.indexes
+            if all(column_name in columns for column_name in index.columns)
+        )
+
+
+class DropTable:
+    """
+    DROP TABLE文で削除するテーブル
+    """
+
+    table_names: list[str]
+
+    def __init__(self, table_names: list[str]):
+        self.table_names = table_names
+
+    def __repr__(self) -> str:
+        return f"DropTable(table_names={self.table_names})"
+
+
 class Table:
     name: str
     columns: list[Column]
+    foreign_keys: list[ForeignKey]
+    unique_constraints: list[UniqueConstraint]
+    indexes: list[Index]
+    if_not_exists: bool
 
-    def __init__(self, name: str, columns: list[Column]):
+    def __init__(
+        self,
+        name: str,
+        columns: list[Column],
+        foreign_keys: list[ForeignKey] | None = None,
+        unique_constraints: list[UniqueConstraint] | None = None,
+        indexes: list[Index] | None = None,
+        if_not_exists: bool = False,
+    ):
         self.name = name
         self.columns = columns
+        self.foreign_keys = foreign_keys or []
+        self.unique_constraints = unique_constraints or []
+        self.indexes = indexes or []
+        self.if_not_exists = if_not_exists
+
+    def to_ir(self) -> TableIR:
+        return TableIR(
+            self.name,
+            tuple(column.to_ir() for column in self.columns),
+            tuple(foreign_key.to_ir() for foreign_key in self.foreign_keys),
+            tuple(constraint.to_ir() for constraint in self.unique_constraints),
+            tuple(index.to_ir() for index in self.indexes),
+        )
+
+    def __repr__(self) -> str:
+        return f"Table(name={self.name}, columns={self.columns}, foreign_keys={self.foreign_keys}, unique_constraints={self.unique_constraints}, indexes={self.indexes})"
+
+    @property
+    def primary_key(self) -> list[str]:
+        return [column.name for column in self.columns if column.primary_key]
+
+
+# 文をパースして得られる、スキーマに対する操作(build_tablesで文の順に反映する)
+SchemaOperation = Table | Index | AlterTable | DropTable
+
+
+def operations_to_ir(operations: Iterable[SchemaOperation]) -> ParseResultIR:
+    """
+    パース結果を中間表現にする(ParseCacheにはencode_irの値で保存する)
+    """
+    return ParseResultIR(tuple(_operation_to_ir(operation) for operation in operations))
+
+
+def operations_from_ir(result: ParseResultIR) -> list[SchemaOperation]:
+    """
+    operations_to_irの中間表現からパース結果を復元する。形式が異なる場合はValueError
+    """
+    try:
+        return [_operation_from_ir(operation) for operation in result.operations]
+    except ValueError as error:
+        raise ValueError("Broken parse result") from error
+
+
+def _operation_to_ir(operation: SchemaOperation) -> OperationIR:
+    if isinstance(operation, Table):
+        table = operation.to_ir()
+        return CreateTableIR(
+            table.name,
+            table.columns,
+            table.foreign_keys,
+            table.unique_constraints,
+            table.indexes,
+            operation.if_not_exists,
+        )
+    if isinstance(operation, Index):
+        return CreateIndexIR(
+            operation.table_name,
+            tuple(operation.columns),
+            operation.name,
+            operation.unique,
+        )
+    if isinstance(operation, AlterTable):
+        return AlterTableIR(
+            operation.table_name,
+            tuple(
+                ColumnChangeIR(
+                    change.kind,
+                    change.name,
+                    (change.column.to_ir(),) if change.column else (),
+                    change.new_name,
+                )
+                for change in operation.column_changes
+            ),
+            tuple(operation.primary_key),
+            tuple(foreign_key.to_ir() for foreign_key in operation.foreign_keys),
+            tuple(constraint.to_ir() for constraint in operation.unique_constraints),
+            tuple(index.to_ir() for index in operation.indexes),
+            operation.new_name,
+        )
+    return DropTableIR(tuple(operation.table_names))
+
+
+def _operation_from_ir(operation: OperationIR) -> SchemaOperation:
+    if isinstance(operation, CreateTableIR):
+        return Table(
+            operation.name,
+            [Column.from_ir(column) for column in operation.columns],
+            [ForeignKey.from_ir(foreign_key) for foreign_key in operation.foreign_keys],
+            [
+                UniqueConstraint.from_ir(constraint)
+                for constraint in operation.unique_constraints
+            ],
+            [Index.from_ir(operation.name, index) for index in operation.indexes],
+            operation.if_not_exists,
+        )
+    if isinstance(operation, CreateIndexIR):
+        return Index(
+            operation.table_name,
+            list(operation.columns),
+            operation.name,
+            operation.unique,
+        )
+    if isinstance(operation, AlterTableIR):
+        alter_table = AlterTable(operation.table_name)
+        alter_table.column_changes = [
+            ColumnChange(
+                change.kind,
+                change.name,
+                Column.from_ir(change.column[0]) if change.column else None,
+                change.new_name,
+            )
+            for change in operation.column_changes
+        ]
+        alter_table.primary_key = list(operation.primary_key)
+        alter_table.foreign_keys = [
+            ForeignKey.from_ir(foreign_key) for foreign_key in operation.foreign_keys
+        ]
+        alter_table.unique_constraints = [
+            UniqueConstraint.from_ir(constraint)
+            for constraint in operation.unique_constraints
+        ]
+        alter_table.indexes = [
+            Index.from_ir(operation.table_name, index) for index in operation.indexes
+        ]
+        alter_table.new_name = operation.new_name
+        return alter_table
+    return DropTable(list(operation.table_names))
+
+
+def extract_column(columndef: Expression, dialect: str | None = None) -> Column | None:
+    """
+    カラム定義からカラムを取得する。不備があるカラム定義の場合はNone
+
+    notes:
+        * DEFAULTの式はdialectのSQLにする(server_default=text(...)でそのまま使う)
+        * DEFAULT nextval(...)はシーケンスによる連番とみなし、デフォルト値にはしない
+    """
+    if not isinstance(columndef, ColumnDef) or not columndef.kind:
+        return None
+
+    column_name = columndef.this.name
+    column_type = columndef.kind.this.value
+    column_type_lengths = [
+        int(argument.this.this) for argument in columndef.kind.expressions
+    ]
+    constraints = {
+        c.kind.key: (c.kind.this, c.kind.args.get("allow_null"))
+        for c in columndef.constraints
+    }
+
+    is_primary_key = "primarykeycolumnconstraint" in constraints
+    is_unique = "uniquecolumnconstraint" in constraints or is_primary_key
+    is_autoincrement = (
+        column_type in _SERIAL_TYPES or "autoincrementcolumnconstraint" in constraints
+    )
+    identity = None
+    if "generatedasidentitycolumnconstraint" in constraints:
+        identity = (
+            Column.IDENTITY_ALWAYS
+            if constraints["generatedasidentitycolumnconstraint"][0]
+            else Column.IDENTITY_BY_DEFAULT
+        )
+    # IDENTITY列は暗黙にNOT NULL(PostgreSQLはNULLを許可するIDENTITY列を作成できない)
+    is_not_null = (
+        not constraints.get("notnullcolumnconstraint", (None, True))[1]
+        or is_unique
+        or identity is not None
+    )
+
+    default = None
+    if "defaultcolumnconstraint" in constraints:
+        expression = constraints["defaultcolumnconstraint"][0]
+        if _is_function(expression, "NEXTVAL"):
+            is_autoincrement = True
+        else:
+            default = _default_sql(expression, dialect)
+
+    return Column(
+        name=column_name,
+        data_type=DataType.from_columndef(column_type),
+        length=column_type_lengths[0] if column_type_lengths else None,
+        nullable=not is_not_null,
+        primary_key=is_primary_key,
+        unique=is_unique,
+        default=default,
+        scale=column_type_lengths[1] if len(column_type_lengths) > 1 else None,
+        autoincrement=is_autoincrement,
+        identity=identity,
+    )
+
+
+def _default_sql(expression: Expression, dialect: str | None) -> str:
+    """
+    DEFAULTの式のSQLを返す。引数のない現在日時の関数は方言によらず同じ文字列にする
+    """
+    if _is_function(expression, "NOW"):
+        return CURRENT_TIMESTAMP_DEFAULT
+    if (
+        isinstance(expression, (exp.CurrentTimestamp, exp.CurrentDate, exp.CurrentTime))
+        and str(expression) in SERVER_DEFAULT_FUNCTIONS
+    ):
+        return str(expression)
+    return expression.sql(dialect=dialect)
+
+
+def _is_function(expression: Expression, name: str) -> bool:
+    # sqlglotが解釈しない関数はAnonymousになる
+    return isinstance(expression, exp.Anonymous) and expression.name.upper() == name
+
+
+def extract_columns(schema: Expression, dialect: str | None = None) -> list[Column]:
+    """
+    カラム一覧取得
+    """
+    if not schema.key == "schema":
+        raise ValueError("schema is not found")
+
+    columndefs: list[ColumnDef] = schema.expressions
+
+    columns: list[Column] = []
+    for columndef in columndefs:
+        # 不備があるカラム定義はスキップ
+        if column := extract_column(columndef, dialect):
+            columns.append(column)
+
+    return columns
+
+
+def extract_table(expression: Expression, dialect: str | None = None) -> Table | None:
+    """
+    CREATE TABLE文からテーブルを取得する。テーブル定義でない場合はNone
+
+    notes:
+        * カラムの外部キー(REFERENCES)と、テーブル制約(PRIMARY KEY, UNIQUE,
+        FOREIGN KEY, MySQLのINDEX・KEY)も取得する(反映のしかたはAlterTable.applyを参照)
+    """
+    schema = expression.this
+    # パースできない文はCommand(thisは文字列)になる
+    if not isinstance(schema, Expression) or not schema.key == "schema":
+        return None
+
+    table = Table(
+        name=schema.this.this.this,
+        columns=extract_columns(schema, dialect),
+        if_not_exists=bool(expression.args.get("exists")),
+    )
+    names = {column.name for column in table.columns}
+
+    for columndef in schema.expressions:
+        if isinstance(columndef, ColumnDef) and columndef.this.name in names:
+            table.foreign_keys.extend(_column_foreign_keys(columndef))
+
+    constraints = AlterTable(table.name)
+    for definition in schema.expressions:
+        _extract_table_constraint(constraints, definition)
+    constraints.apply(table)
+
+    return table
+
 
-    def __repr__(self):
-        return f"Table(name={self.name}, columns={self.columns})"
+def extract_index(expression: Expression) -> Index | None:
+    """
+    CREATE INDEX文からインデックスを取得する
+
+    notes:
+        * インデックスでない場合・式インデックス(lower(email)など)の場合はNone
+    """
+    index = expression.this
+    if expression.args.get("kind") != "INDEX" or index is None or index.key != "index":
+        return None
+    table = index.args.get("table")
+    params = index.args.get("params")
+    columns = _column_names(params.args.get("columns") or []) if params else None
+    if table is None or not columns:
+        return None
+    return Index(
+        table_name=table.name,
+        columns=columns,
+        name=index.name or None,
+        unique=bool(expression.args.get("unique")),
+    )
+
+
+def extract_alter_table(
+    expression: Expression, dialect: str | None = None
+) -> AlterTable | None:
+    """
+    ALTER TABLE文からテーブルに対する変更を取得する
+
+    notes:
+        * ADD / DROP / RENAME COLUMN, RENAME TO, ADD CONSTRAINTを扱う
+        (pg_dumpは主キー・一意制約・外部キーをテーブル定義の後にADD CONSTRAINTで出力する)
+        * 扱える変更を含まない場合(OWNER TO, ALTER COLUMNなど)はNone
+    """
+    if expression.key != "alter" or expression.args.get("kind") != "TABLE":
+        return None
+    alter_table = AlterTable(expression.this.name)
+    for action in expression.args.get("actions") or []:
+        if isinstance(action, ColumnDef):
+            if column := extract_column(action, dialect):
+                alter_table.column_changes.append(
+                    ColumnChange(ColumnChange.ADD, column.name, column=column)
+                )
+                alter_table.foreign_keys.extend(_column_foreign_keys(action))
+        elif action.key == "drop" and action.args.get("kind") == "COLUMN":
+            alter_table.column_changes.append(
+                ColumnChange(ColumnChange.DROP, action.this.name)
+            )
+        elif action.key == "renamecolumn":
+            alter_table.column_changes.append(
+                ColumnChange(
+                    ColumnChange.RENAME,
+                    action.this.name,
+                    new_name=action.args["to"].name,
+                )
+            )
+        elif action.key == "alterrename":
+            alter_table.new_name = action.this.name
+        elif action.key == "addconstraint":
+            for definition in action.expressions:
+                _extract_table_constraint(alter_table, definition)
+    return alter_table or None
+
+
+def build_tables(operations: Iterable[SchemaOperation]) -> list[Table]:
+    """
+    スキーマに対する操作を順に反映して、テーブル一覧を返す
+
+    notes:
+        * 同じ名前のテーブルを作成した場合は置き換える(IF NOT EXISTSの場合は何もしない)
+        * テーブル名・カラム名の変更は、他のテーブルの外部キーの参照先にも反映する
+        * 存在しないテーブル・カラムに対するインデックス・変更は無視する
+        * 最後に、参照先のカラムを省略した外部キーを参照先テーブルの主キーで補う
+    """
+    tables: dict[str, Table] = {}
+    for operation in operations:
+        if isinstance(operation, Table):
+            if operation.if_not_exists and operation.name in tables:
+                continue
+            tables.pop(operation.name, None)
+            tables[operation.name] = operation
+        elif isinstance(operation, DropTable):
+            for table_name in operation.table_names:
+                tables.pop(table_name, None)
+        elif (table := tables.get(operation.table_name)) is None:
+            continue
+        elif isinstance(operation, Index):
+            names = {column.name for column in table.columns}
+            if all(column in names for column in operation.columns):
+                table.indexes.append(operation)
+        else:
+            operation.apply(table)
+            for change in operation.column_changes:
+                if change.kind == ColumnChange.RENAME and change.new_name:
+                    _rename_referred_column(
+                        tables, table.name, change.name, change.new_name
+                    )
+            if operation.new_name and operation.new_name not in tables:
+                _rename_table(tables, table, operation.new_name)
+
+    for table in tables.values():
+        for foreign_key in table.foreign_keys:
+            referred = tables.get(foreign_key.referred_table)
+            if not foreign_key.referred_columns and referred is not None:
+                foreign_key.referred_columns = referred.primary_key
+    return list(tables.values())
+
+
+def _apply_column_change(table: Table, change: ColumnChange) -> None:
+    names = [column.name for column in table.columns]
+    if change.kind == ColumnChange.ADD:
+        if change.column is not None and change.name not in names:
+            table.columns.append(change.column)
+        return
+    if change.name not in names:
+        return
+
+    if change.kind == ColumnChange.DROP:
+        del table.columns[names.index(change.name)]
+        table.indexes = [
+            index for index in table.indexes if change.name not in index.columns
+        ]
+        table.unique_constraints = [
+            unique_constraint
+            for unique_constraint in table.unique_constraints
+            if change.name not in unique_constraint.columns
+        ]
+        table.foreign_keys = [
+            foreign_key
+            for foreign_key in table.foreign_keys
+            if change.name not in foreign_key.columns
+        ]
+    elif (
+        change.kind == ColumnChange.RENAME
+        and change.new_name is not None
+        and change.new_name not in names
+    ):
+        table.columns[names.index(change.name)].name = change.new_name
+        constraints: list[Index | UniqueConstraint | ForeignKey] = [
+            *table.indexes,
+            *table.unique_constraints,
+            *table.foreign_keys,
+        ]
+        for constraint in constraints:
+            constraint.columns = _renamed(
+                constraint.columns, change.name, change.new_name
+            )
+
+
+def _rename_referred_column(
+    tables: dict[str, Table], table_name: str, old_name: str, new_name: str
+) -> None:
+    for table in tables.values():
+        for foreign_key in table.foreign_keys:
+            if foreign_key.referred_table == table_name:
+                foreign_key.referred_columns = _renamed(
+                    foreign_key.referred_columns, old_name, new_name
+                )
+
+
+def _rename_table(tables: dict[str, Table], table: Table, new_name: str) -> None:
+    old_name = table.name
+    del tables[old_name]
+    table.name = new_name
+    tables[new_name] = table
+    for index in table.indexes:
+        index.table_name = new_name
+    for other in tables.values():
+        for foreign_key in other.foreign_keys:
+            if foreign_key.referred_table == old_name:
+                foreign_key.referred_table = new_name
+
+
+def _renamed(columns: list[str], old_name: str, new_name: str) -> list[str]:
+    return [new_name if column == old_name else column for column in columns]
+
+
+def _column_names(expressions: list[Expression]) -> list[str] | None:
+    """
+    インデックス・制約のカラム名一覧を返す。カラム以外の式を含む場合はNone
+    """
+    names: list[str] = []
+    for expression in expressions:
+        if expression.key == "ordered":
+            expression = expression.this
+        if expression.key not in ("column", "identifier"):
+            return None
+        names.append(expression.name)
+    return names
+
+
+def _column_foreign_keys(columndef: ColumnDef) -> list[ForeignKey]:
+    """
+    カラム定義のREFERENCESから外部キーを取得する
+    """
+    return [
+        _extract_foreign_key([columndef.this.name], constraint.kind)
+        for constraint in columndef.constraints
+        if constraint.kind.key == "reference"
+    ]
+
+
+def _extract_foreign_key(
+    columns: list[str], reference: Expression, name: str | None = None
+) -> ForeignKey:
+    target = reference.this
+    referred_columns: list[str] = []
+    if target.key == "schema":
+        referred_columns = _column_names(target.expressions) or []
+        target = target.this
+
+    actions: dict[str, str] = {}
+    for option in reference.args.get("options") or []:
+        words = str(option).upper().split(None, 2)
+        if len(words) == 3 and words[0] == "ON":
+            actions[words[1]] = words[2]
+
+    return ForeignKey(
+        columns=columns,
+        referred_table=target.name,
+        referred_columns=referred_columns,
+        name=name,
+        ondelete=actions.get("DELETE"),
+        onupdate=actions.get("UPDATE"),
+    )
+
+
+def _extract_table_constraint(
+    constraints: AlterTable, definition: Expression, name: str | None = None
+) -> None:
+    """
+    テーブル制約(CONSTRAINT nameで名前を付けたものを含む)をconstraintsに追加する
+    """
+    key = definition.key
+    if key == "constraint":
+        for expression in definition.expressions:
+            _extract_table_constraint(constraints, expression, definition.name or None)
+    elif key == "primarykey":
+        constraints.primary_key = _column_names(definition.expressions) or []
+    elif key == "uniquecolumnconstraint" and definition.this is not None:
+        target = definition.this
+        names = _column_names(target.expressions)
+        if names:
+            constraints.unique_constraints.append(
+                UniqueConstraint(names, name or (target.name or None))
+            )
+    elif key == "foreignkey":
+        names = _column_names(definition.expressions)
+        reference = definition.args.get("reference")
+        if names and reference is not None:
+            constraints.foreign_keys.append(
+                _extract_foreign_key(names, reference, name)
+            )
+    elif key == "indexcolumnconstraint":
+        names = _column_names(definition.expressions)
+        if names:
+            constraints.indexes.append(
+                Index(constraints.table_name, names, name=definition.name or name)
+            )
+
+
+def parse_tables(
+    statements: list[str], dialect: str
+) -> tuple[list[SchemaOperation], int]:
+    """
+    文をパースして、スキーマに対する操作を文の順に返す(ワーカープロセスで実行する)
+
+    notes:
+        * ASTはテーブル・カラムを取り出した後に破棄し、呼び出し元には返さない
+        * 操作は全ての文をパースした後にbuild_tablesで反映する
+        * DROP TABLE文は複数のテーブルを指定できるため、sqlglotを使わずに解釈する
+        * 戻り値は(操作の一覧, パースした文の数)
+    """
+    operations: list[SchemaOperation] = []
+    for statement in statements:
+        if (table_names := drop_table_names(statement)) is not None:
+            operations.append(DropTable(table_names))
+            continue
+        for expression in parse(statement, read=dialect):
+            if not expression:
+                continue
+            if operation := (
+                extract_table(expression, dialect)
+                or extract_index(expression)
+                or extract_alter_table(expression, dialect)
+            ):
+                operations.append(operation)
+    return operations, len(statements)
+
+
+def parse_tables_parallel(
+    statements: Iterable[str],
+    dialect: str,
+    max_workers: int | None = None,
+    chunk_size: int = DEFAULT_PARSE_CHUNK_SIZE,
+) -> Iterator[tuple[list[SchemaOperation], int]]:
+    """
+    文をchunk_sizeずつワーカープロセスでパースし、parse_tablesの結果を入力順に返す
+    """
+    return map_chunks(
+        partial(parse_tables, dialect=dialect), statements, max_workers, chunk_size
+    )
+
+
+def parse_sql_files(
+    files: list[str], dialect: str
+) -> list[tuple[list[SchemaOperation], int]]:
+    """
+    ファイルごとにスキーマ定義の文を読み込んでパースし、parse_tablesの結果を返す
+    (ワーカープロセスで実行する)
+    """
+    mysql = dialect in _MYSQL_DIALECTS
+    return [
+        parse_tables(
+            list(
+                iter_schema_statements(
+                    file, hash_comments=mysql, backslash_escapes=mysql
+                )
+            ),
+            dialect,
+        )
+        for file in files
+    ]
+
+
+def entity_class_name(table_name: str) -> str:
+    """
+    テーブル名からEntityのクラス名を返す
+    """
+    return "".join(part.capitalize() for part in table_name.split("_")) + "Entity"
+
+
+def build_relationships(
+    tables: list[Table], lazy: str = DEFAULT_RELATIONSHIP_LOADING
+) -> dict[str, list[dict[str, str]]]:
+    """
+    外部キーから、テーブルごとのrelationshipのコンテキストを計算する
+
+    notes:
+        * 参照元には参照先のEntity、参照先には参照元のEntityのlistを、
+        back_populatesで対にして出力する
+        * 読み込み方法はlazyで明示する。既定のraiseでは、selectinloadなどを指定せずに
+        アクセスした場合に、暗黙のSQLを発行せずに例外にする
+        * 同じテーブルへの外部キーが複数ある場合はforeign_keys、
+        自己参照の場合はremote_sideを指定する
+        * 参照先がテーブル一覧にない外部キーのrelationshipは出力しない
+    """
+    tables_by_name = {table.name: table for table in tables}
+    used_names = {
+        table.name: {column.name for column in table.columns} for table in tables
+    }
+    relationships: dict[str, list[dict[str, str]]] = {
+        table.name: [] for table in tables
+    }
+
+    for table in tables:
+        foreign_keys = [
+            foreign_key
+            for foreign_key in table.foreign_keys
+            if foreign_key.referred_table in tables_by_name
+            and foreign_key.referred_columns
+        ]
+        targets = Counter(foreign_key.referred_table for foreign_key in foreign_keys)
+        class_name = entity_class_name(table.name)
+        columns = {column.name: column for column in table.columns}
+
+        for foreign_key in foreign_keys:
+            parent = tables_by_name[foreign_key.referred_table]
+            parent_class_name = entity_class_name(parent.name)
+            ambiguous = targets[parent.name] > 1
+            self_referential = parent.name == table.name
+
+            # user_id → user, 同じテーブルへの外部キーが複数ある場合は created_by → created_by_user
+            column_name = foreign_key.columns[0]
+            if len(foreign_key.columns) == 1 and column_name.endswith("_id"):
+                name = column_name.removesuffix("_id") or parent.name
+            elif len(foreign_key.columns) == 1 and ambiguous:
+                name = f"{column_name}_{parent.name}"
+            else:
+                name = parent.name
+            name = _unique_name(name, used_names[table.name])
+
+            plural = (
+                f"{table.name}_list" if table.name.endswith("s") else f"{table.name}s"
+            )
+            if ambiguous or self_referential:
+                plural = f"{name}_{plural}"
+            collection_name = _unique_name(plural, used_names[parent.name])
+
+            foreign_keys_argument = (
+                f'foreign_keys="{_attributes(class_name, foreign_key.columns)}", '
+                if ambiguous
+                else ""
+            )
+            remote_side_argument = (
+                f'remote_side="{_attributes(class_name, foreign_key.referred_columns)}", '
+                if self_referential
+                else ""
+            )
+            nullable = any(
+                columns[column].nullable
+                for column in foreign_key.columns
+                if column in columns
+            )
+
+            relationships[table.name].append(
+                {
+                    "name": name,
+                    "table_name": parent.name,
+                    "class_name": parent_class_name,
+                    "annotation": (
+                        f'"{parent_class_name} | None"'
+                        if nullable
+                        else f'"{parent_class_name}"'
+                    ),
+                    "arguments": f'back_populates="{collection_name}", '
+                    f"{foreign_keys_argument}{remote_side_argument}"
+                    f'lazy="{lazy}"',
+                }
+            )
+            relationships[parent.name].append(
+                {
+                    "name": collection_name,
+                    "table_name": table.name,
+                    "class_name": class_name,
+                    "annotation": f'list["{class_name}"]',
+                    "arguments": f'back_populates="{name}", '
+                    f'{foreign_keys_argument}lazy="{lazy}"',
+                }
+            )
+
+    return relationships
+
+
+def entity_context(
+    table: Table,
+    output_dir: str,
+    relationships: list[dict[str, str]] | None = None,
+    eager_defaults: bool = False,
+) -> dict[str, Any]:
+    """
+    1テーブル分のテンプレートのコンテキストを、カラムを1回走査して計算する
+
+    notes:
+        * ワーカープロセスに渡すため、値は文字列・数値などのpickle可能なものに限る
+        * table_name・class_name・columns(カラムごとの型名・制約)・table_args・
+        relationships(build_relationshipsを参照)・related_imports・sqlalchemy_imports・
+        orm_imports・datetime_imports・python_imports・eager_defaults・output_dir
+        をテンプレートに渡す
+        * DEFAULTはserver_default(現在日時の関数はfunc、それ以外はtext)に、
+        GENERATED ... AS IDENTITYはIdentity()に、連番はautoincrement=Trueにする
+        * 1カラムの外部キー・名前が既定(ix_テーブル名_カラム名)か無名の1カラムの
+        インデックスはmapped_columnに、それ以外は__table_args__に出力する
+    """
+    package = output_dir.replace("/", ".")
+    sqlalchemy_imports: set[str] = set()
+    table_args: list[str] = []
+
+    inline_foreign_keys: dict[str, str] = {}
+    for foreign_key in table.foreign_keys:
+        if not foreign_key.referred_columns:
+            continue
+        options = "".join(
+            f', {option}="{value}"'
+            for option, value in (
+                ("name", foreign_key.name),
+                ("ondelete", foreign_key.ondelete),
+                ("onupdate", foreign_key.onupdate),
+            )
+            if value
+        )
+        referred_columns = [
+            f"{foreign_key.referred_table}.{column}"
+            for column in foreign_key.referred_columns
+        ]
+        column_name = foreign_key.columns[0]
+        if len(foreign_key.columns) == 1 and column_name not in inline_foreign_keys:
+            sqlalchemy_imports.add("ForeignKey")
+            inline_foreign_keys[column_name] = (
+                f'ForeignKey("{referred_columns[0]}"{options})'
+            )
+        else:
+            sqlalchemy_imports.add("ForeignKeyConstraint")
+            table_args.append(
+                f"ForeignKeyConstraint({_string_list(foreign_key.columns)}, "
+                f"{_string_list(referred_columns)}{options})"
+            )
+
+    for unique_constraint in table.unique_constraints:
+        sqlalchemy_imports.add("UniqueConstraint")
+        name = f', name="{unique_constraint.name}"' if unique_constraint.name else ""
+        table_args.append(
+            f"UniqueConstraint({_string_arguments(unique_constraint.columns)}{name})"
+        )
+
+    inline_indexes: set[str] = set()
+    for index in table.indexes:
+        column_name = index.columns[0]
+        if (
+            len(index.columns) == 1
+            and not index.unique
+            and index.name in (None, f"ix_{table.name}_{column_name}")
+            and column_name not in inline_indexes
+        ):
+            inline_indexes.add(column_name)
+            continue
+        sqlalchemy_imports.add("Index")
+        name = index.name or f"ix_{table.name}_{'_'.join(index.columns)}"
+        unique = ", unique=True" if index.unique else ""
+        table_args.append(
+            f'Index("{name}", {_string_arguments(index.columns)}{unique})'
+        )
+
+    columns: list[dict[str, Any]] = []
+    python_types: set[type] = set()
+    for column in table.columns:
+        data_type = column.data_type
+        python_type = data_type.to_python_type()
+        python_types.add(python_type)
+        sqlalchemy_type = data_type.to_sqlalchemy().__name__
+        sqlalchemy_imports.add(sqlalchemy_type)
+
+        server_default = None
+        if column.default in SERVER_DEFAULT_FUNCTIONS:
+            sqlalchemy_imports.add("func")
+            server_default = SERVER_DEFAULT_FUNCTIONS[column.default]
+        elif column.default is not None:
+            sqlalchemy_imports.add("text")
+            server_default = f"text({_python_string(column.default)})"
+        identity = None
+        if column.identity:
+            sqlalchemy_imports.add("Identity")
+            always = "always=True" if column.identity == Column.IDENTITY_ALWAYS else ""
+            identity = f"Identity({always})"
+
+        columns.append(
+            {
+                "name": column.name,
+                "python_type": python_type.__qualname__,
+                "sqlalchemy_type": sqlalchemy_type,
+                "length": column.length,
+                "type_arguments": ", ".join(
+                    str(argument)
+                    for argument in (column.length, column.scale)
+                    if argument is not None
+                ),
+                "nullable": column.nullable,
+                "primary_key": column.primary_key,
+                "unique": column.unique,
+                "server_default": server_default,
+                "identity": identity,
+                "autoincrement": column.autoincrement and not identity,
+                "foreign_key": inline_foreign_keys.get(column.name),
+                "index": column.name in inline_indexes,
+            }
+        )
+
+    datetime_imports = [
+        python_type.__name__
+        for python_type in (datetime, date, time)
+        if python_type in python_types
+    ]
+    python_imports = [
+        f"from {python_type.__module__} import {python_type.__name__}"
+        for python_type in (Decimal, UUID)
+        if python_type in python_types
+    ]
+    if datetime_imports:
+        python_imports.insert(0, f"from datetime import {', '.join(datetime_imports)}")
+    relationships = relationships or []
+    related_imports = sorted(
+        {
+            f"from {package}.{relationship['table_name']}_entity "
+            f"import {relationship['class_name']}"
+            for relationship in relationships
+            if relationship["table_name"] != table.name
+        }
+    )
+    return {
+        "table_name": table.name,
+        "class_name": entity_class_name(table.name),
+        "columns": columns,
+        "table_args": table_args,
+        "relationships": relationships,
+        "related_imports": related_imports,
+        "sqlalchemy_imports": sorted(sqlalchemy_imports),
+        "orm_imports": ["Mapped", "mapped_column"]
+        + (["relationship"] if relationships else []),
+        "datetime_imports": datetime_imports,
+        "python_imports": python_imports,
+        "eager_defaults": eager_defaults,
+        "output_dir": package,
+    }
+
+
+def _unique_name(name: str, used: set[str]) -> str:
+    """
+    usedと重複しない属性名を返し、usedに追加する
+    """
+    candidate = name
+    number = 2
+    while candidate in used:
+        candidate = f"{name}_{number}"
+        number += 1
+    used.add(candidate)
+    return candidate
+
+
+def _attributes(class_name: str, columns: list[str]) -> str:
+    return f"[{', '.join(f'{class_name}.{column}' for column in columns)}]"
+
+
+def _string_arguments(values: list[str]) -> str:
+    return ", ".join(f'"{value}"' for value in values)
+
+
+def _python_string(value: str) -> str:
+    """
+    文字列のPythonのリテラルを返す(生成するコードに合わせてダブルクォートを優先する)
+    """
+    literal = repr(value)
+    if literal.startswith("'") and '"' not in value:
+        return f'"{literal[1:-1]}"'
+    return literal
+
+
+def _string_list(values: list[str]) -> str:
+    return f"[{_string_arguments(values)}]"
 
 
 class EntityGenerator:
     db_type: str
     output_dir: str
-    asts: list[Expression]
+    input_files: list[str]
+    tables: list[Table]
+    cache_hit: bool
+    profiler: Profiler
+    _cache: GenerationCache | None
+    _cache_key: str | None
+    _cached_files: dict[str, str] | None
+    _package_init: bool
+    _template_dir: str | None
+    _bytecode_cache_dir: str | None
+    _render_workers: int | None
+    _relationship_loading: str | None
+    _parse_cache: ParseCache | None
+    _eager_defaults: bool
+    _schema_cache: SchemaCache | None
+    _schema: SchemaIR | None
+    _file_path: str
+    _migrations: bool
+    _parse_workers: int | None
+    _file_operations: dict[str, tuple[str, list[SchemaOperation]]] | None
+    _rendered: dict[str, tuple[dict[str, Any], str]] | None
+    _template_digest: str | None
+
+    def __init__(
+        self,
+        file_path: str,
+        output_dir: str,
+        db_type: str,
+        cache_dir: str | None = None,
+        cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+        profiler: Profiler | None = None,
+        package_init: bool = False,
+        parse_workers: int | None = 1,
+        template_dir: str | None = None,
+        render_workers: int | None = 1,
+        relationship_loading: str | None = DEFAULT_RELATIONSHIP_LOADING,
+        migrations: bool = False,
+        eager_defaults: bool = False,
+        incremental: bool = False,
+    ):
+        """
+        notes:
+            * file_pathにディレクトリを指定した場合、配下の.sqlファイルをパス順に読み込む
+            * SQLファイルはメモリマップして文に分割し、スキーマ定義の文
+            (CREATE TABLE, CREATE INDEX, ALTER TABLE, DROP TABLE)のみをparse_workersの
+            ワーカープロセスで並列にパースする。INSERT・COPYなどのデータはsqlglotに渡さず、
+            保持するのはテーブル・カラムの情報のみで、ASTは保持しない
+            * cache_dirを指定した場合、SQLファイルの内容が前回と同じであればパースをスキップし、
+            キャッシュされたEntityファイルをexecuteで書き出す。スキーマの中間表現
+            (schema_irを参照)もcache_dir/schemaに保存し、パースせずに返す
+            * profilerを指定した場合、フェーズ(read, cache_lookup, parse, emit,
+            cache_store)ごとの時間とカウンタを記録する
+            * package_init=Trueの場合、Entityを初回アクセス時に遅延importする
+            __init__.pyと、型チェッカー向けの__init__.pyiをexecuteで出力する
+            * template_dirにentity.py.jinja・base_entity.py.jinjaを置くと、組み込みの
+            テンプレートの代わりに使用する(コンテキストはentity_contextを参照)
+            * テンプレートは共有のEnvironmentで1回だけコンパイルし、cache_dirを指定した
+            場合はバイトコードをcache_dir/templatesに保存する。レンダリングは
+            render_workersのワーカープロセスで並列に行う
+            * 外部キー・インデックス(CREATE INDEX文を含む)・複合主キー・一意制約をEntityに出力し、
+            外部キーごとにrelationship_loadingを読み込み方法(lazy)とするrelationshipを出力する。
+            relationship_loading=Noneの場合はrelationshipを出力しない
+            * ALTER TABLE(ADD / DROP / RENAME COLUMN, RENAME TO, ADD CONSTRAINT)・
+            DROP TABLE文は、文の順にテーブルに反映する
+            * migrations=Trueの場合、file_pathのディレクトリをマイグレーションとみなし、
+            ファイル名の数字を数値として比較した順(V2__a.sql → V10__b.sql)に反映する。
+            パースはファイル単位でparse_workersのワーカープロセスで行い、cache_dirを
+            指定した場合はファイルごとのパース結果を内容のハッシュをキーとして
+            cache_dir/migrationsに保存する(追加・変更されたファイルだけをパースする)
+            * DEFAULTはserver_default、SERIAL・AUTO_INCREMENTはautoincrement、
+            GENERATED ... AS IDENTITYはIdentity()としてDB側で値を決める。
+            eager_defaults=Trueの場合は__mapper_args__にeager_defaultsを指定し、
+            INSERT時にRETURNINGでサーバー側のデフォルト値を取得する
+            * parse_workers・render_workersの既定値は1で、ワーカープロセスを起動せずに
+            呼び出し元のプロセスで処理する。2以上(NoneはCPU数)を指定した場合だけ
+            プロセスプールを使う(spawnで起動するmacOS・Windowsでは、呼び出し元のスクリプトに
+            if __name__ == "__main__": の保護が必要)
+            * incremental=Trueの場合、ファイルごとのパース結果とEntityファイルごとの
+            コンテキスト・内容をメモリに保持する。reloadで入力を読み直すと、内容が変わった
+            ファイルだけをパースし、コンテキストが変わったEntityファイルだけをレンダリングする
+        """
+        if (
+            relationship_loading is not None
+            and relationship_loading not in RELATIONSHIP_LOADING_STRATEGIES
+        ):
+            raise ValueError(
+                f"Unsupported relationship loading: {relationship_loading}"
+            )
 
-    def __init__(self, file_path: str, output_dir: str, db_type: str):
         os.makedirs(output_dir, exist_ok=True)
         self.output_dir = output_dir
         self.db_type = db_type
+        self.tables = []
+        self.cache_hit = False
+        self.profiler = profiler or NULL_PROFILER
+        self._cache = None
+        self._cache_key = None
+        self._cached_files = None
+        self._package_init = package_init
+        self._template_dir = template_dir
+        self._bytecode_cache_dir = (
+            os.path.join(cache_dir, "templates") if cache_dir else None
+        )
+        self._render_workers = render_workers
+        self._relationship_loading = relationship_loading
+        self._eager_defaults = eager_defaults
+        self._schema_cache = None
+        self._schema = None
+        self._file_path = file_path
+        self._migrations = migrations
+        self._parse_workers = parse_workers
+        self._file_operations = {} if incremental else None
+        self._rendered = {} if incremental else None
+        self._template_digest = None
+        self._parse_cache = (
+            ParseCache(
+                os.path.join(cache_dir, "migrations"),
+                cache_max_bytes,
+                root_dir=cache_dir,
+            )
+            if cache_dir and migrations
+            else None
+        )
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            self.asts = [ast for ast in parse(f.read(), read=db_type) if ast]
+        with self.profiler.span("read"):
+            self.input_files = iter_sql_files(file_path, natural=migrations)
+            if not self.input_files:
+                raise FileNotFoundError(f"No SQL files found: {file_path}")
+            size = sum(os.path.getsize(file) for file in self.input_files)
+        self.profiler.count("files_loaded", len(self.input_files))
+        self.profiler.count("bytes_read", size)
 
-    def _get_columns(self, schema: Expression) -> list[Column]:
+        if cache_dir:
+            with self.profiler.span("cache_lookup"):
+                self._cache = GenerationCache(cache_dir, cache_max_bytes)
+                base_dir = file_path if os.path.isdir(file_path) else None
+                self._cache_key = compute_cache_key(
+                    [
+                        tool_version("sqlglot", "jinja2"),
+                        self.output_dir,
+                        db_type,
+                        *template_sources(template_dir),
+                        relationship_loading or "",
+                        "migrations" if migrations else "",
+                        "eager_defaults" if eager_defaults else "",
+                        *chain.from_iterable(
+                            (
+                                os.path.relpath(file, base_dir) if base_dir else "",
+                                file_digest(file),
+                            )
+                            for file in self.input_files
+                        ),
+                    ]
+                )
+                self._cached_files = self._cache.get(self._cache_key)
+                self._schema_cache = SchemaCache(
+                    os.path.join(cache_dir, "schema"),
+                    cache_max_bytes,
+                    root_dir=cache_dir,
+                )
+                if self._cached_files is not None:
+                    self._schema = self._schema_cache.get(self._cache_key)
+                    if self._schema is None:
+                        # 中間表現がない場合は、パースからやり直す
+                        self._cached_files = None
+            if self._cached_files is not None:
+                self.profiler.count("cache_hits")
+                self.cache_hit = True
+                return
+
+        self._parse()
+
+    def reload(self) -> None:
         """
-        カラム一覧取得
+        入力を読み直し、テーブル一覧を更新する(incremental=Trueの場合のみ)
+
+        notes:
+            * 追加・削除されたファイルも反映し、内容が変わっていないファイルはパースしない
+            * cache_dirのキャッシュは使用しない(renderは常にパース結果からレンダリングする)
         """
-        if not schema.key == "schema":
-            ValueError("schema is not found")
+        if self._file_operations is None:
+            raise RuntimeError("reload requires incremental=True")
 
-        columndefs: list[ColumnDef] = schema.expressions
+        with self.profiler.span("read"):
+            self.input_files = iter_sql_files(self._file_path, natural=self._migrations)
+            if not self.input_files:
+                raise FileNotFoundError(f"No SQL files found: {self._file_path}")
+        self.profiler.count("files_loaded", len(self.input_files))
+        self.cache_hit = False
+        self._cached_files = None
+        self._schema = None
+        self._parse()
 
-        columns: list[Column] = []
-        for columndef in columndefs:
-            # 不備があるカラム定義はスキップ
-            if columndef.key != "columndef" or not columndef.kind:
-                continue
+    def _parse(self) -> None:
+        with self.profiler.span("parse", dialect=self.db_type):
+            if self._migrations or self._file_operations is not None:
+                operations = self._parse_files(self._parse_workers)
+            else:
+                operations = []
+                for chunk_operations, statement_count in parse_tables_parallel(
+                    self._iter_schema_statements(), self.db_type, self._parse_workers
+                ):
+                    operations.extend(chunk_operations)
+                    self.profiler.count("statements_parsed", statement_count)
+            if self._file_operations is not None:
+                # 保持しているパース結果をbuild_tablesで変更しないよう、コピーを渡す
+                operations = copy.deepcopy(operations)
+            self.tables = build_tables(operations)
+        self.profiler.count("tables_parsed", len(self.tables))
+
+    @classmethod
+    async def create(
+        cls,
+        file_path: str,
+        output_dir: str,
+        db_type: str,
+        cache_dir: str | None = None,
+        cache_max_bytes: int | None = DEFAULT_CACHE_MAX_BYTES,
+        profiler: Profiler | None = None,
+        package_init: bool = False,
+        parse_workers: int | None = 1,
+        template_dir: str | None = None,
+        render_workers: int | None = 1,
+        relationship_loading: str | None = DEFAULT_RELATIONSHIP_LOADING,
+        migrations: bool = False,
+        eager_defaults: bool = False,
+        incremental: bool = False,
+    ) -> EntityGenerator:
+        """
+        イベントループをブロックせずにEntityGeneratorを作成する(引数は__init__と同じ)
+
+        notes:
+            * 読み込み・キャッシュの確認・パースをスレッドで実行する
+            (パース自体はparse_workersのワーカープロセスで行う)
+            * タスクがキャンセルされた場合はすぐにCancelledErrorを送出する。
+            実行中のパースは終わるまで続くが、結果は破棄される
+        """
+        return await asyncio.to_thread(
+            cls,
+            file_path,
+            output_dir,
+            db_type,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            profiler=profiler,
+            package_init=package_init,
+            parse_workers=parse_workers,
+            template_dir=template_dir,
+            render_workers=render_workers,
+            relationship_loading=relationship_loading,
+            migrations=migrations,
+            eager_defaults=eager_defaults,
+            incremental=incremental,
+        )
+
+    def _parse_files(self, parse_workers: int | None) -> list[SchemaOperation]:
+        """
+        ファイルごとのパース結果を、ファイルの順に連結して返す
 
-            column_name = columndef.this.name
-            column_type = columndef.kind.this.value
-            column_type_lengths = [exp.this.this for exp in columndef.kind.expressions]
-            constraints = {
-                c.kind.key: (c.kind.this, c.kind.args.get("allow_null"))
-                for c in columndef.constraints
+        notes:
+            * incremental=Trueの場合は、内容のハッシュが前回と同じファイルのパース結果を
+            メモリから再利用する
+            * パース結果はbuild_tablesで変更されるため、キャッシュにはその前に保存する
+        """
+        parsed: dict[str, list[SchemaOperation]] = {}
+        keys: dict[str, str] = {}
+        digests: dict[str, str] = {}
+        if self._file_operations is not None:
+            for file in self.input_files:
+                digests[file] = file_digest(file)
+                previous = self._file_operations.get(file)
+                if previous is not None and previous[0] == digests[file]:
+                    parsed[file] = previous[1]
+
+        if self._parse_cache:
+            hits = 0
+            for file in self.input_files:
+                if file in parsed:
+                    continue
+                keys[file] = compute_cache_key(
+                    [
+                        tool_version("sqlglot"),
+                        str(SCHEMA_IR_VERSION),
+                        self.db_type,
+                        digests.get(file) or file_digest(file),
+                    ]
+                )
+                if (values := self._parse_cache.get(keys[file])) is None:
+                    continue
+                try:
+                    parsed[file] = operations_from_ir(decode_ir(ParseResultIR, values))
+                except ValueError:
+                    # 形式が異なるエントリはキャッシュミスとして扱う
+                    continue
+                hits += 1
+            self.profiler.count("parse_cache_hits", hits)
+
+        missing = [file for file in self.input_files if file not in parsed]
+        results = map_chunks(
+            partial(parse_sql_files, dialect=self.db_type),
+            missing,
+            parse_workers,
+            DEFAULT_FILE_CHUNK_SIZE,
+        )
+        for file, (operations, statement_count) in zip(
+            missing, chain.from_iterable(results)
+        ):
+            parsed[file] = operations
+            self.profiler.count("statements_parsed", statement_count)
+        self.profiler.count("files_parsed", len(missing))
+
+        if self._parse_cache and missing:
+            self._parse_cache.put_many(
+                (keys[file], encode_ir(operations_to_ir(parsed[file])))
+                for file in missing
+            )
+        if self._file_operations is not None:
+            self._file_operations = {
+                file: (digests[file], parsed[file]) for file in self.input_files
             }
+        return list(chain.from_iterable(parsed[file] for file in self.input_files))
 
-            is_primary_key = "primarykeycolumnconstraint" in constraints
-            is_unique = "uniquecolumnconstraint" in constraints or is_primary_key
-            is_not_null = (
-                not constraints.get("notnullcolumnconstraint", (None, True))[1]
-                or is_unique
+    def _iter_schema_statements(self) -> Iterator[str]:
+        """
+        入力ファイルを順にメモリマップして、スキーマ定義の文
+        (CREATE TABLE, CREATE INDEX, ALTER TABLE, DROP TABLE)のみを返す
+        """
+        mysql = self.db_type in _MYSQL_DIALECTS
+        for file in self.input_files:
+            yield from iter_schema_statements(
+                file, hash_comments=mysql, backslash_escapes=mysql
             )
 
-            column = Column(
-                name=column_name,
-                data_type=DataType.from_columndef(column_type),
-                length=int(column_type_lengths[0]) if column_type_lengths else None,
-                nullable=not is_not_null,
-                primary_key=is_primary_key,
-                unique=is_unique,
-                default=(
-                    str(constraints["defaultcolumnconstraint"][0])
-                    if "defaultcolumnconstraint" in constraints
-                    else None
-                ),
+    def execute(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        delete_stale: bool = False,
+        cancelled: threading.Event | None = None,
+    ) -> WriteReport:
+        """
+        テーブル一覧を取得し、Entityファイルを生成する
+
+        notes:
+            * レンダリングは呼び出し元のスレッドで行い、batch_sizeファイルごとにまとめて
+            max_workersのワーカープールでステージングする
+            * 内容が変わったファイルだけを書き込み、delete_stale=Trueの場合は
+            削除されたテーブルのEntityファイルを削除する
+            * cancelledがsetされた場合、出力先に反映する前であれば出力先を変更せずに
+            CancelledErrorを送出する(OutputSinkを参照)
+        """
+        tables = self._get_tables()
+
+        with (
+            self.profiler.span("emit"),
+            OutputSink(
+                self.output_dir, delete_stale, max_workers, batch_size, cancelled
+            ) as sink,
+        ):
+            if self._cached_files is not None:
+                files = sink.write_all(self._cached_files)
+            else:
+                files = {}
+                sink.write_stream(self._collect(self._render_tables(tables), files))
+            if self._package_init:
+                sink.write_all(render_package_init(files.items()))
+            report = sink.commit()
+        self.profiler.count("files_written", len(report.written))
+        self.profiler.count("bytes_written", report.bytes_written)
+
+        if self._cached_files is None and self._cache and self._cache_key:
+            with self.profiler.span("cache_store"):
+                self._cache.put(self._cache_key, files)
+                if self._schema_cache:
+                    self._schema_cache.put(self._cache_key, self.schema_ir())
+        return report
+
+    async def aexecute(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        delete_stale: bool = False,
+    ) -> WriteReport:
+        """
+        イベントループをブロックせずにexecuteを実行する
+
+        notes:
+            * タスクがキャンセルされた場合、出力先に反映する前であればレンダリング・書き込みを
+            中止し、出力先を変更せずにCancelledErrorを送出する
+        """
+        return await run_cancellable(
+            partial(self.execute, max_workers, batch_size, delete_stale)
+        )
+
+    def schema_ir(self) -> SchemaIR:
+        """
+        テーブル・カラム・制約の中間表現を返す
+
+        notes:
+            * dump_schemaでファイルに書き出すと、他のツールからSQLをパースせずに読み込める
+        """
+        if self._schema is None:
+            self._schema = SchemaIR(
+                tables=tuple(table.to_ir() for table in self.tables)
             )
-            columns.append(column)
+        return self._schema
 
-        return columns
+    def render(self) -> dict[str, str]:
+        """
+        ファイルへの書き込みは行わずに、Entityファイル名と内容を返す
+        """
+        if self._cached_files is not None:
+            files = dict(self._cached_files)
+        else:
+            files = self._render_entity_files(self._get_tables())
+            if self._rendered is not None:
+                # 削除されたテーブルのEntityファイルは保持しない
+                self._rendered = {
+                    file_name: self._rendered[file_name] for file_name in files
+                }
+
+        if self._package_init:
+            files.update(render_package_init(files.items()))
+        return files
+
+    def _get_columns(self, schema: Expression) -> list[Column]:
+        """
+        カラム一覧取得
+        """
+        return extract_columns(schema, self.db_type)
 
     def _get_tables(self) -> list[Table]:
         """
         テーブル一覧取得
         """
-        tables: list[Table] = []
-        for ast in self.asts:
-            if not ast.this.key == "schema":
-                continue
+        return list(self.tables)
 
-            table_name = ast.this.this.this.this
-            columns = self._get_columns(ast.this)
-            tables.append(
-                Table(
-                    name=table_name,
-                    columns=columns,
-                )
-            )
+    def _generate_entity_file(self, tables: list[Table]) -> WriteReport:
+        """
+        Entityファイル生成
+        """
+        return self._write_entity_files(self._render_entity_files(tables))
 
-        return tables
+    def _write_entity_files(self, files: dict[str, str]) -> WriteReport:
+        """
+        生成したEntityファイルのうち、内容が変わったものだけを書き出す
+        """
+        return write_outputs(self.output_dir, files)
 
-    def _generate_entity_file(self, tables: list[Table]):
+    def _render_entity_files(self, tables: list[Table]) -> dict[str, str]:
         """
-        Entityファイル生成
+        Entityファイル名と内容を生成する
+        """
+        return dict(self._render_tables(tables))
+
+    def _render_tables(self, tables: list[Table]) -> Iterator[tuple[str, str]]:
         """
+        Base EntityファイルとEntityファイルを、ワーカープロセスでレンダリングして順に返す
+        """
+        if self._rendered is not None:
+            # template_dirのテンプレートが変わった場合は、前回の内容を使わない
+            template_digest = compute_cache_key(template_sources(self._template_dir))
+            if template_digest != self._template_digest:
+                self._rendered.clear()
+                self._template_digest = template_digest
+
         # Base Entityファイル生成
-        with open(Path(self.output_dir, "base_entity.py"), "w", encoding="utf-8") as f:
-            f.write(BASE_ENTITY)
+        yield from self._render_template(
+            BASE_ENTITY_TEMPLATE_NAME,
+            [("base_entity.py", {"output_dir": self.output_dir.replace("/", ".")})],
+        )
 
         # Entityファイル生成
-        template: Template = Template(source=ENTITY_TEMPLATE)
+        relationships = (
+            build_relationships(tables, self._relationship_loading)
+            if self._relationship_loading
+            else {}
+        )
+        yield from self._render_template(
+            ENTITY_TEMPLATE_NAME,
+            (
+                (
+                    f"{table.name}_entity.py",
+                    entity_context(
+                        table,
+                        self.output_dir,
+                        relationships.get(table.name),
+                        self._eager_defaults,
+                    ),
+                )
+                for table in tables
+            ),
+        )
 
-        for table in tables:
-            has_datetime = any(
-                col.default == "CURRENT_TIMESTAMP()"
-                or col.data_type == DataType.DATETIME
-                for col in table.columns
-            )
-            has_date = any(col.data_type == DataType.DATE for col in table.columns)
-            has_time = any(col.data_type == DataType.TIME for col in table.columns)
+    def _render_template(
+        self, template_name: str, contexts: Iterable[tuple[str, dict[str, Any]]]
+    ) -> Iterator[tuple[str, str]]:
+        """
+        コンテキストをレンダリングして順に返す
 
-            sqlalchemy_imports = sorted(
-                {col.data_type.to_sqlalchemy().__name__ for col in table.columns}
-            )
+        notes:
+            * incremental=Trueの場合は、前回とコンテキストが同じファイルをレンダリングせずに
+            前回の内容を返す(template_dirのテンプレートが変わった場合は_render_tablesで
+            前回の内容を破棄する)
+        """
+        if self._rendered is None:
+            yield from self._render_contexts(template_name, contexts)
+            return
 
-            rendered = template.render(
-                table=table,
-                sqlalchemy_imports=sqlalchemy_imports,
-                has_datetime=has_datetime,
-                has_date=has_date,
-                has_time=has_time,
-                output_dir=self.output_dir.replace("/", "."),
-            )
+        rendered = self._rendered
+        file_contexts = dict(contexts)
+        changed = [
+            (file_name, context)
+            for file_name, context in file_contexts.items()
+            if file_name not in rendered or rendered[file_name][0] != context
+        ]
+        for file_name, content in self._render_contexts(template_name, changed):
+            rendered[file_name] = (file_contexts[file_name], content)
+        for file_name in file_contexts:
+            yield file_name, rendered[file_name][1]
 
-            out_path = Path(self.output_dir, f"{table.name}_entity.py")
-            out_path.write_text(rendered, encoding="utf-8")
+    def _render_contexts(
+        self, template_name: str, contexts: Iterable[tuple[str, dict[str, Any]]]
+    ) -> Iterator[tuple[str, str]]:
+        render = partial(
+            render_templates,
+            template_name,
+            template_dir=self._template_dir,
+            bytecode_cache_dir=self._bytecode_cache_dir,
+        )
+        for rendered in map_chunks(
+            render, contexts, self._render_workers, DEFAULT_RENDER_CHUNK_SIZE
+        ):
+            for file_name, content, elapsed in rendered:
+                self.profiler.add_time("render", elapsed)
+                self.profiler.count("files_rendered")
+                yield file_name, content
+
+    @staticmethod
+    def _collect(
+        files: Iterable[tuple[str, str]], collected: dict[str, str]
+    ) -> Iterator[tuple[str, str]]:
+        for file_name, content in files:
+            collected[file_name] = content
+            yield file_name, content
@@ -0,0 +1,71 @@
+from typing import Hashable, Iterable, Mapping, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+def strongly_connected_components(graph: Mapping[T, Iterable[T]]) -> list[list[T]]:
+    """
+    有向グラフの強連結成分を返す(Tarjanのアルゴリズムを再帰なしで実装)
+
+    notes:
+        * 成分は、依存先が依存元より先に来る順(逆トポロジカル順)で返す
+        * graphのキーに存在しないノードは、辺を持たないノードとして扱う
+    """
+    index_of: dict[T, int] = {}
+    lowlink: dict[T, int] = {}
+    on_stack: set[T] = set()
+    stack: list[T] = []
+    components: list[list[T]] = []
+    counter = 0
+
+    for start in graph:
+        if start in index_of:
+            continue
+
+        index_of[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        work: list[tuple[T, list[T]]] = [(start, list(graph.get(start, ())))]
+
+        while work:
+            node, successors = work[-1]
+            if successors:
+                successor = successors.pop()
+                if successor not in index_of:
+                    index_of[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, list(graph.get(successor, ()))))
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[successor])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+            if lowlink[node] == index_of[node]:
+                component: list[T] = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+
+def find_cycles(graph: Mapping[T, Iterable[T]]) -> list[list[T]]:
+    """
+    循環している強連結成分(2ノード以上、または自己参照)を返す
+    """
+    return [
+        component
+        for component in strongly_connected_components(graph)
+        if len(component) > 1 or component[0] in set(graph.get(component[0], ()))
+    ]
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import yaml
+
+try:
+    # libyamlが利用可能な場合は、Cで実装されたローダーを使用する
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+YAML_SUFFIXES = (".yaml", ".yml")
+JSON_SUFFIXES = (".json",)
+SCHEMA_SUFFIXES = YAML_SUFFIXES + JSON_SUFFIXES
+
+# パス → (mtime_ns, size, パース済みドキュメント)
+_documents: dict[str, tuple[int, int, Any]] = {}
+_lock = threading.Lock()
+
+
+def is_schema_file(path: Path) -> bool:
+    """
+    スキーマファイルとして読み込む拡張子かどうか
+    """
+    return path.suffix.lower() in SCHEMA_SUFFIXES
+
+
+def iter_schema_files(directory: str | Path) -> Iterator[Path]:
+    """
+    ディレクトリ配下のスキーマファイルを列挙する(関係のない拡張子のファイルは除外)
+    """
+    for path in Path(directory).rglob("*"):
+        if is_schema_file(path) and path.is_file():
+            yield path
+
+
+def parse_document(text: str | bytes, suffix: str) -> Any:
+    """
+    拡張子に応じてJSONまたはYAMLとしてパースする
+    """
+    if suffix.lower() in JSON_SUFFIXES:
+        return json.loads(text)
+    return yaml.load(text, Loader=SafeLoader)  # nosec B506
+
+
+def load_document(path: str | Path) -> Any:
+    """
+    スキーマファイルを読み込み、パース結果を返す
+
+    notes:
+        * パース結果は(パス, mtime, サイズ)をキーにプロセス内でキャッシュする
+        * 返り値はキャッシュと共有されるため、呼び出し側で変更しないこと
+    """
+    resolved = os.path.abspath(path)
+    stat = os.stat(resolved)
+    with _lock:
+        cached = _documents.get(resolved)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(resolved, "rb") as f:
+        document = parse_document(f.read(), Path(resolved).suffix)
+
+    with _lock:
+        _documents[resolved] = (stat.st_mtime_ns, stat.st_size, document)
+    return document
+
+
+def export_documents(paths: Iterable[str | Path]) -> dict[str, tuple[int, int, Any]]:
+    """
+    キャッシュ済みのドキュメントを(mtime_ns, size, ドキュメント)の形で取り出す
+    """
+    with _lock:
+        return {
+            resolved: _documents[resolved]
+            for resolved in map(os.path.abspath, paths)
+            if resolved in _documents
+        }
+
+
+def seed_document_cache(documents: dict[str, tuple[int, int, Any]]) -> None:
+    """
+    export_documentsで取り出したドキュメントをキャッシュに登録する(ワーカープロセスの初期化用)
+
+    notes:
+        * ファイルのmtime・サイズが変わっていれば、load_documentは読み込み直す
+    """
+    with _lock:
+        _documents.update(documents)
+
+
+def clear_document_cache() -> None:
+    """
+    パース済みドキュメントのキャッシュを破棄する
+    """
+    with _lock:
+        _documents.clear()
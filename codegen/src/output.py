@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BATCH_SIZE = 64
+MANIFEST_FILE_NAME = ".modelgen-manifest.json"
+STAGING_DIR_PREFIX = ".modelgen-staging-"
+
+
+def _write_batch(output_dir: str, batch: list[tuple[str, str]]) -> None:
+    for file_name, content in batch:
+        with open(Path(output_dir, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def emit_files(
+    output_dir: str,
+    items: Iterable[T],
+    render: Callable[[T], tuple[str, str] | None],
+    max_workers: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict[str, str]:
+    """
+    itemsをitemsの順にレンダリングし、バッチ単位でワーカープールに書き出す
+
+    notes:
+        * renderは(ファイル名, 内容)を返す。Noneの場合は出力しない
+        * レンダリングはCPUバウンドのため呼び出し元のスレッドで逐次実行し、書き込み(I/O)だけを
+        ワーカープールで行う。書き込み待ちのバッチ数は_streamと同じく制限される
+        * 同じファイル名が複数回出力される場合は、後のものが残るよう先の書き込みを待つ
+    """
+    return _emit(
+        items, render, partial(_write_batch, output_dir), max_workers, batch_size
+    )
+
+
+def _emit(
+    items: Iterable[T],
+    render: Callable[[T], tuple[str, str] | None],
+    write_batch: Callable[[list[tuple[str, str]]], None],
+    max_workers: int | None,
+    batch_size: int,
+) -> dict[str, str]:
+    files: dict[str, str] = {}
+
+    def rendered() -> Iterator[tuple[str, str]]:
+        for item in items:
+            result = render(item)
+            if result is not None:
+                files[result[0]] = result[1]
+                yield result
+
+    _stream(rendered(), write_batch, max_workers, batch_size)
+    return files
+
+
+def _stream(
+    files: Iterable[tuple[str, str]],
+    write_batch: Callable[[list[tuple[str, str]]], None],
+    max_workers: int | None,
+    batch_size: int,
+) -> list[str]:
+    """
+    (ファイル名, 内容)を受け取った順にバッチ単位で書き出し、ファイル名の一覧を返す
+
+    notes:
+        * 書き込み待ちのバッチ数を制限し、内容を保持し続けないため、メモリ使用量は
+        batch_size × 待ちバッチ数 のファイルに制限される
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive: {batch_size}")
+
+    workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    names: dict[str, None] = {}
+    with ThreadPoolExecutor(max_workers=workers) as write_executor:
+        pending: deque[Future[None]] = deque()
+        batch: list[tuple[str, str]] = []
+
+        def flush() -> None:
+            nonlocal batch
+            if batch:
+                pending.append(write_executor.submit(write_batch, batch))
+                batch = []
+            while len(pending) > workers * 2:
+                pending.popleft().result()
+
+        for file_name, content in files:
+            if file_name in names:
+                flush()
+                while pending:
+                    pending.popleft().result()
+
+            names[file_name] = None
+            batch.append((file_name, content))
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+        while pending:
+            pending.popleft().result()
+
+    return list(names)
+
+
+def write_files(
+    output_dir: str,
+    files: dict[str, str],
+    max_workers: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    """
+    レンダリング済みのファイルをバッチ単位で並列に書き出す
+    """
+    emit_files(
+        output_dir,
+        files.items(),
+        lambda item: item,
+        max_workers=max_workers,
+        batch_size=batch_size,
+    )
+
+
+class WriteReport:
+    """
+    OutputSinkの書き込み結果(ファイル名の一覧)
+    """
+
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+    unchanged: list[str]
+    bytes_written: int
+
+    def __init__(
+        self,
+        added: list[str] | None = None,
+        changed: list[str] | None = None,
+        removed: list[str] | None = None,
+        unchanged: list[str] | None = None,
+    ):
+        self.added = added or []
+        self.changed = changed or []
+        self.removed = removed or []
+        self.unchanged = unchanged or []
+        self.bytes_written = 0
+
+    @property
+    def written(self) -> list[str]:
+        """
+        実際に書き込んだファイル
+        """
+        return sorted(self.added + self.changed)
+
+    def to_dict(self) -> dict[str, list[str]]:
+        return {
+            "added": self.added,
+            "changed": self.changed,
+            "removed": self.removed,
+            "unchanged": self.unchanged,
+        }
+
+    def __repr__(self) -> str:
+        counts = ", ".join(
+            f"{key}={len(value)}" for key, value in self.to_dict().items()
+        )
+        return f"WriteReport({counts})"
+
+
+class OutputSink:
+    """
+    出力ファイルをステージング領域に書き出し、内容が変わったファイルだけを出力先に反映する
+
+    notes:
+        * 既存ファイルとバイト列で比較し、同じ内容のファイルは書き込まない(mtimeも変わらない)
+        * ステージング領域はoutput_dirと同じ親ディレクトリ(同じファイルシステム)に作成し、
+        commitでos.replaceにより1ファイルずつアトミックに置き換える。commit前に例外が発生した
+        場合、出力先は変更されない(異常終了しても生成したパッケージ内に一時ファイルは残らない)
+        * 出力したファイル名はoutput_dirの外のマニフェスト(manifest_pathを参照)に記録し、
+        delete_stale=Trueの場合は前回出力したファイルのうち今回出力しなかったものを削除する
+        (マニフェストにないファイルは削除しない)
+        * cancelledがsetされた場合、次のファイルのレンダリング・ステージング、または
+        commitの開始時にconcurrent.futures.CancelledErrorを送出する(出力先は変更されない)
+    """
+
+    output_dir: str
+    delete_stale: bool
+    max_workers: int | None
+    batch_size: int
+    _staging_dir: str | None
+    _status: dict[str, str]
+    _sizes: dict[str, int]
+    _lock: threading.Lock
+    _cancelled: threading.Event | None
+
+    def __init__(
+        self,
+        output_dir: str,
+        delete_stale: bool = False,
+        max_workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cancelled: threading.Event | None = None,
+    ):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.delete_stale = delete_stale
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        parent_dir, name = os.path.split(os.path.abspath(output_dir))
+        self._staging_dir = tempfile.mkdtemp(
+            prefix=f"{STAGING_DIR_PREFIX}{name}-", dir=parent_dir
+        )
+        self._status = {}
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._cancelled = cancelled
+
+    def __enter__(self) -> OutputSink:
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        self.abort()
+
+    def emit(
+        self,
+        items: Iterable[T],
+        render: Callable[[T], tuple[str, str] | None],
+    ) -> dict[str, str]:
+        """
+        itemsをレンダリングし、ステージングする(emit_filesと同じ規則)
+        """
+        if self._cancelled is not None:
+            render = self._checked(render)
+        return _emit(
+            items, render, self._stage_batch, self.max_workers, self.batch_size
+        )
+
+    def write_stream(self, files: Iterable[tuple[str, str]]) -> list[str]:
+        """
+        レンダリング済みの(ファイル名, 内容)を受け取った順にステージングし、ファイル名の一覧を返す
+
+        notes:
+            * 内容は保持しないため、大量のファイルをジェネレータで渡してもメモリを消費しない
+        """
+        if self._cancelled is not None:
+            files = map(self._checked(lambda item: item), files)
+        return _stream(files, self._stage_batch, self.max_workers, self.batch_size)
+
+    def write_all(self, files: dict[str, str]) -> dict[str, str]:
+        """
+        レンダリング済みのファイルをステージングする
+        """
+        return self.emit(files.items(), lambda item: item)
+
+    def keep(self, file_names: Iterable[str]) -> None:
+        """
+        前回の出力から変わっていないことが分かっているファイルを、読み込まずにunchangedとする
+        (delete_stale=Trueでも削除されない)
+        """
+        with self._lock:
+            for file_name in file_names:
+                self._status[file_name] = "unchanged"
+                self._sizes[file_name] = 0
+
+    def commit(self) -> WriteReport:
+        """
+        ステージングしたファイルを出力先に反映し、結果を返す
+        """
+        staging_dir = self._require_staging_dir()
+        self._check_cancelled()
+
+        report = WriteReport()
+        for file_name, status in sorted(self._status.items()):
+            if status == "unchanged":
+                report.unchanged.append(file_name)
+                continue
+            destination = Path(self.output_dir, file_name)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(Path(staging_dir, file_name), destination)
+            getattr(report, status).append(file_name)
+            report.bytes_written += self._sizes[file_name]
+
+        previous = self._read_manifest()
+        kept: list[str] = []
+        for file_name in previous:
+            if file_name in self._status:
+                continue
+            path = Path(self.output_dir, file_name)
+            if not path.is_file():
+                continue
+            if self.delete_stale:
+                path.unlink()
+                report.removed.append(file_name)
+            else:
+                kept.append(file_name)
+
+        manifest = sorted([*self._status, *kept])
+        if manifest != previous or self._legacy_manifest_path().exists():
+            self._write_manifest(manifest)
+
+        self.abort()
+        return report
+
+    def abort(self) -> None:
+        """
+        ステージング領域を破棄する(commit済みの場合は何もしない)
+        """
+        if self._staging_dir is not None:
+            shutil.rmtree(self._staging_dir, ignore_errors=True)
+            self._staging_dir = None
+
+    def _require_staging_dir(self) -> str:
+        if self._staging_dir is None:
+            raise RuntimeError("OutputSink is already closed")
+        return self._staging_dir
+
+    def _check_cancelled(self) -> None:
+        if self._cancelled is not None and self._cancelled.is_set():
+            raise CancelledError("Output was cancelled before commit")
+
+    def _checked(self, func: Callable[[T], Any]) -> Callable[[T], Any]:
+        def wrapper(item: T) -> Any:
+            self._check_cancelled()
+            return func(item)
+
+        return wrapper
+
+    def _stage_batch(self, batch: list[tuple[str, str]]) -> None:
+        staging_dir = self._require_staging_dir()
+        self._check_cancelled()
+        for file_name, content in batch:
+            data = content.encode("utf-8")
+            existing = Path(self.output_dir, file_name)
+            staged = Path(staging_dir, file_name)
+
+            if _has_same_content(existing, data):
+                status = "unchanged"
+                staged.unlink(missing_ok=True)
+            else:
+                status = "changed" if existing.exists() else "added"
+                staged.parent.mkdir(parents=True, exist_ok=True)
+                with open(staged, "wb") as f:
+                    f.write(data)
+
+            with self._lock:
+                self._status[file_name] = status
+                self._sizes[file_name] = len(data)
+
+    def _read_manifest(self) -> list[str]:
+        for path in (manifest_path(self.output_dir), self._legacy_manifest_path()):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    return sorted(json.load(f)["files"])
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError, TypeError):
+                return []
+        return []
+
+    def _write_manifest(self, files: list[str]) -> None:
+        staged = Path(self._require_staging_dir(), MANIFEST_FILE_NAME)
+        with open(staged, "w", encoding="utf-8") as f:
+            json.dump({"files": files}, f, indent=2)
+            f.write("\n")
+        os.replace(staged, manifest_path(self.output_dir))
+        self._legacy_manifest_path().unlink(missing_ok=True)
+
+    def _legacy_manifest_path(self) -> Path:
+        # 以前のバージョンはマニフェストをoutput_dir内に書き出していた
+        return Path(self.output_dir, MANIFEST_FILE_NAME)
+
+
+def manifest_path(output_dir: str) -> Path:
+    """
+    OutputSinkがoutput_dirに出力したファイル名を記録するマニフェストのパスを返す
+
+    notes:
+        * 生成したパッケージに含まれないよう、output_dirと同じ親ディレクトリに
+        .<output_dirの名前>.modelgen-manifest.json として置く
+    """
+    parent_dir, name = os.path.split(os.path.abspath(output_dir))
+    return Path(parent_dir, f".{name}{MANIFEST_FILE_NAME}")
+
+
+def _has_same_content(path: Path, data: bytes) -> bool:
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def write_outputs(
+    output_dir: str,
+    files: dict[str, str],
+    delete_stale: bool = False,
+    max_workers: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> WriteReport:
+    """
+    レンダリング済みのファイルをOutputSinkで差分のみ書き出す
+    """
+    with OutputSink(output_dir, delete_stale, max_workers, batch_size) as sink:
+        sink.write_all(files)
+        return sink.commit()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator
+
+INIT_FILE_NAME = "__init__.py"
+STUB_FILE_NAME = "__init__.pyi"
+
+# 出力ファイルのトップレベルで定義されているクラス
+_CLASS_PATTERN = re.compile(r"^class\s+([A-Za-z_]\w*)", re.MULTILINE)
+
+INIT_TEMPLATE = """\
+# generated by modelgen
+# モデルは初回アクセス時に、定義しているモジュールだけをimportする(PEP 562)
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+__all__ = [
+{all}
+]
+
+_MODULES: dict[str, str] = {{
+{modules}
+}}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+    value = getattr(importlib.import_module(f".{{module_name}}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({{*globals(), *__all__}})
+"""
+
+STUB_TEMPLATE = """\
+# generated by modelgen
+{imports}
+
+__all__ = [
+{all}
+]
+"""
+
+
+class PackageIndex:
+    """
+    出力したファイルから、パッケージの__init__.py(遅延import)と__init__.pyiを生成する
+
+    notes:
+        * exports: 公開する名前 → その名前を定義しているモジュール名
+        * __init__.pyはモジュールレベルの__getattr__で、参照された名前のモジュールのみをimportする
+        * 型チェッカー・IDE向けに、すべての名前を静的にimportする__init__.pyiを出力する
+    """
+
+    exports: dict[str, str]
+
+    def __init__(self) -> None:
+        self.exports = {}
+
+    def add(self, file_name: str, content: str) -> None:
+        """
+        出力ファイルのトップレベルのクラスを公開する名前に追加する
+        """
+        if not file_name.endswith(".py") or "/" in file_name:
+            return
+        module_name = file_name[: -len(".py")]
+        if module_name == "__init__":
+            return
+        for name in _CLASS_PATTERN.findall(content):
+            self.exports.setdefault(name, module_name)
+
+    def update(self, files: Iterable[tuple[str, str]]) -> None:
+        for file_name, content in files:
+            self.add(file_name, content)
+
+    def track(self, files: Iterable[tuple[str, str]]) -> Iterator[tuple[str, str]]:
+        """
+        (ファイル名, 内容)をそのまま返しながら、公開する名前を記録する
+        """
+        for file_name, content in files:
+            self.add(file_name, content)
+            yield file_name, content
+
+    def render(self) -> dict[str, str]:
+        """
+        __init__.pyと__init__.pyiのファイル名と内容を返す
+        """
+        names = sorted(self.exports)
+        all_names = "\n".join(f'    "{name}",' for name in names)
+        modules = "\n".join(f'    "{name}": "{self.exports[name]}",' for name in names)
+        imports = "\n".join(
+            f"from .{self.exports[name]} import {name} as {name}" for name in names
+        )
+        return {
+            INIT_FILE_NAME: INIT_TEMPLATE.format(all=all_names, modules=modules),
+            STUB_FILE_NAME: STUB_TEMPLATE.format(imports=imports, all=all_names),
+        }
+
+
+def render_package_init(files: Iterable[tuple[str, str]]) -> dict[str, str]:
+    """
+    出力ファイルの一覧から、__init__.pyと__init__.pyiのファイル名と内容を返す
+    """
+    index = PackageIndex()
+    index.update(files)
+    return index.render()
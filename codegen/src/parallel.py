@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+def map_chunks(
+    func: Callable[[list[T]], R],
+    items: Iterable[T],
+    max_workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[R]:
+    """
+    itemsをchunk_sizeずつワーカープロセスでfuncに渡し、結果を入力順に返す
+
+    notes:
+        * funcはワーカープロセスに渡すため、モジュールレベルの関数(またはそのpartial)とする
+        * 実行中のチャンクはワーカー数の2倍までに抑え、itemsの読み込みを処理の進みに合わせる
+        * itemsが1チャンクに収まる場合・ワーカー数が1の場合は、プロセスを起動せずに実行する
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive: {chunk_size}")
+
+    iterator = iter(items)
+    chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+    head = list(islice(chunks, 2))
+    workers = max_workers or os.cpu_count() or 1
+    if len(head) < 2 or workers == 1:
+        for chunk in chain(head, chunks):
+            yield func(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: deque[Future[R]] = deque()
+        for chunk in chain(head, chunks):
+            in_flight.append(executor.submit(func, chunk))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+REPORT_FORMAT_VERSION = 1
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    プロセスのピークRSS(バイト)を返す。取得できない環境ではNone
+    """
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト、Linuxはキロバイト単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SpanRecord:
+    """
+    終了したフェーズ(スパン)の計測結果
+    """
+
+    name: str
+    depth: int
+    start: float
+    elapsed: float
+    attributes: dict[str, Any]
+    peak_rss_bytes: int | None
+    tracemalloc_peak_bytes: int | None
+
+    def __init__(
+        self,
+        name: str,
+        depth: int,
+        start: float,
+        elapsed: float,
+        attributes: dict[str, Any],
+        peak_rss_bytes: int | None = None,
+        tracemalloc_peak_bytes: int | None = None,
+    ):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.elapsed = elapsed
+        self.attributes = attributes
+        self.peak_rss_bytes = peak_rss_bytes
+        self.tracemalloc_peak_bytes = tracemalloc_peak_bytes
+
+    def to_dict(self) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "name": self.name,
+            "depth": self.depth,
+            "start": self.start,
+            "elapsed": self.elapsed,
+        }
+        if self.attributes:
+            record["attributes"] = self.attributes
+        if self.peak_rss_bytes is not None:
+            record["peak_rss_bytes"] = self.peak_rss_bytes
+        if self.tracemalloc_peak_bytes is not None:
+            record["tracemalloc_peak_bytes"] = self.tracemalloc_peak_bytes
+        return record
+
+    def __repr__(self) -> str:
+        return f"SpanRecord(name={self.name}, depth={self.depth}, elapsed={self.elapsed:.6f})"
+
+
+class Profiler:
+    """
+    生成処理のフェーズごとの時間・カウンタ・メモリを記録する
+
+    notes:
+        * spanで囲んだ区間をフェーズとして記録し、終了時にon_spanを呼び出す
+        * count・add_timeはワーカースレッドから呼び出してもよい
+        * trace_memory=Trueの場合、各フェーズ終了時のピークRSSと、tracemallocによる
+        フェーズ中のピークを記録する(入れ子のフェーズでは、最上位のフェーズ開始からのピーク)
+    """
+
+    enabled = True
+    trace_memory: bool
+    on_span: Callable[[SpanRecord], None] | None
+    spans: list[SpanRecord]
+    counters: dict[str, int]
+    timers: dict[str, list[float]]
+    _origin: float
+    _lock: threading.Lock
+    _local: threading.local
+    _started_tracemalloc: bool
+
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        on_span: Callable[[SpanRecord], None] | None = None,
+    ):
+        self.trace_memory = trace_memory
+        self.on_span = on_span
+        self.spans = []
+        self.counters = {}
+        self.timers = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+        """
+        withで囲んだ区間をフェーズとして記録する。yieldした辞書に属性を追加できる
+        """
+        depth = getattr(self._local, "depth", 0)
+        if self.trace_memory and depth == 0 and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        self._local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.depth = depth
+            record = SpanRecord(
+                name, depth, started - self._origin, elapsed, attributes
+            )
+            if self.trace_memory:
+                record.peak_rss_bytes = peak_rss_bytes()
+                if tracemalloc.is_tracing():
+                    record.tracemalloc_peak_bytes = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self.spans.append(record)
+            if self.on_span:
+                self.on_span(record)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, elapsed: float) -> None:
+        """
+        スパンとして記録するには細かすぎる処理(ファイルごとのレンダリングなど)の時間を合計する
+        """
+        with self._lock:
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += elapsed
+            timer[1] += 1
+
+    def timed(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        呼び出しごとの時間をadd_timeで合計するようにfuncをラップする
+        """
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - started)
+
+        return wrapper
+
+    def close(self) -> None:
+        """
+        このProfilerが開始したtracemallocを停止する
+        """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def report(self) -> dict[str, Any]:
+        """
+        計測結果をJSONに変換可能な辞書で返す
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+            phases: dict[str, float] = {}
+            for span in spans:
+                phases[span.name] = phases.get(span.name, 0.0) + span.elapsed
+            report: dict[str, Any] = {
+                "version": REPORT_FORMAT_VERSION,
+                "pid": os.getpid(),
+                "phases": phases,
+                "spans": [span.to_dict() for span in spans],
+                "counters": dict(self.counters),
+                "timers": {
+                    name: {"total": total, "count": int(count)}
+                    for name, (total, count) in self.timers.items()
+                },
+            }
+        if self.trace_memory:
+            report["peak_rss_bytes"] = peak_rss_bytes()
+        return report
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.report(), indent=indent)
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+            f.write("\n")
+
+
+class NullProfiler(Profiler):
+    """
+    何も記録しないProfiler(profilerが指定されていない場合に使用する)
+    """
+
+    enabled = False
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+        yield attributes
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def add_time(self, name: str, elapsed: float) -> None:
+        pass
+
+    def timed(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        return func
+
+
+NULL_PROFILER = NullProfiler()
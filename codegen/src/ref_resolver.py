@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+from .graph import find_cycles
+from .loader import iter_schema_files, load_document
+
+COMPONENTS_SCHEMAS_PREFIX = "#/components/schemas/"
+# YAML・JSONの "$ref": "値" を、パースせずにバイト列から読み取る
+_REF_PATTERN = re.compile(
+    rb"""["']?\$ref["']?[ \t]*:[ \t]*(?:"([^"\\\n]*)"|'([^'\n]*)'|([^\s,}\]"'#][^\s,}\]]*))"""
+)
+
+# (ファイルの絶対パス, JSONポインタ)。ポインタが空文字の場合はファイル全体を指す
+RefTarget = tuple[str, str]
+ROOT_TARGET: RefTarget = ("", "")
+
+
+def _unescape_pointer_token(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def resolve_pointer(document: Any, pointer: str) -> Any:
+    """
+    JSONポインタ(例: /definitions/Foo)が指す値を返す
+    """
+    node = document
+    if not pointer:
+        return node
+    for token in pointer.lstrip("/").split("/"):
+        token = _unescape_pointer_token(token)
+        if isinstance(node, list):
+            node = node[int(token)]
+        elif isinstance(node, dict) and token in node:
+            node = node[token]
+        else:
+            raise KeyError(f"JSON pointer not found: {pointer}")
+    return node
+
+
+def scan_ref_files(
+    openapi_filepath: str, include_models_dir: str | None = None
+) -> list[str]:
+    """
+    入力仕様から$refで辿れるファイル(include_models_dirのファイルを含む)の一覧を、
+    ドキュメントを書き換えずに返す(キャッシュキーの計算用)
+
+    notes:
+        * $refはファイルのバイト列から正規表現で読み取り、YAML・JSONとしてパースしない
+        * 正規表現で読み取れない書き方の$refを含むファイルだけは、パースして$refを取り出す
+        * ファイル全体の$refを辿るため、RefResolver.files()より多くのファイルを返す場合がある
+        (キャッシュキーが不要に変わるだけで、必要なファイルが漏れることはない)
+        * 存在しないファイルは含めない(生成時にRefResolverがエラーにする)
+    """
+    pending = [os.path.abspath(openapi_filepath)]
+    if include_models_dir:
+        pending.extend(
+            os.path.abspath(model_file)
+            for model_file in sorted(iter_schema_files(include_models_dir))
+        )
+    seen: set[str] = set()
+    while pending:
+        file = pending.pop()
+        if file in seen or not os.path.isfile(file):
+            continue
+        seen.add(file)
+        for ref in _scan_refs(file):
+            path = ref.partition("#")[0]
+            if path and "://" not in path:
+                pending.append(
+                    os.path.abspath(os.path.join(os.path.dirname(file), path))
+                )
+    return sorted(seen)
+
+
+def _scan_refs(file: str) -> list[str]:
+    with open(file, "rb") as f:
+        data = f.read()
+    refs = [
+        next(group for group in match.groups() if group is not None)
+        for match in _REF_PATTERN.finditer(data)
+    ]
+    if len(refs) == data.count(b"$ref"):
+        return [ref.decode("utf-8") for ref in refs]
+    return _iter_refs(load_document(file))
+
+
+def _iter_refs(document: Any) -> list[str]:
+    refs: list[str] = []
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str):
+                refs.append(ref)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return refs
+
+
+class RefResolver:
+    """
+    openapiファイルから辿れる$refの依存グラフを構築し、参照先のスキーマを
+    components.schemasに統合した仕様を生成する
+
+    notes:
+        * $refは参照元ドキュメントからの相対パスとして解決し、参照先の$refも再帰なしで辿る
+        * 各ドキュメントの読み込み、各参照先の書き換えはそれぞれ1回だけ行う
+        * file.yaml#/definitions/Foo のようなJSONポインタはポインタの最後の要素を、
+        ファイル全体への参照はファイル名(stem)をスキーマ名とする
+        * 循環参照は許容し、cyclesに記録する
+    """
+
+    openapi_filepath: str
+    root: str
+    names: dict[RefTarget, str]
+    schemas: dict[RefTarget, Any]
+    graph: dict[RefTarget, list[RefTarget]]
+    cycles: list[list[RefTarget]]
+    _documents: dict[str, Any]
+    _used_names: set[str]
+
+    def __init__(self, openapi_filepath: str, include_models_dir: str | None = None):
+        self.openapi_filepath = openapi_filepath
+        self.root = os.path.abspath(openapi_filepath)
+        self.names = {}
+        self.schemas = {}
+        self.graph = {}
+        self._documents = {}
+
+        root_document = self._load(self.root)
+        existing_schemas = (root_document.get("components") or {}).get("schemas") or {}
+        self._used_names = set(existing_schemas)
+
+        pending: deque[RefTarget] = deque([ROOT_TARGET])
+        if include_models_dir:
+            # include_models_dir内のスキーマは、入力仕様から参照されているものとして扱う
+            for model_file in sorted(iter_schema_files(include_models_dir)):
+                target = (os.path.abspath(model_file), "")
+                self._name_for(target)
+                self.graph.setdefault(ROOT_TARGET, []).append(target)
+                pending.append(target)
+
+        # 参照先を幅優先で辿り、各参照先を1回ずつ書き換える
+        while pending:
+            target = pending.popleft()
+            if target in self.schemas:
+                continue
+            file, pointer = target if target != ROOT_TARGET else (self.root, "")
+            rewritten, refs = self._rewrite(
+                resolve_pointer(self._load(file), pointer), file
+            )
+            self.schemas[target] = rewritten
+            self.graph.setdefault(target, []).extend(refs)
+            pending.extend(ref for ref in refs if ref not in self.schemas)
+
+        self.cycles = find_cycles(self.graph)
+
+    def merge(self) -> dict[str, Any]:
+        """
+        参照先のスキーマをcomponents.schemasに統合したopenapi仕様を返す
+        """
+        openapi_spec = dict(self.schemas[ROOT_TARGET])
+        components = dict(openapi_spec.get("components") or {})
+        components_schemas = dict(components.get("schemas") or {})
+        for target, schema in self.schemas.items():
+            if target == ROOT_TARGET:
+                continue
+            components_schemas[self.names[target]] = schema
+        components["schemas"] = components_schemas
+        openapi_spec["components"] = components
+        return openapi_spec
+
+    def files(self) -> list[str]:
+        """
+        解決に使用したファイルの一覧を返す
+        """
+        return sorted(self._documents)
+
+    def _load(self, file: str) -> Any:
+        if file not in self._documents:
+            self._documents[file] = load_document(file)
+        return self._documents[file]
+
+    def _target_of(self, ref: str, base_file: str) -> RefTarget | None:
+        """
+        $refの値を参照先に変換する。書き換え不要な参照の場合はNone
+        """
+        path, _, pointer = ref.partition("#")
+        if "://" in path:
+            return None
+        if path:
+            file = os.path.abspath(os.path.join(os.path.dirname(base_file), path))
+        else:
+            file = base_file
+            # 入力仕様内のcomponentsへの参照は、そのまま残す
+            if file == self.root and pointer.startswith("/components/"):
+                return None
+        return file, pointer
+
+    def _name_for(self, target: RefTarget) -> str:
+        """
+        参照先のスキーマ名を決める(重複する場合はファイル名を付与して区別する)
+        """
+        if target in self.names:
+            return self.names[target]
+
+        file, pointer = target
+        stem = Path(file).stem
+        name = (
+            _unescape_pointer_token(pointer.rstrip("/").rsplit("/", 1)[-1])
+            if pointer
+            else stem
+        )
+        if name in self._used_names:
+            candidate = f"{stem}_{name}" if pointer else name
+            suffix = 2
+            name = candidate
+            while name in self._used_names:
+                name = f"{candidate}_{suffix}"
+                suffix += 1
+        self._used_names.add(name)
+        self.names[target] = name
+        return name
+
+    def _rewrite(self, node: Any, base_file: str) -> tuple[Any, list[RefTarget]]:
+        """
+        nodeをコピーしながら$refをcomponents.schemasへの参照に書き換え、参照先を出現順に返す
+        """
+        refs: dict[RefTarget, None] = {}
+
+        def copy_container(value: Any) -> Any:
+            if isinstance(value, dict):
+                return {}
+            if isinstance(value, list):
+                return [None] * len(value)
+            return value
+
+        result = copy_container(node)
+        stack: list[tuple[Any, Any]] = [(node, result)] if result is not node else []
+        while stack:
+            source, destination = stack.pop()
+            items = source.items() if isinstance(source, dict) else enumerate(source)
+            for key, value in items:
+                if (
+                    key == "$ref"
+                    and isinstance(value, str)
+                    and isinstance(source, dict)
+                ):
+                    target = self._target_of(value, base_file)
+                    if target is None:
+                        destination[key] = value
+                        continue
+                    refs[target] = None
+                    destination[key] = (
+                        f"{COMPONENTS_SCHEMAS_PREFIX}{self._name_for(target)}"
+                    )
+                    continue
+
+                copied = copy_container(value)
+                destination[key] = copied
+                if copied is not value:
+                    stack.append((value, copied))
+
+        return result, list(refs)
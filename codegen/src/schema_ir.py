@@ -0,0 +1,638 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import struct
+import tempfile
+from operator import itemgetter
+from typing import Any, ClassVar, TypeVar
+
+# ファイルの先頭に書き出す識別子と形式のバージョン(クラスの構成を変えた場合に上げる)
+SCHEMA_IR_MAGIC = b"MGIR"
+SCHEMA_IR_FORMAT_VERSION = 2
+SCHEMA_IR_SUFFIX = ".ir"
+# 識別子・形式のバージョン(続けて、要素を属性の値の配列にしたJSONを書き出す)
+_HEADER = struct.Struct(">4sH")
+
+
+class IRNode:
+    """
+    中間表現の要素の基底クラス
+
+    notes:
+        * 属性の値は_fieldsの順のタプル1つで持ち、属性は読み取り専用のプロパティとする
+        (読み込み時は要素ごとにタプルを1つ設定するだけで済む)
+        * 作成後は変更できず、等価性・ハッシュは型と全ての属性の値で決まる
+        * _childrenは、子の要素のタプルを持つ属性 → 子の要素の型。複数の型の要素を
+        持つ属性は型のタプルとする(書き出すときに型の名前を付ける)
+        * サブクラスも__slots__ = ()とし、インスタンスに__dict__を持たせない
+    """
+
+    __slots__ = ("_values",)
+    _fields: ClassVar[tuple[str, ...]] = ()
+    _children: ClassVar[dict[str, type[IRNode] | tuple[type[IRNode], ...]]] = {}
+
+    _values: tuple[Any, ...]
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        for index, name in enumerate(cls._fields):
+            setattr(cls, name, _field_property(index))
+
+    def _assign(self, *values: Any) -> None:
+        if len(values) != len(self._fields):
+            raise TypeError(f"{type(self).__name__} takes {len(self._fields)} values")
+        object.__setattr__(self, "_values", values)
+
+    def values(self) -> tuple[Any, ...]:
+        return self._values
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._values == other._values
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__, self._values))
+
+    def __repr__(self) -> str:
+        attributes = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self._fields, self._values)
+        )
+        return f"{type(self).__name__}({attributes})"
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return type(self), self._values
+
+
+NodeT = TypeVar("NodeT", bound=IRNode)
+
+
+def _field_property(index: int) -> property:
+    get = itemgetter(index)
+    return property(lambda node: get(node._values))
+
+
+class ColumnIR(IRNode):
+    """
+    テーブルのカラム。data_typeはentity_generator.DataTypeの値
+    """
+
+    __slots__ = ()
+    _fields = (
+        "name",
+        "data_type",
+        "length",
+        "scale",
+        "nullable",
+        "primary_key",
+        "unique",
+        "default",
+        "autoincrement",
+        "identity",
+    )
+
+    name: str
+    data_type: str
+    length: int | None
+    scale: int | None
+    nullable: bool
+    primary_key: bool
+    unique: bool
+    default: str | None
+    autoincrement: bool
+    identity: str | None
+
+    def __init__(
+        self,
+        name: str,
+        data_type: str,
+        length: int | None = None,
+        scale: int | None = None,
+        nullable: bool = True,
+        primary_key: bool = False,
+        unique: bool = False,
+        default: str | None = None,
+        autoincrement: bool = False,
+        identity: str | None = None,
+    ):
+        self._assign(
+            name,
+            data_type,
+            length,
+            scale,
+            nullable,
+            primary_key,
+            unique,
+            default,
+            autoincrement,
+            identity,
+        )
+
+
+class ForeignKeyIR(IRNode):
+    """
+    外部キー制約。columnsからreferred_tableのreferred_columnsを参照する
+    """
+
+    __slots__ = ()
+    _fields = (
+        "columns",
+        "referred_table",
+        "referred_columns",
+        "name",
+        "ondelete",
+        "onupdate",
+    )
+
+    columns: tuple[str, ...]
+    referred_table: str
+    referred_columns: tuple[str, ...]
+    name: str | None
+    ondelete: str | None
+    onupdate: str | None
+
+    def __init__(
+        self,
+        columns: tuple[str, ...],
+        referred_table: str,
+        referred_columns: tuple[str, ...],
+        name: str | None = None,
+        ondelete: str | None = None,
+        onupdate: str | None = None,
+    ):
+        self._assign(
+            tuple(columns),
+            referred_table,
+            tuple(referred_columns),
+            name,
+            ondelete,
+            onupdate,
+        )
+
+
+class UniqueConstraintIR(IRNode):
+    """
+    複数カラムの一意制約
+    """
+
+    __slots__ = ()
+    _fields = ("columns", "name")
+
+    columns: tuple[str, ...]
+    name: str | None
+
+    def __init__(self, columns: tuple[str, ...], name: str | None = None):
+        self._assign(tuple(columns), name)
+
+
+class IndexIR(IRNode):
+    """
+    テーブルのインデックス
+    """
+
+    __slots__ = ()
+    _fields = ("columns", "name", "unique")
+
+    columns: tuple[str, ...]
+    name: str | None
+    unique: bool
+
+    def __init__(
+        self, columns: tuple[str, ...], name: str | None = None, unique: bool = False
+    ):
+        self._assign(tuple(columns), name, unique)
+
+
+class TableIR(IRNode):
+    """
+    テーブルとその制約
+    """
+
+    __slots__ = ()
+    _fields = ("name", "columns", "foreign_keys", "unique_constraints", "indexes")
+    _children = {
+        "columns": ColumnIR,
+        "foreign_keys": ForeignKeyIR,
+        "unique_constraints": UniqueConstraintIR,
+        "indexes": IndexIR,
+    }
+
+    name: str
+    columns: tuple[ColumnIR, ...]
+    foreign_keys: tuple[ForeignKeyIR, ...]
+    unique_constraints: tuple[UniqueConstraintIR, ...]
+    indexes: tuple[IndexIR, ...]
+
+    def __init__(
+        self,
+        name: str,
+        columns: tuple[ColumnIR, ...] = (),
+        foreign_keys: tuple[ForeignKeyIR, ...] = (),
+        unique_constraints: tuple[UniqueConstraintIR, ...] = (),
+        indexes: tuple[IndexIR, ...] = (),
+    ):
+        self._assign(
+            name,
+            tuple(columns),
+            tuple(foreign_keys),
+            tuple(unique_constraints),
+            tuple(indexes),
+        )
+
+
+class FieldIR(IRNode):
+    """
+    モデルのフィールド。annotation・defaultは生成されたソースコードの式
+    """
+
+    __slots__ = ()
+    _fields = ("name", "annotation", "default")
+
+    name: str
+    annotation: str
+    default: str | None
+
+    def __init__(self, name: str, annotation: str, default: str | None = None):
+        self._assign(name, annotation, default)
+
+
+class ModelIR(IRNode):
+    """
+    モデルクラス。referencesは参照している他のモデルクラスの名前
+    """
+
+    __slots__ = ()
+    _fields = ("name", "bases", "fields", "references")
+    _children = {"fields": FieldIR}
+
+    name: str
+    bases: tuple[str, ...]
+    fields: tuple[FieldIR, ...]
+    references: tuple[str, ...]
+
+    def __init__(
+        self,
+        name: str,
+        bases: tuple[str, ...] = (),
+        fields: tuple[FieldIR, ...] = (),
+        references: tuple[str, ...] = (),
+    ):
+        self._assign(name, tuple(bases), tuple(fields), tuple(references))
+
+
+class SchemaIR(IRNode):
+    """
+    EntityGenerator(tables)・CodeGenerator(models)が生成するスキーマの中間表現
+    """
+
+    __slots__ = ()
+    _fields = ("tables", "models")
+    _children = {"tables": TableIR, "models": ModelIR}
+
+    tables: tuple[TableIR, ...]
+    models: tuple[ModelIR, ...]
+
+    def __init__(
+        self, tables: tuple[TableIR, ...] = (), models: tuple[ModelIR, ...] = ()
+    ):
+        self._assign(tuple(tables), tuple(models))
+
+
+class CreateTableIR(IRNode):
+    """
+    CREATE TABLE文のパース結果(TableIRにIF NOT EXISTSの有無を加えたもの)
+    """
+
+    __slots__ = ()
+    _fields = (
+        "name",
+        "columns",
+        "foreign_keys",
+        "unique_constraints",
+        "indexes",
+        "if_not_exists",
+    )
+    _children = TableIR._children
+
+    name: str
+    columns: tuple[ColumnIR, ...]
+    foreign_keys: tuple[ForeignKeyIR, ...]
+    unique_constraints: tuple[UniqueConstraintIR, ...]
+    indexes: tuple[IndexIR, ...]
+    if_not_exists: bool
+
+    def __init__(
+        self,
+        name: str,
+        columns: tuple[ColumnIR, ...] = (),
+        foreign_keys: tuple[ForeignKeyIR, ...] = (),
+        unique_constraints: tuple[UniqueConstraintIR, ...] = (),
+        indexes: tuple[IndexIR, ...] = (),
+        if_not_exists: bool = False,
+    ):
+        self._assign(
+            name,
+            tuple(columns),
+            tuple(foreign_keys),
+            tuple(unique_constraints),
+            tuple(indexes),
+            if_not_exists,
+        )
+
+
+class CreateIndexIR(IRNode):
+    """
+    CREATE INDEX文のパース結果
+    """
+
+    __slots__ = ()
+    _fields = ("table_name", "columns", "name", "unique")
+
+    table_name: str
+    columns: tuple[str, ...]
+    name: str | None
+    unique: bool
+
+    def __init__(
+        self,
+        table_name: str,
+        columns: tuple[str, ...],
+        name: str | None = None,
+        unique: bool = False,
+    ):
+        self._assign(table_name, tuple(columns), name, unique)
+
+
+class ColumnChangeIR(IRNode):
+    """
+    ALTER TABLEによるカラムの変更。columnはkind="add"の場合だけ1要素を持つ
+    """
+
+    __slots__ = ()
+    _fields = ("kind", "name", "column", "new_name")
+    _children = {"column": ColumnIR}
+
+    kind: str
+    name: str
+    column: tuple[ColumnIR, ...]
+    new_name: str | None
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        column: tuple[ColumnIR, ...] = (),
+        new_name: str | None = None,
+    ):
+        self._assign(kind, name, tuple(column), new_name)
+
+
+class AlterTableIR(IRNode):
+    """
+    ALTER TABLE文のパース結果
+    """
+
+    __slots__ = ()
+    _fields = (
+        "table_name",
+        "column_changes",
+        "primary_key",
+        "foreign_keys",
+        "unique_constraints",
+        "indexes",
+        "new_name",
+    )
+    _children = {
+        "column_changes": ColumnChangeIR,
+        "foreign_keys": ForeignKeyIR,
+        "unique_constraints": UniqueConstraintIR,
+        "indexes": IndexIR,
+    }
+
+    table_name: str
+    column_changes: tuple[ColumnChangeIR, ...]
+    primary_key: tuple[str, ...]
+    foreign_keys: tuple[ForeignKeyIR, ...]
+    unique_constraints: tuple[UniqueConstraintIR, ...]
+    indexes: tuple[IndexIR, ...]
+    new_name: str | None
+
+    def __init__(
+        self,
+        table_name: str,
+        column_changes: tuple[ColumnChangeIR, ...] = (),
+        primary_key: tuple[str, ...] = (),
+        foreign_keys: tuple[ForeignKeyIR, ...] = (),
+        unique_constraints: tuple[UniqueConstraintIR, ...] = (),
+        indexes: tuple[IndexIR, ...] = (),
+        new_name: str | None = None,
+    ):
+        self._assign(
+            table_name,
+            tuple(column_changes),
+            tuple(primary_key),
+            tuple(foreign_keys),
+            tuple(unique_constraints),
+            tuple(indexes),
+            new_name,
+        )
+
+
+class DropTableIR(IRNode):
+    """
+    DROP TABLE文のパース結果
+    """
+
+    __slots__ = ()
+    _fields = ("table_names",)
+
+    table_names: tuple[str, ...]
+
+    def __init__(self, table_names: tuple[str, ...]):
+        self._assign(tuple(table_names))
+
+
+OperationIR = CreateTableIR | CreateIndexIR | AlterTableIR | DropTableIR
+
+
+class ParseResultIR(IRNode):
+    """
+    1つのSQLファイルのパース結果(スキーマに対する操作を文の順に並べたもの)
+    """
+
+    __slots__ = ()
+    _fields = ("operations",)
+    _children = {
+        "operations": (CreateTableIR, CreateIndexIR, AlterTableIR, DropTableIR)
+    }
+
+    operations: tuple[OperationIR, ...]
+
+    def __init__(self, operations: tuple[OperationIR, ...] = ()):
+        self._assign(tuple(operations))
+
+
+def encode_ir(node: IRNode) -> list[Any]:
+    """
+    要素を、JSONで書き出せる値(属性の値の配列)に変換する
+    """
+    return _encode(node)
+
+
+def decode_ir(cls: type[NodeT], values: Any) -> NodeT:
+    """
+    encode_irの値から要素を復元する。形式が異なる場合はValueError
+
+    notes:
+        * 要素の属性の数・子の要素の型を検証し、JSONの配列は属性の値のタプルにする
+        * 大量の要素を作成する間に循環参照のGCが何度も走らないよう、GCを止めて復元する
+        (要素は循環参照を作らない)
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode(cls, values)
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"Broken {cls.__name__} data") from error
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def dumps_schema(schema: SchemaIR) -> bytes:
+    """
+    中間表現をバージョン付きのバイト列にする
+
+    notes:
+        * 識別子・形式のバージョンに続けて、encode_irの値をJSONで書き出す
+    """
+    return _HEADER.pack(SCHEMA_IR_MAGIC, SCHEMA_IR_FORMAT_VERSION) + json.dumps(
+        _encode(schema), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads_schema(data: bytes) -> SchemaIR:
+    """
+    dumps_schemaのバイト列から中間表現を復元する。形式が異なる場合はValueError
+
+    notes:
+        * 内容はJSONとして読み込み、decode_irで検証してから要素にする
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a schema IR file")
+    magic, format_version = _HEADER.unpack_from(data)
+    if magic != SCHEMA_IR_MAGIC:
+        raise ValueError("Not a schema IR file")
+    if format_version != SCHEMA_IR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported schema IR version: {format_version}")
+    try:
+        values = json.loads(memoryview(data)[_HEADER.size :].tobytes())
+    except ValueError as error:
+        raise ValueError("Broken schema IR file") from error
+    return decode_ir(SchemaIR, values)
+
+
+def dump_schema(schema: SchemaIR, path: str) -> None:
+    """
+    中間表現をファイルに書き出す(一時ファイルに書き出してからrenameする)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=".tmp-", suffix=SCHEMA_IR_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumps_schema(schema))
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def load_schema(path: str) -> SchemaIR:
+    """
+    dump_schemaで書き出したファイルから中間表現を読み込む
+    """
+    with open(path, "rb") as f:
+        return loads_schema(f.read())
+
+
+def _encode(node: IRNode) -> list[Any]:
+    children = node._children
+    if not children:
+        return list(node._values)
+    return [
+        _encode_all(children[name], value) if name in children else value
+        for name, value in zip(node._fields, node._values)
+    ]
+
+
+def _encode_all(
+    cls: type[IRNode] | tuple[type[IRNode], ...], nodes: tuple[IRNode, ...]
+) -> list[Any]:
+    if isinstance(cls, tuple):
+        return [[type(node).__name__, _encode(node)] for node in nodes]
+    return [_encode(node) for node in nodes]
+
+
+def _decode(cls: type[IRNode], values: list[Any]) -> Any:
+    children = cls._children
+    if not isinstance(values, list) or len(values) != len(cls._fields):
+        raise TypeError(f"{cls.__name__} takes {len(cls._fields)} values")
+    node = cls.__new__(cls)
+    _SET_VALUES(
+        node,
+        tuple(
+            _decode_all(children[name], value)
+            if name in children
+            else _decode_value(value)
+            for name, value in zip(cls._fields, values)
+        ),
+    )
+    return node
+
+
+def _decode_all(
+    cls: type[IRNode] | tuple[type[IRNode], ...], items: list[Any]
+) -> tuple[Any, ...]:
+    if not isinstance(items, list):
+        raise TypeError(f"Expected a list of {cls}")
+    if isinstance(cls, tuple):
+        types = {child_cls.__name__: child_cls for child_cls in cls}
+        return tuple(_decode(types[name], values) for name, values in items)
+    if cls._children:
+        return tuple(_decode(cls, values) for values in items)
+    # 子を持たない要素は、_decodeを経由せずに値を設定する
+    new = cls.__new__
+    set_values = _SET_VALUES
+    size = len(cls._fields)
+    nodes = []
+    for values in items:
+        if not isinstance(values, list) or len(values) != size:
+            raise TypeError(f"{cls.__name__} takes {size} values")
+        node = new(cls)
+        set_values(node, tuple(map(_decode_value, values)))
+        nodes.append(node)
+    return tuple(nodes)
+
+
+def _decode_value(value: Any) -> Any:
+    """
+    属性の値を検証する(JSONの配列は文字列のタプルにする)
+    """
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return tuple(value)
+    raise TypeError(f"Unsupported IR value: {value!r}")
+
+
+# __slots__の_valuesのデスクリプタ(__setattr__を経由せずに値を設定する)
+_SET_VALUES = IRNode.__dict__["_values"].__set__
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import mmap
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator
+
+SQL_FILE_SUFFIX = ".sql"
+
+_DIGITS_PATTERN = re.compile(r"(\d+)")
+# 区切り文字・コメントのトークン(_SPECIAL_PATTERNで探すもののうち、引用符以外)
+_STATEMENT_DELIMITER = ";"
+_LINE_COMMENT = "--"
+_HASH_COMMENT = "#"
+_BLOCK_COMMENT_START = "/*"
+_BLOCK_COMMENT_END = "*/"
+# 文の区切りの判定で特別に扱うトークン(引用符・コメント・ドル引用符・区切り文字)
+_SPECIAL_PATTERN = re.compile(r"""'|"|`|--|#|/\*|\$(?:[A-Za-z_]\w*)?\$|;""")
+_CREATE_TABLE_PATTERN = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL|LOCAL)\s+)?"
+    r"(?:TEMP(?:ORARY)?\s+)?(?:UNLOGGED\s+)?TABLE\b",
+    re.IGNORECASE,
+)
+_CREATE_INDEX_PATTERN = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\b", re.IGNORECASE)
+_ALTER_TABLE_PATTERN = re.compile(r"ALTER\s+TABLE\b", re.IGNORECASE)
+_DROP_TABLE_PATTERN = re.compile(r"DROP\s+(?:TEMP(?:ORARY)?\s+)?TABLE\b", re.IGNORECASE)
+# DROP TABLE文の対象のテーブル名(sqlglotは複数のテーブルを指定した文をパースできない)
+_DROP_TABLE_NAMES_PATTERN = re.compile(
+    _DROP_TABLE_PATTERN.pattern
+    + r"\s+(?:IF\s+EXISTS\s+)?(?P<names>.+?)(?:\s+(?:CASCADE|RESTRICT))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_IDENTIFIER_QUOTES = '"`[]'
+# スキーマ定義の文(iter_schema_statementsで返す文)の先頭
+_SCHEMA_STATEMENT_PATTERN = re.compile(
+    b"|".join(
+        b"(?:%s)" % pattern.pattern.encode()
+        for pattern in (
+            _CREATE_TABLE_PATTERN,
+            _CREATE_INDEX_PATTERN,
+            _ALTER_TABLE_PATTERN,
+            _DROP_TABLE_PATTERN,
+        )
+    ),
+    re.IGNORECASE,
+)
+# 直後にデータ行が続くPostgreSQLのCOPY文(データ行は\.の行で終わる)
+_COPY_FROM_STDIN_PATTERN = re.compile(
+    rb"COPY\b[^;]*?\bFROM\s+STDIN\b", re.IGNORECASE | re.DOTALL
+)
+_COPY_DATA_END = b"\n\\."
+# 読み終えた範囲のページを解放する間隔(ファイルサイズによらずメモリ使用量を一定にする)
+_RELEASE_BYTES = 16 * 1024 * 1024
+_LEADING_COMMENT_PATTERN = re.compile(
+    r"\s*(?:--[^\n]*\n?|#[^\n]*\n?|/\*.*?\*/)", re.DOTALL
+)
+
+
+def iter_sql_files(path: str, natural: bool = False) -> list[str]:
+    """
+    入力のSQLファイルの一覧を返す。ディレクトリの場合は配下の.sqlファイルをパス順に返す
+
+    notes:
+        * natural=Trueの場合、パス中の数字を数値として比較する
+        (マイグレーションのV2__a.sqlをV10__b.sqlより前にする)
+    """
+    if not os.path.isdir(path):
+        return [path]
+    files = [file for file in Path(path).rglob(f"*{SQL_FILE_SUFFIX}") if file.is_file()]
+    if natural:
+        files.sort(key=lambda file: _natural_key(file.relative_to(path).as_posix()))
+    else:
+        files.sort()
+    return [str(file) for file in files]
+
+
+def _natural_key(text: str) -> list[str | int]:
+    # re.splitは文字列・数字を交互に返すため、同じ位置の要素は同じ型になる
+    return [
+        int(part) if index % 2 else part
+        for index, part in enumerate(_DIGITS_PATTERN.split(text))
+    ]
+
+
+def iter_sql_statements(
+    lines: Iterable[str], hash_comments: bool = False, backslash_escapes: bool = False
+) -> Iterator[str]:
+    """
+    SQLを1行ずつ読みながら、セミコロンで区切った文を順に返す
+
+    notes:
+        * 引用符('...', "...", `...`)・コメント(--, /* */)・ドル引用符($$...$$, $tag$...$tag$)
+        の中のセミコロンは区切りとみなさない
+        * hash_comments=Trueの場合は#から行末まで、backslash_escapes=Trueの場合は
+        引用符内のバックスラッシュによるエスケープを扱う(MySQL)
+        * 保持するのは読み込み中の文だけなので、ファイル全体をメモリに載せない
+        * 空の文・コメントのみの文は返さない
+    """
+    parts: list[str] = []
+    has_content = False
+    # 引用符・ブロックコメント・ドル引用符の中であれば、その終端
+    closing: str | None = None
+
+    for line in lines:
+        position = 0
+        length = len(line)
+        while position < length:
+            if closing is not None:
+                end = _find_closing(line, position, closing, backslash_escapes)
+                if end < 0:
+                    position = length
+                    break
+                position = end
+                closing = None
+                continue
+
+            match = _SPECIAL_PATTERN.search(line, position)
+            if match is None:
+                if line[position:].strip():
+                    has_content = True
+                position = length
+                break
+
+            token = match.group()
+            if line[position : match.start()].strip():
+                has_content = True
+            position = match.end()
+            if token == _STATEMENT_DELIMITER:
+                parts.append(line[: match.start()])
+                if has_content:
+                    yield "".join(parts).strip()
+                parts = []
+                has_content = False
+                line = line[position:]
+                length = len(line)
+                position = 0
+            elif token == _LINE_COMMENT or (token == _HASH_COMMENT and hash_comments):
+                position = length
+            elif token == _HASH_COMMENT:
+                has_content = True
+            elif token == _BLOCK_COMMENT_START:
+                closing = _BLOCK_COMMENT_END
+            else:
+                # 引用符・ドル引用符
+                has_content = True
+                closing = token
+        parts.append(line)
+
+    if has_content:
+        yield "".join(parts).strip()
+
+
+def iter_schema_statements(
+    path: str, hash_comments: bool = False, backslash_escapes: bool = False
+) -> Iterator[str]:
+    """
+    SQLファイルをメモリマップして、スキーマ定義の文(CREATE TABLE, CREATE INDEX,
+    ALTER TABLE, DROP TABLE)のみを順に返す
+
+    notes:
+        * 文の区切りはバイト列に対する正規表現で探し、INSERTなどのデータの文は
+        デコード・文字列化せずに読み飛ばす。引用符・コメント・ドル引用符と
+        hash_comments・backslash_escapesの扱いはiter_sql_statementsと同じ
+        * COPY ... FROM stdinに続くデータ行(\\.の行まで)は文として扱わずに読み飛ばす
+        * ファイル全体をメモリに読み込まないため、データを含むダンプでもメモリ使用量は
+        スキーマ定義の文の大きさだけで決まる
+        * 返す文は先頭のコメントと末尾のセミコロンを除く
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from _scan_schema_statements(
+                data,
+                _leading_pattern(hash_comments),
+                _statement_pattern(hash_comments, backslash_escapes),
+            )
+
+
+def _scan_schema_statements(
+    data: mmap.mmap, leading: re.Pattern[bytes], statement: re.Pattern[bytes]
+) -> Iterator[str]:
+    size = len(data)
+    position = 0
+    released = 0
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        data.madvise(mmap.MADV_SEQUENTIAL)
+    while position < size:
+        if position - released >= _RELEASE_BYTES and hasattr(mmap, "MADV_DONTNEED"):
+            release_end = position - position % mmap.PAGESIZE
+            data.madvise(mmap.MADV_DONTNEED, released, release_end - released)
+            released = release_end
+        # leadingは空文字列にも一致するため、Noneにはならない
+        if skipped := leading.match(data, position):
+            position = skipped.end()
+        if position >= size:
+            break
+
+        # 閉じていない引用符・コメントがある場合は、ファイルの末尾までを1つの文とする
+        match = statement.match(data, position)
+        end = match.end() if match else size
+        body_end = end - 1 if data[end - 1 : end] == b";" else end
+
+        if _SCHEMA_STATEMENT_PATTERN.match(data, position, body_end):
+            yield data[position:body_end].decode("utf-8").rstrip()
+        elif _COPY_FROM_STDIN_PATTERN.match(data, position, body_end):
+            data_end = data.find(_COPY_DATA_END, end)
+            end = size if data_end < 0 else data_end + len(_COPY_DATA_END)
+        position = end
+
+
+@lru_cache(maxsize=None)
+def _leading_pattern(hash_comments: bool) -> re.Pattern[bytes]:
+    """
+    文の前の空白・コメントに一致するパターン
+    """
+    hash_comment = rb"|\#[^\n]*+" if hash_comments else b""
+    return re.compile(rb"(?:\s++|--[^\n]*+|/\*.*?\*/%s)*+" % hash_comment, re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def _statement_pattern(
+    hash_comments: bool, backslash_escapes: bool
+) -> re.Pattern[bytes]:
+    """
+    文の先頭から区切りのセミコロン(またはファイルの末尾)までに一致するパターン
+
+    notes:
+        * 繰り返しを強欲(possessive)にして、巨大なINSERT文でもバックトラックしない
+    """
+    if backslash_escapes:
+        single = rb"'(?:[^'\\]++|\\.)*+'"
+        double = rb'"(?:[^"\\]++|\\.)*+"'
+    else:
+        single = rb"'[^']*+'"
+        double = rb'"[^"]*+"'
+    specials = rb"""'"`;$/\-""" + (rb"\#" if hash_comments else b"")
+    alternatives = [
+        rb"[^%s]++" % specials,
+        single,
+        double,
+        rb"`[^`]*+`",
+        rb"--[^\n]*+",
+        rb"/\*.*?\*/",
+        rb"\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$",
+        rb"[$/\-]",
+    ]
+    if hash_comments:
+        alternatives.append(rb"\#[^\n]*+")
+    return re.compile(rb"(?:%s)*+(?:;|\Z)" % b"|".join(alternatives), re.DOTALL)
+
+
+def drop_table_names(statement: str) -> list[str] | None:
+    """
+    DROP TABLE文の対象のテーブル名(スキーマ名・引用符を除く)を返す。DROP TABLE文でない場合はNone
+    """
+    position = _skip_leading_comments(statement)
+    match = _DROP_TABLE_NAMES_PATTERN.match(statement, position)
+    if match is None:
+        return None
+    return [
+        name.strip().rsplit(".", 1)[-1].strip(_IDENTIFIER_QUOTES)
+        for name in match.group("names").split(",")
+    ]
+
+
+def is_create_table(statement: str) -> bool:
+    """
+    CREATE TABLE文かどうかを、先頭のコメントを除いたキーワードで判定する
+    """
+    return _match_keywords(_CREATE_TABLE_PATTERN, statement)
+
+
+def is_create_index(statement: str) -> bool:
+    """
+    CREATE [UNIQUE] INDEX文かどうかを、先頭のコメントを除いたキーワードで判定する
+    """
+    return _match_keywords(_CREATE_INDEX_PATTERN, statement)
+
+
+def _match_keywords(pattern: re.Pattern[str], statement: str) -> bool:
+    return pattern.match(statement, _skip_leading_comments(statement)) is not None
+
+
+def _skip_leading_comments(statement: str) -> int:
+    position = 0
+    while match := _LEADING_COMMENT_PATTERN.match(statement, position):
+        if match.end() == position:
+            break
+        position = match.end()
+    return _skip_space(statement, position)
+
+
+def _skip_space(text: str, position: int) -> int:
+    while position < len(text) and text[position].isspace():
+        position += 1
+    return position
+
+
+def _find_closing(
+    line: str, position: int, closing: str, backslash_escapes: bool
+) -> int:
+    """
+    closingの終端の直後の位置を返す。この行で閉じない場合は-1
+    """
+    while True:
+        end = line.find(closing, position)
+        if end < 0:
+            return -1
+        if backslash_escapes and closing in ("'", '"'):
+            # 直前のバックスラッシュが奇数個であればエスケープされている
+            backslashes = 0
+            index = end - 1
+            while index >= position and line[index] == "\\":
+                backslashes += 1
+                index -= 1
+            if backslashes % 2:
+                position = end + 1
+                continue
+        return end + len(closing)
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import ast
+import builtins
+import tokenize
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+from .graph import strongly_connected_components
+from .symbol_index import (
+    ClassSource,
+    bind_import,
+    collect_references,
+    filter_imports,
+)
+
+# トップレベルの文の区切りとみなさないトークン
+_NON_STATEMENT_TOKENS = {
+    tokenize.NL,
+    tokenize.NEWLINE,
+    tokenize.COMMENT,
+    tokenize.INDENT,
+    tokenize.DEDENT,
+    tokenize.ENCODING,
+    tokenize.ENDMARKER,
+}
+_BUILTIN_NAMES = frozenset(dir(builtins))
+
+# 分割するクラスの情報 → (ファイル名, 内容)
+ClassRenderer = Callable[[ClassSource], tuple[str, str] | None]
+
+
+def iter_top_level_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    ソースコードを1行ずつ読みながら、トップレベルの文(デコレータを含む)のソースコードを順に返す
+
+    notes:
+        * 保持するのは読み込み中の文の行だけなので、ソース全体をメモリに載せない
+        * 文の後ろに続く空行とコメント行は、文に含めない
+    """
+    iterator = iter(lines)
+    buffer: list[str] = []
+    # buffer[0]の行番号(1始まり)
+    buffer_start = 1
+    statement_start: int | None = None
+
+    def readline() -> str:
+        line = next(iterator, "")
+        if line:
+            buffer.append(line)
+        return line
+
+    def take(end: int) -> str:
+        """
+        statement_startからend行目の手前までを文として取り出す
+        """
+        nonlocal buffer, buffer_start
+        if statement_start is None:
+            raise RuntimeError("No statement has been started")
+        statement_lines = buffer[statement_start - buffer_start : end - buffer_start]
+        buffer = buffer[end - buffer_start :]
+        buffer_start = end
+        while statement_lines and (
+            not statement_lines[-1].strip() or statement_lines[-1].startswith("#")
+        ):
+            statement_lines.pop()
+        return "".join(statement_lines).rstrip("\r\n")
+
+    depth = 0
+    at_line_start = True
+    decorating = False
+    for token in tokenize.generate_tokens(readline):
+        if token.type == tokenize.INDENT:
+            depth += 1
+        elif token.type == tokenize.DEDENT:
+            depth -= 1
+
+        if token.type in (tokenize.NEWLINE, tokenize.DEDENT):
+            at_line_start = True
+            continue
+        if token.type == tokenize.ENDMARKER:
+            break
+        if token.type in _NON_STATEMENT_TOKENS:
+            continue
+
+        if at_line_start and depth == 0:
+            row = token.start[0]
+            if statement_start is None:
+                # 先頭のコメント・空行は読み捨てる
+                buffer = buffer[row - buffer_start :]
+                buffer_start = row
+                statement_start = row
+            elif not decorating:
+                # デコレータの場合は、続くクラス・関数定義と合わせて1つの文とする
+                yield take(row)
+                statement_start = row
+            decorating = token.string == "@"
+        at_line_start = False
+
+    if statement_start is not None:
+        if statement := take(buffer_start + len(buffer)):
+            yield statement
+
+
+class StreamingSplitter:
+    """
+    生成されたモデルのソースコードをトップレベルの文ごとに受け取り、依存関係が確定した
+    クラスから順にファイルとして出力する
+
+    notes:
+        * クラスが参照する名前のうち、import・定義済みのクラス・組み込み名のいずれでもない
+        ものは後方で定義されるクラスの可能性があるため、それが確定するまで出力を保留する
+        * クラスごとに未確定の名前と出力されていない依存先の数を数え、0になったクラスから
+        順に出力するため、各クラスの依存関係をたどるのは1回だけで済む
+        * 循環参照のクラスは、推移的な依存先の名前がすべて確定するまで出力を保留し、
+        確定した時点で依存先の強連結成分ごとにまとめて出力する
+        * 保持するのはimport文・名前の一覧・保留中のクラスのみで、通常は依存先が先に
+        定義されるため、メモリ使用量は最大のクラスの大きさで抑えられる
+    """
+
+    imports: list[ast.Import | ast.ImportFrom]
+    import_bindings: dict[str, tuple[int, ast.alias]]
+    class_names: set[str]
+    other_names: set[str]
+    _render: ClassRenderer
+    _pending: dict[str, tuple[str, set[str], set[str], set[str]]]
+    _waiting: dict[str, set[str]]
+    _blockers: dict[str, int]
+    _dependents: dict[str, set[str]]
+    _ready: deque[str]
+    _stalled: set[str]
+
+    def __init__(self, render: ClassRenderer):
+        self.imports = []
+        self.import_bindings = {}
+        self.class_names = set()
+        self.other_names = set()
+        self._render = render
+        # クラス名 → (ソースコード, 参照している名前, 型ヒント以外で参照している名前, 未確定の名前)
+        self._pending = {}
+        # 未確定の名前 → その名前を待っているクラス
+        self._waiting = {}
+        # 保留中のクラス → 未確定の名前の数 + 出力されていない(保留中の)依存先の数
+        self._blockers = {}
+        # 保留中のクラス → それに依存している保留中のクラス
+        self._dependents = {}
+        # 未確定の名前・保留中の依存先がなくなり、単独で出力できるクラス
+        self._ready = deque()
+        # 未確定の名前はないが保留中の依存先が残っているクラス(循環参照の判定対象)
+        self._stalled = set()
+
+    def feed(self, statement: str) -> Iterator[tuple[str, str]]:
+        """
+        トップレベルの文を1つ受け取り、出力可能になったファイルを返す
+        """
+        for node in ast.parse(statement).body:
+            if isinstance(node, ast.ClassDef):
+                yield from self._feed_class(node, statement)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                bindings = bind_import(len(self.imports), node)
+                self.import_bindings.update(bindings)
+                self.imports.append(node)
+                yield from self._resolve(set(bindings))
+            else:
+                names = {
+                    target.id
+                    for target in ast.walk(node)
+                    if isinstance(target, ast.Name)
+                    and isinstance(target.ctx, ast.Store)
+                }
+                self.other_names |= names
+                yield from self._resolve(names)
+
+    def _feed_class(
+        self, node: ast.ClassDef, statement: str
+    ) -> Iterator[tuple[str, str]]:
+        references = collect_references(node)
+        unresolved = {
+            name
+            for name in references
+            if name != node.name
+            and name not in self.import_bindings
+            and name not in self.class_names
+            and name not in self.other_names
+            and name not in _BUILTIN_NAMES
+        }
+        self.class_names.add(node.name)
+        self._pending[node.name] = (
+            statement,
+            references,
+            collect_references(node, include_annotations=False),
+            unresolved,
+        )
+        for name in unresolved:
+            self._waiting.setdefault(name, set()).add(node.name)
+
+        self._dependents.setdefault(node.name, set())
+        self._blockers[node.name] = len(unresolved)
+        for dependency in self._dependencies(node.name):
+            self._add_dependency(node.name, dependency)
+        if not self._blockers[node.name]:
+            self._ready.append(node.name)
+        yield from self._resolve({node.name})
+
+    def finish(self) -> Iterator[tuple[str, str]]:
+        """
+        最後まで定義されなかった名前を待っているクラスを、クラス以外の名前として出力する
+        """
+        yield from self._resolve(set(self._waiting))
+
+    def _resolve(self, names: set[str]) -> Iterator[tuple[str, str]]:
+        for name in sorted(names):
+            for class_name in sorted(self._waiting.pop(name, ())):
+                self._pending[class_name][3].discard(name)
+                # 後方で定義されたクラスであれば、名前の代わりに依存先として待つ
+                self._add_dependency(class_name, name)
+                self._release(class_name)
+        yield from self._emit_ready()
+
+    def _dependencies(self, class_name: str) -> list[str]:
+        references = self._pending[class_name][1]
+        return sorted(
+            name
+            for name in references
+            if name in self.class_names and name != class_name
+        )
+
+    def _add_dependency(self, class_name: str, dependency: str) -> None:
+        if dependency in self._pending and dependency != class_name:
+            self._dependents[dependency].add(class_name)
+            self._blockers[class_name] += 1
+
+    def _release(self, class_name: str) -> None:
+        """
+        クラスの未確定の名前・保留中の依存先が1つ減ったことを記録する
+        """
+        self._blockers[class_name] -= 1
+        if not self._blockers[class_name]:
+            self._ready.append(class_name)
+        elif not self._pending[class_name][3]:
+            self._stalled.add(class_name)
+
+    def _closure(self, class_name: str) -> dict[str, list[str]] | None:
+        """
+        保留中の推移的な依存先の依存関係を返す。未確定の名前が残っている場合はNone
+        """
+        graph: dict[str, list[str]] = {}
+        stack = [class_name]
+        while stack:
+            name = stack.pop()
+            if name in graph:
+                continue
+            if self._pending[name][3]:
+                return None
+            dependencies = [
+                dependency
+                for dependency in self._dependencies(name)
+                if dependency in self._pending
+            ]
+            graph[name] = dependencies
+            stack.extend(dependencies)
+        return graph
+
+    def _emit_ready(self) -> Iterator[tuple[str, str]]:
+        while self._ready or self._stalled:
+            while self._ready:
+                class_name = self._ready.popleft()
+                if class_name in self._pending:
+                    yield from self._emit(class_name, {class_name})
+
+            # 依存先を待ち続けているクラスは、循環参照の依存先がすべて確定していれば
+            # 依存先の強連結成分から順にまとめて出力する
+            stalled = sorted(self._stalled)
+            self._stalled.clear()
+            for class_name in stalled:
+                if class_name not in self._pending:
+                    continue
+                graph = self._closure(class_name)
+                if graph is None:
+                    continue
+                for component in strongly_connected_components(graph):
+                    members = set(component)
+                    for name in component:
+                        yield from self._emit(name, members)
+
+    def _emit(self, class_name: str, component: set[str]) -> Iterator[tuple[str, str]]:
+        dependencies = self._dependencies(class_name)
+        source, references, runtime_references, _ = self._pending.pop(class_name)
+        del self._blockers[class_name]
+        for dependent in sorted(self._dependents.pop(class_name)):
+            if dependent in self._pending:
+                self._release(dependent)
+        imports = filter_imports(self.imports, self.import_bindings, references)
+        class_source = ClassSource(
+            name=class_name,
+            source=source,
+            imports=imports,
+            dependencies=dependencies,
+            cyclic_dependencies=[
+                dependency for dependency in dependencies if dependency in component
+            ],
+            runtime_references=runtime_references,
+        )
+        if rendered := self._render(class_source):
+            yield rendered
+
+
+def split_stream(
+    lines: Iterable[str], render: ClassRenderer
+) -> Iterator[tuple[str, str]]:
+    """
+    ソースコードを1行ずつ読み、クラスごとの(ファイル名, 内容)を出力可能になった順に返す
+    """
+    splitter = StreamingSplitter(render)
+    for statement in iter_top_level_statements(lines):
+        yield from splitter.feed(statement)
+    yield from splitter.finish()
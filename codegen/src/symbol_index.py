@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import ast
+from copy import copy
+
+from .graph import strongly_connected_components
+from .schema_ir import FieldIR, ModelIR
+
+
+class ClassSource:
+    """
+    分割して出力する1クラス分の情報
+
+    notes:
+        * dependencies: 参照している他のモデルクラス
+        * cyclic_dependencies: dependenciesのうち、循環参照(同じ強連結成分)になっているもの
+        * runtime_references: 型ヒント以外(基底クラス・デフォルト値など)で参照している名前
+    """
+
+    name: str
+    source: str
+    imports: list[ast.Import | ast.ImportFrom]
+    dependencies: list[str]
+    cyclic_dependencies: list[str]
+    runtime_references: set[str]
+
+    def __init__(
+        self,
+        name: str,
+        source: str,
+        imports: list[ast.Import | ast.ImportFrom],
+        dependencies: list[str],
+        cyclic_dependencies: list[str],
+        runtime_references: set[str],
+    ):
+        self.name = name
+        self.source = source
+        self.imports = imports
+        self.dependencies = dependencies
+        self.cyclic_dependencies = cyclic_dependencies
+        self.runtime_references = runtime_references
+
+    def __repr__(self) -> str:
+        return f"ClassSource(name={self.name}, dependencies={self.dependencies}, cyclic_dependencies={self.cyclic_dependencies})"
+
+
+class SymbolIndex:
+    """
+    生成されたモデルのソースコードを1回だけパースし、分割に必要なシンボル情報を保持する
+
+    notes:
+        * class_references: クラス → クラス内で参照している名前
+        * import_bindings: 名前 → その名前を定義しているimport文(のインデックスとalias)
+        * class_dependencies: クラス → 参照している他のモデルクラス
+        * dependents: クラス → そのクラスを参照しているモデルクラス
+        * components: クラス → 同じ強連結成分(互いに参照し合う)のクラス
+    """
+
+    source_code: str
+    imports: list[ast.Import | ast.ImportFrom]
+    classes: list[ast.ClassDef]
+    import_bindings: dict[str, tuple[int, ast.alias]]
+    class_references: dict[str, set[str]]
+    class_runtime_references: dict[str, set[str]]
+    class_dependencies: dict[str, list[str]]
+    dependents: dict[str, set[str]]
+    components: dict[str, frozenset[str]]
+    _lines: list[str]
+
+    def __init__(self, source_code: str):
+        self.source_code = source_code
+        self._lines = source_code.splitlines(keepends=True)
+
+        tree = ast.parse(source_code)
+        self.imports = []
+        self.classes = []
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.imports.append(node)
+            elif isinstance(node, ast.ClassDef):
+                self.classes.append(node)
+
+        self.import_bindings = {}
+        for index, import_node in enumerate(self.imports):
+            self.import_bindings.update(bind_import(index, import_node))
+
+        class_names = {node.name for node in self.classes}
+        self.class_references = {}
+        self.class_runtime_references = {}
+        self.class_dependencies = {}
+        self.dependents = {name: set() for name in class_names}
+        for class_node in self.classes:
+            references = collect_references(class_node)
+            self.class_references[class_node.name] = references
+            self.class_runtime_references[class_node.name] = collect_references(
+                class_node, include_annotations=False
+            )
+            dependencies = sorted(
+                name
+                for name in references
+                if name in class_names and name != class_node.name
+            )
+            self.class_dependencies[class_node.name] = dependencies
+            for dependency in dependencies:
+                self.dependents[dependency].add(class_node.name)
+
+        self.components = {}
+        for component in strongly_connected_components(self.class_dependencies):
+            members = frozenset(component)
+            for name in component:
+                self.components[name] = members
+
+    def imports_for(self, class_name: str) -> list[ast.Import | ast.ImportFrom]:
+        """
+        クラスが使用している名前のみに絞り込んだimport文を、元の順序で返す
+        """
+        return filter_imports(
+            self.imports, self.import_bindings, self.class_references[class_name]
+        )
+
+    def class_source(self, class_node: ast.ClassDef) -> ClassSource:
+        """
+        クラスを分割して出力するための情報を返す
+        """
+        name = class_node.name
+        dependencies = self.class_dependencies[name]
+        return ClassSource(
+            name=name,
+            source=self.source_segment(class_node),
+            imports=self.imports_for(name),
+            dependencies=dependencies,
+            cyclic_dependencies=[
+                dependency
+                for dependency in dependencies
+                if dependency in self.components[name]
+            ],
+            runtime_references=self.class_runtime_references[name],
+        )
+
+    def models(self) -> tuple[ModelIR, ...]:
+        """
+        クラスごとの中間表現(基底クラス・型ヒント付きの属性・参照しているモデルクラス)を返す
+        """
+        return tuple(
+            model_ir(class_node, self.class_dependencies[class_node.name])
+            for class_node in self.classes
+        )
+
+    def source_segment(self, node: ast.stmt) -> str:
+        """
+        トップレベルの文のソースコードを返す
+
+        notes:
+            * ast.get_source_segmentは呼び出しごとにソース全体を行分割するため、
+            行のリストを使い回して切り出す
+        """
+        if node.end_lineno is None or node.end_col_offset is None:
+            raise ValueError(f"Statement has no end position: line {node.lineno}")
+        start = node.lineno
+        col_offset = node.col_offset
+        if decorators := getattr(node, "decorator_list", None):
+            # デコレータ(@dataclassなど)も文の一部として切り出す
+            start = decorators[0].lineno
+            col_offset = decorators[0].col_offset - 1
+        lines = self._lines[start - 1 : node.end_lineno]
+        if not lines:
+            return ""
+        lines[-1] = lines[-1].encode("utf-8")[: node.end_col_offset].decode("utf-8")
+        lines[0] = lines[0].encode("utf-8")[col_offset:].decode("utf-8")
+        return "".join(lines)
+
+
+def bind_import(
+    index: int, import_node: ast.Import | ast.ImportFrom
+) -> dict[str, tuple[int, ast.alias]]:
+    """
+    import文が定義する名前 → (import文のインデックス, alias) を返す
+    """
+    return {
+        alias.asname or alias.name.split(".")[0]: (index, alias)
+        for alias in import_node.names
+    }
+
+
+def filter_imports(
+    imports: list[ast.Import | ast.ImportFrom],
+    import_bindings: dict[str, tuple[int, ast.alias]],
+    references: set[str],
+) -> list[ast.Import | ast.ImportFrom]:
+    """
+    referencesで使用している名前のみに絞り込んだimport文を、元の順序で返す
+    """
+    used_aliases: dict[int, set[int]] = {}
+    for name in references:
+        if binding := import_bindings.get(name):
+            index, alias = binding
+            used_aliases.setdefault(index, set()).add(id(alias))
+
+    import_nodes: list[ast.Import | ast.ImportFrom] = []
+    for index in sorted(used_aliases):
+        import_node = imports[index]
+        new_node = copy(import_node)
+        new_node.names = [
+            alias for alias in import_node.names if id(alias) in used_aliases[index]
+        ]
+        import_nodes.append(new_node)
+    return import_nodes
+
+
+def model_ir(class_node: ast.ClassDef, references: list[str]) -> ModelIR:
+    """
+    クラス定義の中間表現を返す。フィールドは型ヒント付きの属性のみとする
+    """
+    fields = tuple(
+        FieldIR(
+            node.target.id,
+            ast.unparse(node.annotation),
+            ast.unparse(node.value) if node.value is not None else None,
+        )
+        for node in class_node.body
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name)
+    )
+    return ModelIR(
+        class_node.name,
+        tuple(ast.unparse(base) for base in class_node.bases),
+        fields,
+        tuple(references),
+    )
+
+
+def collect_references(
+    class_node: ast.ClassDef, include_annotations: bool = True
+) -> set[str]:
+    """
+    クラス内で参照している名前を収集する
+
+    notes:
+        * 型ヒント中の list[X] / dict[str, X] / X | None や、Field(...)の引数も対象
+        * 文字列の前方参照("X")は式としてパースして名前を収集する
+        * include_annotations=Falseの場合、クラス属性の型ヒントは対象外とする
+        (クラスの定義時に評価される名前のみを収集する)
+    """
+    references: set[str] = set()
+    nodes: list[ast.AST] = [
+        *class_node.bases,
+        *class_node.keywords,
+        *class_node.decorator_list,
+        *class_node.body,
+    ]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                references.add(node.id)
+        elif isinstance(node, ast.AnnAssign):
+            # 属性名(target)は参照ではないため除外し、型ヒントは前方参照も含めて収集
+            if include_annotations:
+                nodes.extend(_annotation_nodes(node.annotation))
+            if node.value is not None:
+                nodes.append(node.value)
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return references
+
+
+def _annotation_nodes(annotation: ast.expr) -> list[ast.AST]:
+    """
+    型ヒント内の文字列による前方参照を式に展開する
+    """
+    expanded: list[ast.AST] = []
+    nodes: list[ast.AST] = [annotation]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            try:
+                nodes.append(ast.parse(node.value, mode="eval").body)
+            except SyntaxError:
+                pass
+            continue
+        if isinstance(node, ast.Name):
+            expanded.append(node)
+            continue
+        if isinstance(node, ast.Subscript) and _is_literal(node.value):
+            # Literal["..."]の文字列は値であり、前方参照ではない
+            nodes.append(node.value)
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return expanded
+
+
+def _is_literal(node: ast.expr) -> bool:
+    if isinstance(node, ast.Name):
+        return node.id == "Literal"
+    return isinstance(node, ast.Attribute) and node.attr == "Literal"
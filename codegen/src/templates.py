@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import time
+from functools import lru_cache
+from typing import Any
+
+from jinja2 import (
+    BaseLoader,
+    BytecodeCache,
+    ChoiceLoader,
+    DictLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+)
+
+ENTITY_TEMPLATE_NAME = "entity.py.jinja"
+BASE_ENTITY_TEMPLATE_NAME = "base_entity.py.jinja"
+TEMPLATE_NAMES = (ENTITY_TEMPLATE_NAME, BASE_ENTITY_TEMPLATE_NAME)
+
+BASE_ENTITY = """\
+from sqlalchemy.orm import DeclarativeBase
+
+
+class BaseEntity(DeclarativeBase):
+    pass
+"""
+
+# コンテキストはentity_generator.entity_contextで事前に計算する
+ENTITY_TEMPLATE = """\
+{%- for python_import in python_imports -%}
+{{ python_import }}
+{% if loop.last %}
+{% endif %}
+{%- endfor -%}
+from sqlalchemy import {{ sqlalchemy_imports | join(', ') }}
+from sqlalchemy.orm import {{ orm_imports | join(', ') }}
+
+from {{ output_dir -}}.base_entity import BaseEntity
+
+
+class {{ class_name }}(BaseEntity):
+    __tablename__ = "{{ table_name }}"
+{%- if table_args %}
+    __table_args__ = (
+{%- for table_arg in table_args %}
+        {{ table_arg }},
+{%- endfor %}
+    )
+{%- endif %}
+{%- if eager_defaults %}
+    __mapper_args__ = {"eager_defaults": True}
+{%- endif %}
+{% for column in columns %}
+    {{ column.name }}: Mapped[{{ column.python_type -}}
+        {{ '| None' if column.nullable else '' }}] = mapped_column(
+        {{- column.sqlalchemy_type }}
+        {%- if column.type_arguments %}({{ column.type_arguments -}}){% endif -%}
+        {%- if column.identity %}, {{ column.identity }}{% endif -%}
+        {%- if column.foreign_key %}, {{ column.foreign_key }}{% endif -%}
+        , nullable={{ 'True' if column.nullable else 'False' -}}
+        {%- if column.primary_key %}, primary_key=True{% endif -%}
+        {%- if column.unique %}, unique=True{% endif -%}
+        {%- if column.index %}, index=True{% endif -%}
+        {%- if column.autoincrement %}, autoincrement=True{% endif -%}
+        {%- if column.server_default %}, server_default={{ column.server_default }}{% endif -%}
+    )
+{%- endfor %}
+{%- if relationships %}
+{% for relationship in relationships %}
+    {{ relationship.name }}: Mapped[{{ relationship.annotation }}] = relationship(
+        {{- relationship.arguments -}}
+    )
+{%- endfor %}
+{%- endif %}
+{%- if related_imports %}
+
+
+# 循環importにならないよう、クラス定義の後に関連するEntityをimportする
+{% for related_import in related_imports -%}
+{{ related_import }}  # noqa: E402
+{% endfor %}
+{%- else %}
+{% endif -%}
+"""
+
+
+@lru_cache(maxsize=None)
+def get_environment(
+    template_dir: str | None = None, bytecode_cache_dir: str | None = None
+) -> Environment:
+    """
+    テンプレートの読み込み先ごとに共有するJinjaのEnvironmentを返す
+
+    notes:
+        * template_dirにENTITY_TEMPLATE_NAME・BASE_ENTITY_TEMPLATE_NAMEがあれば、
+        組み込みのテンプレートの代わりに使用する
+        * コンパイルしたテンプレートはEnvironment内にキャッシュし、bytecode_cache_dirを
+        指定した場合はバイトコードをディスクにも保存して、プロセス・実行をまたいで再利用する
+        * プロセスごとに1つ作成するため、ワーカープロセスでも呼び出してよい
+    """
+    loaders: list[BaseLoader] = []
+    if template_dir:
+        loaders.append(FileSystemLoader(template_dir))
+    loaders.append(
+        DictLoader(
+            {
+                ENTITY_TEMPLATE_NAME: ENTITY_TEMPLATE,
+                BASE_ENTITY_TEMPLATE_NAME: BASE_ENTITY,
+            }
+        )
+    )
+
+    bytecode_cache: BytecodeCache | None = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+    # 出力はHTMLではなくPythonのソースコードなので、HTMLエスケープはしない
+    return Environment(  # nosec B701
+        loader=ChoiceLoader(loaders),
+        bytecode_cache=bytecode_cache,
+        keep_trailing_newline=True,
+        autoescape=False,
+    )
+
+
+def template_sources(template_dir: str | None) -> list[str]:
+    """
+    キャッシュキー用に、template_dirで上書きしているテンプレートの名前と内容を返す
+    """
+    if not template_dir:
+        return []
+    sources: list[str] = []
+    for name in TEMPLATE_NAMES:
+        path = os.path.join(template_dir, name)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                sources.extend([name, f.read()])
+    return sources
+
+
+def render_templates(
+    template_name: str,
+    contexts: list[tuple[str, dict[str, Any]]],
+    template_dir: str | None = None,
+    bytecode_cache_dir: str | None = None,
+) -> list[tuple[str, str, float]]:
+    """
+    (ファイル名, コンテキスト)ごとにテンプレートをレンダリングし、
+    (ファイル名, 内容, レンダリング時間)を返す(ワーカープロセスで実行する)
+    """
+    template = get_environment(template_dir, bytecode_cache_dir).get_template(
+        template_name
+    )
+    rendered: list[tuple[str, str, float]] = []
+    for file_name, context in contexts:
+        started = time.perf_counter()
+        content = template.render(context)
+        rendered.append((file_name, content, time.perf_counter() - started))
+    return rendered
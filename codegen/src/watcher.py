@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Protocol
+
+from .codegen_engine import ENGINE_INPROCESS, Engine
+from .loader import is_schema_file
+from .output import OutputSink
+from .sql_splitter import SQL_FILE_SUFFIX
+
+if TYPE_CHECKING:
+    from .entity_generator import EntityGenerator
+
+DEFAULT_DEBOUNCE_SECONDS = 0.05
+DEFAULT_POLL_INTERVAL_SECONDS = 0.2
+
+# inotify(7)の定数
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher(Protocol):
+    def set_directories(self, directories: set[str]) -> None: ...
+
+    def read(self, timeout: float) -> set[str]: ...
+
+    def close(self) -> None: ...
+
+
+class InotifyWatcher:
+    """
+    inotifyでディレクトリを監視し、変更されたファイルのパスを返す(Linuxのみ)
+
+    notes:
+        * エディタは一時ファイルをrenameして保存することが多いため、ファイルではなく
+        親ディレクトリを監視する
+        * イベントキューが溢れた場合は、監視中のディレクトリすべてを変更として返す
+    """
+
+    _fd: int
+    _watches: dict[int, str]
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches = {}
+
+    def set_directories(self, directories: set[str]) -> None:
+        watched = set(self._watches.values())
+        for wd, directory in list(self._watches.items()):
+            if directory not in directories:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+        for directory in sorted(directories - watched):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), INOTIFY_WATCH_MASK
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno), directory)
+            self._watches[wd] = directory
+
+    def read(self, timeout: float) -> set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed: set[str] = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+                offset += INOTIFY_EVENT_HEADER.size
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self._watches.values())
+                elif (directory := self._watches.get(wd)) is not None:
+                    changed.add(
+                        os.path.join(directory, os.fsdecode(name))
+                        if name
+                        else directory
+                    )
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    ディレクトリ内のファイルのmtime・サイズを定期的に比較して変更を検出する
+    """
+
+    interval: float
+    _snapshot: dict[str, tuple[int, int]]
+    _directories: set[str]
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL_SECONDS):
+        self.interval = interval
+        self._snapshot = {}
+        self._directories = set()
+
+    def set_directories(self, directories: set[str]) -> None:
+        self._directories = set(directories)
+        self._snapshot = self._scan()
+
+    def read(self, timeout: float) -> set[str]:
+        time.sleep(min(self.interval, timeout))
+        snapshot = self._scan()
+        changed = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot: dict[str, tuple[int, int]] = {}
+        for directory in self._directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+
+def create_file_watcher(
+    use_polling: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS
+) -> FileWatcher:
+    """
+    inotifyが利用可能であればInotifyWatcherを、そうでなければPollingWatcherを返す
+    """
+    if not use_polling:
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(poll_interval)
+
+
+class WatchJob(ABC):
+    """
+    監視対象の入力と、前回生成した出力を保持する生成ジョブ
+    """
+
+    output_dir: str
+    files: set[str]
+    directories: set[str]
+    recursive_directories: set[str]
+    rendered: dict[str, str]
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.files = set()
+        self.directories = set()
+        self.recursive_directories = set()
+        self.rendered = {}
+
+    @abstractmethod
+    def render(self) -> dict[str, str]:
+        """
+        入力を読み直し、出力するすべてのファイル名と内容を返す
+        """
+
+    def watched_directories(self) -> set[str]:
+        directories = {os.path.dirname(file) for file in self.files}
+        directories |= self.directories
+        for root in self.recursive_directories:
+            directories.add(root)
+            directories.update(
+                dirpath for dirpath, _, _ in os.walk(root) if dirpath != root
+            )
+        return directories
+
+    def is_affected(self, changed_paths: set[str]) -> bool:
+        for path in changed_paths:
+            if path in self.files or path in self.directories:
+                return True
+            if any(
+                path == root or path.startswith(root + os.sep)
+                for root in self.recursive_directories
+            ) and (is_schema_file(Path(path)) or os.path.isdir(path)):
+                return True
+        return False
+
+
+class ModelWatchJob(WatchJob):
+    """
+    CodeGeneratorの入力(openapiファイル・$ref先・include_models_dir)を監視するジョブ
+
+    notes:
+        * モデルクラスごとのフィンガープリント(CodeGenerator.model_fingerprintsを参照)と
+        出力を保持し、フィンガープリントが変わったクラスだけをレンダリングする
+        * 変更のたびに$refの統合とdatamodel-code-generatorの実行は仕様全体に対して
+        やり直すため、1回の再生成にかかる時間は仕様の大きさに比例する
+        (レンダリング・書き出しだけが変更されたクラスに限られる)
+        * engineはCodeGeneratorに渡す。engine="inprocess"でも、datamodel-codegenが
+        未importのままメインスレッド以外から再生成する場合は"subprocess"で実行する
+    """
+
+    openapi_file_path: str
+    parameters: list[str]
+    include_models_dir: str | None
+    engine: Engine
+    _models: dict[str, tuple[str, str, str]]
+
+    def __init__(
+        self,
+        openapi_file_path: str,
+        output_dir: str,
+        parameters: list[str],
+        include_models_dir: str | None = None,
+        engine: Engine = ENGINE_INPROCESS,
+    ):
+        super().__init__(output_dir)
+        self.openapi_file_path = openapi_file_path
+        self.parameters = parameters
+        self.include_models_dir = include_models_dir
+        self.engine = engine
+        self.files = {os.path.abspath(openapi_file_path)}
+        if include_models_dir:
+            self.recursive_directories = {os.path.abspath(include_models_dir)}
+        # クラス名 → (フィンガープリント, ファイル名, 内容)
+        self._models = {}
+
+    def render(self) -> dict[str, str]:
+        from .code_generator import CodeGenerator
+
+        generator = CodeGenerator(
+            openapi_file_path=self.openapi_file_path,
+            output_dir=self.output_dir,
+            parameters=self.parameters,
+            include_models_dir=self.include_models_dir,
+            engine=self.engine,
+        )
+        self.files = set(generator.input_files)
+
+        fingerprints = generator.model_fingerprints()
+        changed = [
+            name
+            for name, fingerprint in fingerprints.items()
+            if name not in self._models or self._models[name][0] != fingerprint
+        ]
+        rendered = generator.render_models(changed, self.output_dir)
+        models = {
+            name: (fingerprints[name], file_name, rendered[file_name])
+            for name in changed
+            if (file_name := generator.model_file_name(name)) in rendered
+        }
+        # 削除されたクラスは保持しない
+        self._models = {
+            name: models.get(name) or self._models[name] for name in fingerprints
+        }
+        return {file_name: content for _, file_name, content in self._models.values()}
+
+
+class EntityWatchJob(WatchJob):
+    """
+    EntityGeneratorの入力(SQLファイル、またはSQLファイルのディレクトリ)を監視するジョブ
+
+    notes:
+        * EntityGenerator(incremental=True)を保持し、変更されたSQLファイルだけをパースし、
+        コンテキストが変わったEntityファイルだけをレンダリングする
+    """
+
+    file_path: str
+    db_type: str
+    _generator: EntityGenerator | None
+
+    def __init__(self, file_path: str, output_dir: str, db_type: str):
+        super().__init__(output_dir)
+        self.file_path = file_path
+        self.db_type = db_type
+        self._generator = None
+        if os.path.isdir(file_path):
+            self.recursive_directories = {os.path.abspath(file_path)}
+        else:
+            self.files = {os.path.abspath(file_path)}
+
+    def is_affected(self, changed_paths: set[str]) -> bool:
+        for path in changed_paths:
+            if path in self.files:
+                return True
+            if any(
+                path == root or path.startswith(root + os.sep)
+                for root in self.recursive_directories
+            ) and (path.endswith(SQL_FILE_SUFFIX) or os.path.isdir(path)):
+                return True
+        return False
+
+    def render(self) -> dict[str, str]:
+        from .entity_generator import EntityGenerator
+
+        if self._generator is None:
+            self._generator = EntityGenerator(
+                file_path=self.file_path,
+                output_dir=self.output_dir,
+                db_type=self.db_type,
+                incremental=True,
+            )
+        else:
+            self._generator.reload()
+        return self._generator.render()
+
+
+class WatchResult:
+    job: WatchJob
+    written: list[str]
+    elapsed: float
+    error: Exception | None
+    removed: list[str]
+
+    def __init__(
+        self,
+        job: WatchJob,
+        written: list[str],
+        elapsed: float,
+        error: Exception | None = None,
+        removed: list[str] | None = None,
+    ):
+        self.job = job
+        self.written = written
+        self.elapsed = elapsed
+        self.error = error
+        self.removed = removed or []
+
+    def __repr__(self) -> str:
+        return f"WatchResult(output_dir={self.job.output_dir}, written={self.written}, removed={self.removed}, elapsed={self.elapsed:.3f}, error={self.error!r})"
+
+
+class GenerationWatcher:
+    """
+    入力ファイルを監視し、変更があったジョブだけを再生成する常駐プロセス
+
+    notes:
+        * パース済みのスキーマはloaderのキャッシュに、前回の出力は各ジョブに保持し、
+        内容が変わった出力ファイルだけを書き出す
+        * delete_stale=Trueの場合は、削除されたテーブル・クラスの出力ファイルを削除する
+        (OutputSinkを参照)
+        * 変更は debounce 秒間イベントが途切れるまでまとめてから再生成する
+    """
+
+    jobs: list[WatchJob]
+    debounce: float
+    delete_stale: bool
+    _file_watcher: FileWatcher
+
+    def __init__(
+        self,
+        jobs: list[WatchJob],
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        use_polling: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        delete_stale: bool = False,
+    ):
+        self.jobs = jobs
+        self.debounce = debounce
+        self.delete_stale = delete_stale
+        self._file_watcher = create_file_watcher(use_polling, poll_interval)
+
+    def generate_all(self) -> list[WatchResult]:
+        """
+        すべてのジョブを生成し、監視対象のディレクトリを更新する
+        """
+        results = [self._regenerate(job) for job in self.jobs]
+        self._update_directories()
+        return results
+
+    def poll(self, timeout: float) -> list[WatchResult]:
+        """
+        変更を待ち、影響を受けるジョブを再生成する。timeout秒以内に変更がなければ空のリストを返す
+        """
+        changed = self._file_watcher.read(timeout)
+        if not changed:
+            return []
+
+        # 連続した保存をまとめる
+        while more := self._file_watcher.read(self.debounce):
+            changed |= more
+
+        results = [
+            self._regenerate(job) for job in self.jobs if job.is_affected(changed)
+        ]
+        if results:
+            self._update_directories()
+        return results
+
+    def run(
+        self,
+        stop_event: threading.Event | None = None,
+        on_change: Callable[[WatchResult], None] | None = None,
+    ) -> None:
+        """
+        stop_eventがセットされるまで監視を続ける
+        """
+        for result in self.generate_all():
+            if on_change:
+                on_change(result)
+
+        try:
+            while not (stop_event and stop_event.is_set()):
+                for result in self.poll(timeout=0.5):
+                    if on_change:
+                        on_change(result)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._file_watcher.close()
+
+    def _update_directories(self) -> None:
+        directories: set[str] = set()
+        for job in self.jobs:
+            directories |= job.watched_directories()
+        self._file_watcher.set_directories(
+            {directory for directory in directories if os.path.isdir(directory)}
+        )
+
+    def _regenerate(self, job: WatchJob) -> WatchResult:
+        started = time.perf_counter()
+        try:
+            rendered = job.render()
+        except Exception as e:
+            # 編集途中の不正な入力で監視を止めないよう、前回の出力を維持する
+            return WatchResult(job, [], time.perf_counter() - started, e)
+
+        changed = {
+            file_name: content
+            for file_name, content in rendered.items()
+            if job.rendered.get(file_name) != content
+        }
+        with OutputSink(job.output_dir, self.delete_stale) as sink:
+            sink.write_all(changed)
+            # 前回と同じ内容のファイルは読み直さず、マニフェストにだけ残す
+            sink.keep(rendered.keys() - changed.keys())
+            report = sink.commit()
+        job.rendered = rendered
+        return WatchResult(
+            job, report.written, time.perf_counter() - started, removed=report.removed
+        )
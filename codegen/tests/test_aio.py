@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.aio import run_cancellable
+
+
+class TestRunCancellable:
+    def test_returns_result(self):
+        # Act
+        result = asyncio.run(run_cancellable(lambda cancelled: 42))
+
+        # Assert
+        assert result == 42
+
+    def test_cancel_waits_for_func(self):
+        # Arrange
+        started = threading.Event()
+        finished = []
+
+        def func(cancelled):
+            started.set()
+            cancelled.wait(5)
+            time.sleep(0.05)
+            finished.append(cancelled.is_set())
+
+        async def cancel():
+            task = asyncio.create_task(run_cancellable(func))
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            await task
+
+        # Act
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(cancel())
+
+        # Assert
+        assert finished == [True]
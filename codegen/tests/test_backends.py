@@ -0,0 +1,58 @@
+import pytest
+
+from src.backends import DataclassBackend, ModelBackend, MsgspecBackend, get_backend
+
+
+class TestModelBackend:
+    def test_parameters(self):
+        # Act
+        pydantic_parameters = get_backend("pydantic").parameters(
+            ["--use-union-operator"]
+        )
+        msgspec_parameters = get_backend("msgspec").parameters(["--use-union-operator"])
+
+        # Assert
+        assert pydantic_parameters == ["--use-union-operator"]
+        assert msgspec_parameters == [
+            "--use-union-operator",
+            "--output-model-type",
+            "msgspec.Struct",
+        ]
+        assert MsgspecBackend().parameters(["--output-model-type=msgspec.Struct"]) == [
+            "--output-model-type=msgspec.Struct"
+        ]
+
+    def test_parameters_conflict(self):
+        # Act / Assert
+        with pytest.raises(ValueError):
+            DataclassBackend().parameters(["--output-model-type", "msgspec.Struct"])
+        with pytest.raises(ValueError):
+            get_backend("attrs")
+
+    def test_rebuild_statement(self):
+        # Assert
+        assert ModelBackend().rebuild_statement("User") == "User.model_rebuild()"
+        assert DataclassBackend().rebuild_statement("User") is None
+        assert MsgspecBackend().rebuild_statement("User") is None
+
+
+class TestDataclassBackend:
+    def test_render_class(self):
+        # Arrange
+        backend = DataclassBackend()
+
+        # Act
+        plain = backend.render_class("@dataclass\nclass User:\n    id: int\n")
+        frozen = backend.render_class(
+            "@dataclass(frozen=True)\nclass User:\n    id: int\n"
+        )
+        slotted = backend.render_class(
+            "@dataclass(slots=True)\nclass User:\n    id: int\n"
+        )
+
+        # Assert
+        assert plain == "@dataclass(slots=True)\nclass User:\n    id: int\n"
+        assert (
+            frozen == "@dataclass(frozen=True, slots=True)\nclass User:\n    id: int\n"
+        )
+        assert slotted == "@dataclass(slots=True)\nclass User:\n    id: int\n"
@@ -0,0 +1,251 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.batch import (
+    SHARED_RESULT_NAME,
+    BatchJob,
+    SharedModel,
+    load_manifest,
+    main,
+    run_batch,
+    select_shared_models,
+)
+from src.loader import clear_document_cache, export_documents
+from src.ref_resolver import scan_ref_files
+
+PARAMETERS = ["--use-union-operator", "--use-double-quotes"]
+
+
+class TestLoadManifest:
+    def test_applies_defaults_and_resolves_paths(self, tmp_path):
+        # Arrange
+        manifest = tmp_path / "batch.json"
+        manifest.write_text(
+            json.dumps(
+                {
+                    "defaults": {"parameters": PARAMETERS},
+                    "jobs": [
+                        {"input": "a.yaml", "output": "out/a"},
+                        {
+                            "name": "b",
+                            "input": "b.yaml",
+                            "output": "out/b",
+                            "parameters": [],
+                            "include_models_dir": "schemas",
+                            "backend": "msgspec",
+                        },
+                    ],
+                }
+            )
+        )
+
+        # Act
+        jobs = load_manifest(str(manifest))
+
+        # Assert
+        assert [job.name for job in jobs] == ["a.yaml", "b"]
+        assert jobs[0].openapi_file_path == str(tmp_path / "a.yaml")
+        assert jobs[0].parameters == PARAMETERS
+        assert jobs[0].include_models_dir is None
+        assert jobs[1].parameters == []
+        assert jobs[1].include_models_dir == str(tmp_path / "schemas")
+        assert [job.backend for job in jobs] == ["pydantic", "msgspec"]
+
+
+class TestRunBatch:
+    def test_failure_does_not_abort_batch(self, tmp_path):
+        # Arrange
+        jobs = [
+            BatchJob(
+                "tests/data/sample.yaml",
+                str(tmp_path / "first"),
+                PARAMETERS,
+                "tests/data/schemas/",
+            ),
+            BatchJob("tests/data/missing.yaml", str(tmp_path / "missing"), PARAMETERS),
+            BatchJob(
+                "tests/data/sample.yaml",
+                str(tmp_path / "second"),
+                PARAMETERS,
+                "tests/data/schemas/",
+            ),
+        ]
+
+        # Act
+        results = run_batch(jobs, max_workers=2)
+
+        # Assert
+        assert [result.ok for result in results] == [True, False, True]
+        assert "missing.yaml" in (results[1].error or "")
+        assert results[0].report == results[2].report
+        assert sorted(os.listdir(tmp_path / "first")) == sorted(
+            os.listdir(tmp_path / "second")
+        )
+        assert len(results[0].report["added"]) == 5
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_invalid_parameter_does_not_abort_batch(self, tmp_path, max_workers):
+        # Arrange
+        jobs = [
+            BatchJob(
+                "tests/data/sample.yaml",
+                str(tmp_path / "invalid"),
+                ["--no-such-option"],
+                "tests/data/schemas/",
+            ),
+            BatchJob(
+                "tests/data/sample.yaml",
+                str(tmp_path / "valid"),
+                PARAMETERS,
+                "tests/data/schemas/",
+            ),
+        ]
+
+        # Act
+        results = run_batch(jobs, max_workers=max_workers)
+
+        # Assert
+        assert [result.ok for result in results] == [False, True]
+        assert "exited with status 2" in (results[0].error or "")
+
+    def test_main_returns_nonzero_on_failure(self, tmp_path, capsys):
+        # Arrange
+        manifest = tmp_path / "batch.yaml"
+        manifest.write_text(
+            "jobs:\n"
+            f"  - input: {os.path.abspath('tests/data/missing.yaml')}\n"
+            "    output: out\n"
+        )
+
+        # Act
+        exit_code = main([str(manifest), "--json"])
+
+        # Assert
+        output = json.loads(capsys.readouterr().out)
+        assert exit_code == 1
+        assert output[0]["ok"] is False
+
+
+SHARED_SPEC = """\
+openapi: 3.0.0
+info: {{title: {title}, version: "1"}}
+paths: {{}}
+components:
+  schemas:
+    Error:
+      type: object
+      properties:
+        message: {{type: string}}
+    Address:
+      type: object
+      properties:
+        city: {{type: string}}
+    User:
+      type: object
+      properties:
+        address: {{$ref: "#/components/schemas/Address"}}
+        {user_field}: {{type: string}}
+"""
+
+
+class TestSharedDocuments:
+    def test_parent_parses_only_files_shared_by_jobs(self, tmp_path):
+        # Arrange
+        unique = tmp_path / "unique.yaml"
+        unique.write_text(
+            "openapi: 3.0.0\ninfo: {title: unique, version: '1'}\npaths: {}\n"
+            "components: {schemas: {Unique: {type: object}}}\n"
+        )
+        broken = tmp_path / "broken.yaml"
+        broken.write_text("openapi: [\n")
+        jobs = [
+            BatchJob(
+                "tests/data/sample.yaml",
+                str(tmp_path / name),
+                PARAMETERS,
+                "tests/data/schemas/",
+            )
+            for name in ["first", "second"]
+        ]
+        jobs.append(BatchJob(str(unique), str(tmp_path / "unique"), PARAMETERS))
+        jobs.append(BatchJob(str(broken), str(tmp_path / "broken"), PARAMETERS))
+        clear_document_cache()
+
+        # Act
+        results = run_batch(jobs, max_workers=2)
+
+        # Assert
+        parsed = export_documents(
+            [*scan_ref_files("tests/data/sample.yaml", "tests/data/schemas/"), unique]
+        )
+        assert [result.ok for result in results] == [True, True, True, False]
+        assert os.path.abspath("tests/data/sample.yaml") in parsed
+        assert str(unique) not in parsed
+        assert "ParserError" in (results[3].error or "")
+
+
+class TestSharedModels:
+    def test_identical_models_are_written_once(self, tmp_path, monkeypatch):
+        # Arrange
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.yaml").write_text(
+            SHARED_SPEC.format(title="a", user_field="name")
+        )
+        (tmp_path / "b.yaml").write_text(
+            SHARED_SPEC.format(title="b", user_field="email")
+        )
+        jobs = [
+            BatchJob("a.yaml", "services/a", PARAMETERS),
+            BatchJob("b.yaml", "services/b", PARAMETERS),
+        ]
+
+        # Act
+        results = run_batch(jobs, max_workers=1, shared_dir="services/shared")
+
+        # Assert
+        assert [result.ok for result in results] == [True, True, True]
+        assert results[-1].name == SHARED_RESULT_NAME
+        assert sorted(results[-1].report["added"]) == ["address.py", "error.py"]
+        assert (tmp_path / "services/a/error.py").read_text() == (
+            'from services.shared.error import Error\n\n__all__ = ["Error"]\n'
+        )
+        assert "class User" in (tmp_path / "services/b/user.py").read_text()
+        check = (
+            "import services.a.user, services.b.user, services.a.error, "
+            "services.b.error\n"
+            "assert services.a.error.Error is services.b.error.Error\n"
+            "print(services.a.user.User(address={'city': 'x'}).address.city)"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", check],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert completed.stdout == "x\n"
+
+    def test_name_conflicts_and_unshared_dependencies_are_not_shared(self):
+        # Arrange
+        def model(name, fingerprint, dependencies=()):
+            file_name = f"{name.lower()}.py"
+            return SharedModel(
+                name, fingerprint, list(dependencies), file_name, "", (file_name, "")
+            )
+
+        # a1とa2は同じファイル名のため先のa1だけを共有し、a2に依存するu2も共有しない
+        job_models = [
+            [model("Address", "a1"), model("Error", "e")],
+            [model("Address", "a2"), model("User", "u2", ["a2"]), model("Error", "e")],
+            [model("Address", "a1")],
+            [model("Address", "a2"), model("User", "u2", ["a2"])],
+        ]
+
+        # Act
+        shared = select_shared_models(job_models)
+
+        # Assert
+        assert shared == {"a1", "e"}
@@ -0,0 +1,72 @@
+from benchmarks.run import find_regressions
+from benchmarks.synthetic import generate_ddl, generate_openapi_fixture
+from src.entity_generator import EntityGenerator
+from src.ref_resolver import RefResolver
+
+
+class TestSynthetic:
+    def test_openapi_fixture_shape(self, tmp_path):
+        # Act
+        spec, include_dir = generate_openapi_fixture(
+            tmp_path, schemas=5, ref_depth=3, fan_out=2, include_models=4
+        )
+        resolver = RefResolver(spec, include_dir)
+
+        # Assert
+        # 参照先: 2 + 4 + 8 ファイル、include_models_dir: 4 ファイル
+        assert len(resolver.files()) == 1 + 2 + 4 + 8 + 4
+        assert len(resolver.merge()["components"]["schemas"]) == 5 + 14 + 4
+
+    def test_ddl_parses_for_each_dialect(self, tmp_path):
+        for dialect in ("sqlite", "mysql", "postgres"):
+            # Arrange
+            sql_file = tmp_path / f"{dialect}.sql"
+            sql_file.write_text(generate_ddl(tables=3, columns=8, dialect=dialect))
+
+            # Act
+            tables = EntityGenerator(
+                str(sql_file), str(tmp_path / dialect), dialect
+            )._get_tables()
+
+            # Assert
+            assert [len(table.columns) for table in tables] == [9, 9, 9]
+
+    def test_ddl_with_rows(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "dump.sql"
+        sql_file.write_text(
+            generate_ddl(tables=2, columns=3, dialect="mysql", rows=1500)
+        )
+
+        # Act
+        tables = EntityGenerator(
+            str(sql_file), str(tmp_path / "out"), "mysql"
+        )._get_tables()
+
+        # Assert
+        assert "INSERT INTO table_1" in sql_file.read_text()
+        assert [table.name for table in tables] == ["table_0", "table_1"]
+
+
+class TestFindRegressions:
+    def test_reports_metrics_over_threshold(self):
+        # Arrange
+        baseline = {
+            "scenarios": {
+                "a": {"metrics": {"time.total": 1.0, "peak_memory_mb": 10.0}},
+                "b": {"metrics": {"time.total": 0.01, "peak_memory_mb": 10.0}},
+            }
+        }
+        results = {
+            "scenarios": {
+                "a": {"metrics": {"time.total": 1.5, "peak_memory_mb": 10.5}},
+                "b": {"metrics": {"time.total": 0.03, "peak_memory_mb": 10.0}},
+                "new": {"metrics": {"time.total": 9.0, "peak_memory_mb": 99.0}},
+            }
+        }
+
+        # Act
+        regressions = find_regressions(results, baseline, threshold=0.25)
+
+        # Assert
+        assert regressions == ["a time.total: 1.000 -> 1.500 (+50%)"]
@@ -0,0 +1,121 @@
+import os
+
+from src.cache import (
+    PARSE_CACHE_ENTRY_SUFFIX,
+    GenerationCache,
+    ParseCache,
+    SchemaCache,
+    compute_cache_key,
+)
+from src.schema_ir import SchemaIR, TableIR
+
+
+class TestGenerationCache:
+    def test_put_and_get(self, tmp_path):
+        # Arrange
+        cache = GenerationCache(str(tmp_path))
+        key = compute_cache_key(["spec", b"content"])
+
+        # Act
+        cache.put(key, {"user.py": "class User: ...\n"})
+
+        # Assert
+        assert cache.get(key) == {"user.py": "class User: ...\n"}
+        assert cache.get(compute_cache_key(["spec", b"changed"])) is None
+
+    def test_compute_cache_key_is_boundary_sensitive(self):
+        # Act
+        key1 = compute_cache_key(["ab", "c"])
+        key2 = compute_cache_key(["a", "bc"])
+
+        # Assert
+        assert key1 != key2
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        # Arrange
+        content = "x" * 1000
+        cache = GenerationCache(str(tmp_path), max_bytes=2500)
+        cache.put("old", {"a.py": content})
+        cache.put("used", {"b.py": content})
+        os.utime(tmp_path / "old.json", (1, 1))
+        os.utime(tmp_path / "used.json", (2, 2))
+        cache.get("used")
+
+        # Act
+        cache.put("new", {"c.py": content})
+
+        # Assert
+        assert cache.get("old") is None
+        assert cache.get("used") == {"b.py": content}
+        assert cache.get("new") == {"c.py": content}
+
+    def test_put_does_not_walk_cache_dir(self, tmp_path, monkeypatch):
+        # Arrange
+        content = "x" * 1000
+        cache = GenerationCache(str(tmp_path), max_bytes=2500)
+        cache.put("old", {"a.py": content})
+
+        def walk(*args, **kwargs):
+            raise AssertionError("cache root was walked on put")
+
+        monkeypatch.setattr(os, "walk", walk)
+
+        # Act
+        for key in ("first", "second", "third"):
+            cache.put(key, {"b.py": content})
+
+        # Assert
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "second.json",
+            "third.json",
+        ]
+
+    def test_subdirectories_share_max_bytes(self, tmp_path):
+        # Arrange
+        content = "x" * 1000
+        cache = GenerationCache(str(tmp_path), max_bytes=2500)
+        parse_cache = ParseCache(
+            str(tmp_path / "migrations"), max_bytes=2500, root_dir=str(tmp_path)
+        )
+        schema_cache = SchemaCache(
+            str(tmp_path / "schema"), max_bytes=2500, root_dir=str(tmp_path)
+        )
+        (tmp_path / "notes.txt").write_text(content * 3)
+        cache.put("old", {"a.py": content})
+        parse_cache.put("parsed", [content])
+        os.utime(tmp_path / "old.json", (1, 1))
+
+        # Act
+        schema_cache.put("new", SchemaIR(tables=(TableIR("t" * 1000),)))
+
+        # Assert
+        assert cache.get("old") is None
+        assert parse_cache.get("parsed") == [content]
+        assert schema_cache.get("new") == SchemaIR(tables=(TableIR("t" * 1000),))
+        assert (tmp_path / "notes.txt").exists()
+
+
+class TestParseCache:
+    def test_put_many_and_get(self, tmp_path):
+        # Arrange
+        cache = ParseCache(str(tmp_path))
+
+        # Act
+        cache.put_many([("a", [1, "x"]), ("b", {"y": None})])
+
+        # Assert
+        assert cache.get("a") == [1, "x"]
+        assert cache.get("b") == {"y": None}
+        assert cache.get("c") is None
+
+    def test_corrupt_entry_is_miss(self, tmp_path):
+        # Arrange
+        cache = ParseCache(str(tmp_path))
+        cache.put("a", [1])
+        (tmp_path / f"a{PARSE_CACHE_ENTRY_SUFFIX}").write_bytes(b"broken")
+
+        # Act
+        value = cache.get("a")
+
+        # Assert
+        assert value is None
@@ -0,0 +1,201 @@
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+
+import pytest
+
+from src.cli import main
+from src.schema_ir import load_schema
+
+PARAMETERS = ["--use-union-operator", "--use-double-quotes"]
+# modelgen --helpでimportしてはいけない重いモジュール
+HEAVY_MODULES = {
+    "sqlalchemy",
+    "sqlglot",
+    "jinja2",
+    "yaml",
+    "datamodel_code_generator",
+    "pydantic",
+}
+# src・src.cliのimportにかかる時間の上限(マイクロ秒)
+IMPORT_TIME_BUDGET_US = 50_000
+
+
+def _import_times(*arguments: str) -> dict[str, int]:
+    """
+    -X importtimeで実行し、トップレベルのモジュールごとの累積import時間を返す
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.cli", *arguments],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    assert result.returncode == 0, result.stderr
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        module = name.strip()
+        times[module] = max(times.get(module, 0), int(cumulative))
+    return times
+
+
+class TestHelp:
+    def test_help_does_not_import_heavy_modules(self):
+        # Act
+        times = _import_times("--help")
+
+        # Assert
+        imported = {module.split(".")[0] for module in times}
+        assert imported & HEAVY_MODULES == set()
+        assert times.get("src", 0) + times.get("src.cli", 0) < IMPORT_TIME_BUDGET_US
+
+    def test_command_help_exits(self, capsys):
+        # Act
+        with pytest.raises(SystemExit) as e:
+            main(["entities", "--help"])
+
+        # Assert
+        assert e.value.code == 0
+        assert "--db-type" in capsys.readouterr().out
+
+
+class TestInstall:
+    @pytest.mark.slow
+    def test_installed_entry_point(self, tmp_path):
+        # Arrange
+        pytest.importorskip("setuptools")
+        # 作業ツリーにbuild/・egg-infoを作らないよう、コピーからインストールする
+        project_dir = tmp_path / "project"
+        project_dir.mkdir()
+        root_dir = Path(__file__).parent.parent
+        for file_name in ("pyproject.toml", "README.md"):
+            shutil.copy(root_dir / file_name, project_dir)
+        shutil.copytree(
+            root_dir / "src",
+            project_dir / "src",
+            ignore=shutil.ignore_patterns("__pycache__", "*.egg-info"),
+        )
+        venv_dir = str(tmp_path / "venv")
+        # ビルドに使うsetuptoolsは実行中の環境のものを使い、ネットワークに接続しない
+        subprocess.run(
+            [sys.executable, "-m", "venv", "--system-site-packages", venv_dir],
+            check=True,
+        )
+        scripts_dir = sysconfig.get_path(
+            "scripts", "venv", vars={"base": venv_dir, "platbase": venv_dir}
+        )
+        python = shutil.which("python", path=scripts_dir)
+        assert python is not None
+        subprocess.run(
+            [
+                python,
+                "-m",
+                "pip",
+                "install",
+                "-q",
+                "--no-index",
+                "--no-build-isolation",
+                "--no-deps",
+                str(project_dir),
+            ],
+            check=True,
+        )
+        modelgen = shutil.which("modelgen", path=scripts_dir)
+        assert modelgen is not None
+
+        # Act
+        result = subprocess.run(
+            [modelgen, "--help"],
+            capture_output=True,
+            text=True,
+            cwd=tmp_path,
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert "usage: modelgen" in result.stdout
+
+
+class TestMain:
+    def test_models(self, tmp_path, capsys):
+        # Arrange
+        output_dir = tmp_path / "models"
+
+        # Act
+        code = main(
+            [
+                "models",
+                "tests/data/sample.yaml",
+                str(output_dir),
+                "--engine",
+                "inprocess",
+                "--include-models-dir",
+                "tests/data/schemas",
+                "--schema-ir",
+                str(tmp_path / "schema.ir"),
+                "--",
+                *PARAMETERS,
+            ]
+        )
+
+        # Assert
+        assert code == 0
+        assert "0 removed" in capsys.readouterr().out
+        assert (output_dir / "user.py").exists()
+        assert "User" in {
+            model.name for model in load_schema(str(tmp_path / "schema.ir")).models
+        }
+
+    def test_entities(self, tmp_path, capsys):
+        # Act
+        code = main(
+            [
+                "entities",
+                "tests/data/sample.sql",
+                str(tmp_path / "entities"),
+                "--db-type",
+                "postgres",
+                "--relationship-loading",
+                "none",
+            ]
+        )
+
+        # Assert
+        assert code == 0
+        assert "0 unchanged" in capsys.readouterr().out
+        assert list((tmp_path / "entities").glob("*.py"))
+
+    def test_parameters_only_for_models(self, tmp_path):
+        # Act
+        with pytest.raises(SystemExit) as e:
+            main(
+                [
+                    "entities",
+                    "tests/data/sample.sql",
+                    str(tmp_path),
+                    "--db-type",
+                    "postgres",
+                    "--",
+                    "--unknown",
+                ]
+            )
+
+        # Assert
+        assert e.value.code == 2
+
+    def test_missing_input_is_usage_error(self, tmp_path, capsys):
+        # Act
+        with pytest.raises(SystemExit) as e:
+            main(["entities", "missing.sql", str(tmp_path), "--db-type", "postgres"])
+
+        # Assert
+        assert e.value.code == 2
+        assert "modelgen entities: error:" in capsys.readouterr().err
@@ -1,6 +1,36 @@
+import ast
+import asyncio
 import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
 
 from src.code_generator import CodeGenerator
+from src.profiling import Profiler
+
+CYCLIC_SPEC = """\
+openapi: 3.0.0
+info: {title: cyclic, version: "1"}
+paths: {}
+components:
+  schemas:
+    UserGroup:
+      type: object
+      properties:
+        members: {type: array, items: {$ref: "#/components/schemas/UserAccount"}}
+    UserAccount:
+      type: object
+      properties:
+        group: {$ref: "#/components/schemas/UserGroup"}
+        address: {$ref: "#/components/schemas/Address"}
+    Address:
+      type: object
+      properties:
+        city: {type: string}
+"""
 
 
 class TestCodeGenerator:
@@ -99,3 +129,483 @@ class TestCodeGenerator:
         assert "other2.py" in files
         assert not os.path.exists("tests/data/sample_dir/temporary_model.py")
         assert not os.path.exists("tests/data/sample_dir/temporary_api.yaml")
+
+    def test_init_inprocess(self):
+        # Arrange
+        openapi_file_path = "tests/data/sample.yaml"
+        output_dir = "tests/data/sample_dir/"
+        include_models_dir = "tests/data/schemas/"
+
+        # Act
+        code_generator = CodeGenerator(
+            openapi_file_path=openapi_file_path,
+            output_dir=output_dir,
+            parameters=[
+                "--use-union-operator",
+                "--use-default-kwarg",
+                "--use-double-quotes",
+            ],
+            include_models_dir=include_models_dir,
+            engine="inprocess",
+        )
+
+        # Assert
+        assert len(code_generator._imports) == 3
+        assert len(code_generator._classes) == 5
+        assert not os.path.exists("tests/data/sample_dir/temporary_model.py")
+        assert not os.path.exists("tests/data/sample_dir/temporary_api.yaml")
+
+    def test_init_inprocess_matches_subprocess(self):
+        # Arrange
+        openapi_file_path = "tests/data/sample.yaml"
+        output_dir = "tests/data/sample_dir/"
+        include_models_dir = "tests/data/schemas/"
+        parameters = [
+            "--use-union-operator",
+            "--use-default-kwarg",
+            "--use-double-quotes",
+        ]
+
+        # Act
+        subprocess_generator = CodeGenerator(
+            openapi_file_path=openapi_file_path,
+            output_dir=output_dir,
+            parameters=parameters,
+            include_models_dir=include_models_dir,
+        )
+        inprocess_generator = CodeGenerator(
+            openapi_file_path=openapi_file_path,
+            output_dir=output_dir,
+            parameters=parameters,
+            include_models_dir=include_models_dir,
+            engine="inprocess",
+        )
+
+        # Assert
+        assert [ast.unparse(node) for node in inprocess_generator._imports] == [
+            ast.unparse(node) for node in subprocess_generator._imports
+        ]
+        assert [ast.unparse(node) for node in inprocess_generator._classes] == [
+            ast.unparse(node) for node in subprocess_generator._classes
+        ]
+
+    def test_execute_with_cache(self, tmp_path, monkeypatch):
+        # Arrange
+        openapi_file_path = "tests/data/sample.yaml"
+        output_dir = "tests/data/sample_dir/"
+        include_models_dir = "tests/data/schemas/"
+        parameters = [
+            "--use-union-operator",
+            "--use-default-kwarg",
+            "--use-double-quotes",
+        ]
+        cache_dir = str(tmp_path / "cache")
+        CodeGenerator(
+            openapi_file_path=openapi_file_path,
+            output_dir=output_dir,
+            parameters=parameters,
+            include_models_dir=include_models_dir,
+            cache_dir=cache_dir,
+        ).execute()
+        os.remove("tests/data/sample_dir/other2.py")
+        # ヒットした場合は$refの読み込み・書き換えを行わない
+        with monkeypatch.context() as patch:
+            patch.setattr("src.code_generator.RefResolver", None)
+
+            # Act
+            code_generator = CodeGenerator(
+                openapi_file_path=openapi_file_path,
+                output_dir=output_dir,
+                parameters=parameters,
+                include_models_dir=include_models_dir,
+                cache_dir=cache_dir,
+            )
+            code_generator.execute()
+
+        # Assert
+        assert code_generator.cache_hit
+        assert os.path.exists("tests/data/sample_dir/other2.py")
+        assert not CodeGenerator(
+            openapi_file_path=openapi_file_path,
+            output_dir=output_dir,
+            parameters=[*parameters, "--strict-nullable"],
+            include_models_dir=include_models_dir,
+            cache_dir=cache_dir,
+        ).cache_hit
+
+    def test_execute_with_profiler(self, tmp_path):
+        # Arrange
+        profiler = Profiler()
+        code_generator = CodeGenerator(
+            openapi_file_path="tests/data/sample.yaml",
+            output_dir=str(tmp_path),
+            parameters=["--use-union-operator", "--use-double-quotes"],
+            include_models_dir="tests/data/schemas/",
+            engine="inprocess",
+            profiler=profiler,
+        )
+
+        # Act
+        code_generator.execute()
+        report = profiler.report()
+
+        # Assert
+        assert list(report["phases"]) == [
+            "load_refs",
+            "merge",
+            "codegen",
+            "split",
+            "emit",
+        ]
+        assert report["counters"]["files_loaded"] == 6
+        assert report["counters"]["classes_emitted"] == 5
+        assert report["counters"]["files_written"] == 5
+        assert report["timers"]["render"]["count"] == 5
+
+    def test_execute_with_cyclic_references(self, tmp_path, monkeypatch):
+        # Arrange
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(CYCLIC_SPEC, encoding="utf-8")
+        monkeypatch.chdir(tmp_path)
+
+        # Act
+        CodeGenerator(
+            openapi_file_path=str(spec),
+            output_dir="models",
+            parameters=["--use-union-operator", "--use-double-quotes"],
+            engine="inprocess",
+        ).execute()
+
+        # Assert
+        user_account = (tmp_path / "models" / "user_account.py").read_text()
+        assert "from models.address import Address\n" in user_account
+        assert "if TYPE_CHECKING:\n    from models.user_group import UserGroup" in (
+            user_account
+        )
+        assert user_account.endswith("UserAccount.model_rebuild()\n")
+        # どちらのモジュールから読み込んでも循環importにならず、実行時に必要なものだけを読み込む
+        script = """
+import importlib, sys
+module = importlib.import_module(sys.argv[1])
+print(sorted(name for name in sys.modules if name.startswith("models.")))
+from models.user_group import UserGroup
+UserGroup.model_validate({"members": [{"group": {}, "address": {"city": "x"}}]})
+"""
+        loaded = {}
+        for module in ("models.user_group", "models.user_account", "models.address"):
+            result = subprocess.run(
+                [sys.executable, "-c", script, module],
+                cwd=tmp_path,
+                capture_output=True,
+                text=True,
+            )
+            assert result.returncode == 0, result.stderr
+            loaded[module] = result.stdout.strip()
+        assert loaded["models.address"] == "['models.address']"
+
+    def test_execute_with_package_init(self, tmp_path):
+        # Arrange
+        code_generator = CodeGenerator(
+            openapi_file_path="tests/data/sample.yaml",
+            output_dir=str(tmp_path),
+            parameters=["--use-union-operator", "--use-double-quotes"],
+            include_models_dir="tests/data/schemas/",
+            engine="inprocess",
+            package_init=True,
+        )
+
+        # Act
+        code_generator.execute()
+        files = code_generator.render()
+
+        # Assert
+        assert '"UserUpdate": "user_update",' in files["__init__.py"]
+        assert "from .user import User as User\n" in files["__init__.pyi"]
+        assert (tmp_path / "__init__.py").read_text() == files["__init__.py"]
+        assert (tmp_path / "__init__.pyi").read_text() == files["__init__.pyi"]
+
+    def test_execute_with_dataclass_backend(self, tmp_path, monkeypatch):
+        # Arrange
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(CYCLIC_SPEC, encoding="utf-8")
+        monkeypatch.chdir(tmp_path)
+
+        # Act
+        CodeGenerator(
+            openapi_file_path=str(spec),
+            output_dir="models",
+            parameters=["--use-union-operator"],
+            engine="inprocess",
+            backend="dataclass",
+        ).execute()
+
+        # Assert
+        user_group = (tmp_path / "models" / "user_group.py").read_text()
+        assert "@dataclass(slots=True)\nclass UserGroup:" in user_group
+        assert "model_rebuild" not in user_group
+        assert user_group.endswith(
+            "from models.user_account import UserAccount  # noqa: E402\n"
+        )
+        script = """
+import typing
+from models.user_account import UserAccount
+from models.user_group import UserGroup
+assert not hasattr(UserGroup(), "__dict__")
+print(typing.get_type_hints(UserAccount)["group"])
+"""
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "models.user_group.UserGroup | None"
+
+    def test_render_with_msgspec_backend(self, tmp_path, monkeypatch):
+        # Arrange
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(CYCLIC_SPEC, encoding="utf-8")
+        monkeypatch.chdir(tmp_path)
+
+        # Act
+        files = CodeGenerator(
+            openapi_file_path=str(spec),
+            output_dir="models",
+            parameters=["--use-union-operator"],
+            engine="inprocess",
+            backend="msgspec",
+        ).render()
+
+        # Assert
+        assert "from msgspec import Struct\n" in files["address.py"]
+        assert "class UserGroup(Struct):" in files["user_group.py"]
+        assert "model_rebuild" not in files["user_group.py"]
+
+    def test_schema_ir_with_cache(self, tmp_path, monkeypatch):
+        # Arrange
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(CYCLIC_SPEC, encoding="utf-8")
+        monkeypatch.chdir(tmp_path)
+        arguments = {
+            "openapi_file_path": str(spec),
+            "output_dir": "models",
+            "parameters": ["--use-union-operator", "--use-double-quotes"],
+            "engine": "inprocess",
+            "cache_dir": str(tmp_path / "cache"),
+        }
+        generated = CodeGenerator(**arguments)
+        generated.execute()
+
+        # Act
+        cached = CodeGenerator(**arguments)
+
+        # Assert
+        assert cached.cache_hit
+        assert cached.schema_ir() == generated.schema_ir()
+        models = {model.name: model for model in cached.schema_ir().models}
+        assert models["UserAccount"].references == ("Address", "UserGroup")
+        assert [field.name for field in models["UserAccount"].fields] == [
+            "group",
+            "address",
+        ]
+
+    def test_create_and_aexecute(self, tmp_path):
+        # Arrange
+        parameters = ["--use-union-operator", "--use-double-quotes"]
+        expected = {
+            name: CodeGenerator(
+                openapi_file_path="tests/data/sample.yaml",
+                output_dir=str(tmp_path / name),
+                parameters=parameters,
+                include_models_dir="tests/data/schemas/",
+                engine="inprocess",
+            ).render()
+            for name in ["async", "streaming"]
+        }
+
+        async def generate(output_dir, streaming):
+            generator = await CodeGenerator.create(
+                openapi_file_path="tests/data/sample.yaml",
+                output_dir=output_dir,
+                parameters=parameters,
+                include_models_dir="tests/data/schemas/",
+                streaming=streaming,
+            )
+            return await generator.aexecute()
+
+        async def generate_concurrently():
+            return await asyncio.gather(
+                generate(str(tmp_path / "async"), False),
+                generate(str(tmp_path / "streaming"), True),
+            )
+
+        # Act
+        reports = asyncio.run(generate_concurrently())
+
+        # Assert
+        for report, name in zip(reports, ["async", "streaming"]):
+            assert sorted(report.added) == sorted(expected[name])
+            for file_name, content in expected[name].items():
+                assert (tmp_path / name / file_name).read_text() == content
+            assert not (tmp_path / name / "temporary_model.py").exists()
+            assert not (tmp_path / name / "temporary_api.yaml").exists()
+
+    def test_create_in_process_in_fresh_interpreter(self, tmp_path):
+        # Arrange
+        # datamodel-codegenのCLIが未importの状態から、スレッドでの生成を確かめる
+        script = """
+import asyncio
+import sys
+
+from src.code_generator import CodeGenerator
+
+async def create():
+    generator = await CodeGenerator.create(
+        openapi_file_path="tests/data/sample.yaml",
+        output_dir=sys.argv[1],
+        parameters=["--use-union-operator"],
+        include_models_dir="tests/data/schemas/",
+        engine="inprocess",
+    )
+    return await generator.aexecute()
+
+print(len(asyncio.run(create()).added))
+"""
+
+        # Act
+        result = subprocess.run(
+            [sys.executable, "-c", script, str(tmp_path / "models")],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert int(result.stdout) > 0
+        assert (tmp_path / "models" / "user.py").exists()
+
+    def test_in_process_from_thread_in_fresh_interpreter(self, tmp_path):
+        # Arrange
+        # datamodel-codegenのCLIが未importの状態で、メインスレッド以外から生成する
+        script = """
+import sys
+import threading
+
+from src.code_generator import CodeGenerator
+
+errors = []
+
+def generate():
+    try:
+        CodeGenerator(
+            openapi_file_path="tests/data/sample.yaml",
+            output_dir=sys.argv[1],
+            parameters=["--use-union-operator"],
+            include_models_dir="tests/data/schemas/",
+            engine="inprocess",
+        ).execute()
+    except Exception as e:
+        errors.append(e)
+
+thread = threading.Thread(target=generate)
+thread.start()
+thread.join()
+assert not errors, errors
+"""
+
+        # Act
+        result = subprocess.run(
+            [sys.executable, "-c", script, str(tmp_path / "models")],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert (tmp_path / "models" / "user.py").exists()
+
+    def test_in_process_does_not_capture_other_threads(self, tmp_path, capsys):
+        # Arrange
+        stop = threading.Event()
+
+        def print_noise():
+            while not stop.is_set():
+                print("noise from another thread")
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=print_noise)
+        thread.start()
+
+        # Act
+        try:
+            generator = CodeGenerator(
+                openapi_file_path="tests/data/sample.yaml",
+                output_dir=str(tmp_path),
+                parameters=["--use-union-operator"],
+                include_models_dir="tests/data/schemas/",
+                engine="inprocess",
+            )
+        finally:
+            stop.set()
+            thread.join()
+
+        # Assert
+        assert "noise" not in "".join(generator.render().values())
+        assert "noise from another thread" in capsys.readouterr().out
+
+    def test_create_cancelled_removes_temporary_files(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "models"
+
+        async def create():
+            await CodeGenerator.create(
+                openapi_file_path="tests/data/sample.yaml",
+                output_dir=str(output_dir),
+                parameters=["--use-union-operator"],
+            )
+
+        async def cancel_during_codegen():
+            task = asyncio.create_task(create())
+            while not (output_dir / "temporary_api.yaml").exists():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await task
+
+        # Act
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(cancel_during_codegen())
+
+        # Assert
+        assert list(output_dir.iterdir()) == []
+
+    def test_model_fingerprints_ignore_output_dir(self, tmp_path):
+        # Arrange
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(CYCLIC_SPEC, encoding="utf-8")
+        changed_spec = tmp_path / "changed.yaml"
+        changed_spec.write_text(
+            CYCLIC_SPEC.replace("city: {type: string}", "city: {type: integer}"),
+            encoding="utf-8",
+        )
+
+        def fingerprints(path, output_dir):
+            return CodeGenerator(
+                openapi_file_path=str(path),
+                output_dir=str(tmp_path / output_dir),
+                parameters=["--use-union-operator"],
+                engine="inprocess",
+            ).model_fingerprints()
+
+        # Act
+        first = fingerprints(spec, "a")
+        second = fingerprints(spec, "b")
+        changed = fingerprints(changed_spec, "c")
+
+        # Assert
+        assert first == second
+        assert sorted(first) == ["Address", "UserAccount", "UserGroup"]
+        # Addressの変更は、依存している循環参照のクラスにも伝わる
+        assert all(changed[name] != first[name] for name in first)
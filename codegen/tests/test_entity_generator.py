@@ -1,6 +1,33 @@
+import asyncio
+import json
 import os
+import subprocess
+import sys
 
-from entity_generator import Column, DataType, EntityGenerator
+import pytest
+from sqlglot import parse
+
+from src.entity_generator import (
+    Column,
+    DataType,
+    EntityGenerator,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    operations_from_ir,
+    operations_to_ir,
+    parse_tables,
+)
+from src.profiling import Profiler
+from src.schema_ir import (
+    ColumnIR,
+    CreateTableIR,
+    ParseResultIR,
+    decode_ir,
+    dump_schema,
+    encode_ir,
+    load_schema,
+)
 
 
 class TestEntityGenerator:
@@ -19,8 +46,8 @@ class TestEntityGenerator:
         assert generator
         assert generator.db_type == "sqlite"
         assert generator.output_dir == "tests/data/entities"
-        assert generator.asts
-        assert generator.asts[0].key == "create"
+        assert generator.input_files == ["tests/data/sample.sql"]
+        assert [table.name for table in generator.tables] == ["user", "user_password"]
 
     def test_get_columns(self):
         # Arrange
@@ -32,7 +59,8 @@ class TestEntityGenerator:
             output_dir="tests/data/entities",
             db_type="sqlite",
         )
-        columns = generator._get_columns(generator.asts[0].this)
+        with open(file_path) as f:
+            columns = generator._get_columns(parse(f.read(), read="sqlite")[0].this)
 
         # Assert
         assert len(columns) == 4
@@ -75,6 +103,18 @@ class TestEntityGenerator:
             ),
         ]
 
+    def test_get_columns_requires_schema(self):
+        # Arrange
+        generator = EntityGenerator(
+            file_path="tests/data/sample.sql",
+            output_dir="tests/data/entities",
+            db_type="sqlite",
+        )
+
+        # Act / Assert
+        with pytest.raises(ValueError):
+            generator._get_columns(parse("SELECT 1", read="sqlite")[0])
+
     def test__get_tables(self):
         # Arrange
         file_path = "tests/data/sample.sql"
@@ -167,6 +207,12 @@ class TestEntityGenerator:
                 default="CURRENT_TIMESTAMP()",
             ),
         ]
+        assert tables[0].foreign_keys == []
+        assert tables[1].foreign_keys == [
+            ForeignKey(
+                columns=["user_id"], referred_table="user", referred_columns=["id"]
+            )
+        ]
 
     def test_generate_entity_file(self):
         # Arrange
@@ -186,3 +232,860 @@ class TestEntityGenerator:
             files = [entry.name for entry in entries if entry.is_file()]
         assert "user_entity.py" in files
         assert "user_password_entity.py" in files
+
+    def test_execute_with_cache(self, tmp_path):
+        # Arrange
+        file_path = "tests/data/sample.sql"
+        cache_dir = str(tmp_path / "cache")
+        EntityGenerator(
+            file_path=file_path,
+            output_dir="tests/data/entities",
+            db_type="sqlite",
+            cache_dir=cache_dir,
+        ).execute()
+        os.remove("tests/data/entities/user_entity.py")
+
+        # Act
+        generator = EntityGenerator(
+            file_path=file_path,
+            output_dir="tests/data/entities",
+            db_type="sqlite",
+            cache_dir=cache_dir,
+        )
+        generator.execute()
+
+        # Assert
+        assert generator.cache_hit
+        assert not generator.tables
+        with os.scandir("tests/data/entities") as entries:
+            files = [entry.name for entry in entries if entry.is_file()]
+        assert "base_entity.py" in files
+        assert "user_entity.py" in files
+        assert "user_password_entity.py" in files
+
+    def test_execute_writes_only_changed_files(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(open("tests/data/sample.sql").read())
+        output_dir = str(tmp_path / "entities")
+        EntityGenerator(str(sql_file), output_dir, "sqlite").execute()
+        sql_file.write_text(
+            "CREATE TABLE user (\n    id VARCHAR(40) PRIMARY KEY,\n    name TEXT\n);\n"
+        )
+
+        # Act
+        report = EntityGenerator(str(sql_file), output_dir, "sqlite").execute(
+            delete_stale=True
+        )
+
+        # Assert
+        assert report.changed == ["user_entity.py"]
+        assert report.unchanged == ["base_entity.py"]
+        assert report.removed == ["user_password_entity.py"]
+        assert not os.path.exists(os.path.join(output_dir, "user_password_entity.py"))
+
+    def test_execute_with_profiler(self, tmp_path):
+        # Arrange
+        profiler = Profiler()
+        generator = EntityGenerator(
+            file_path="tests/data/sample.sql",
+            output_dir=str(tmp_path),
+            db_type="sqlite",
+            profiler=profiler,
+        )
+
+        # Act
+        generator.execute()
+        report = profiler.report()
+
+        # Assert
+        assert list(report["phases"]) == ["read", "parse", "emit"]
+        assert report["counters"]["tables_parsed"] == 2
+        assert report["counters"]["files_written"] == 3
+        assert report["counters"]["bytes_written"] > 0
+        # base_entity.pyを含む
+        assert report["timers"]["render"]["count"] == 3
+
+    def test_execute_with_package_init(self, tmp_path, monkeypatch):
+        # Arrange
+        sql_file = os.path.abspath("tests/data/sample.sql")
+        monkeypatch.chdir(tmp_path)
+        generator = EntityGenerator(sql_file, "entities", "sqlite", package_init=True)
+
+        # Act
+        report = generator.execute()
+
+        # Assert
+        assert "__init__.py" in report.added
+        assert "__init__.pyi" in report.added
+        stub = (tmp_path / "entities" / "__init__.pyi").read_text()
+        assert "from .user_entity import UserEntity as UserEntity\n" in stub
+        assert "from .base_entity import BaseEntity as BaseEntity\n" in stub
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; from entities import UserEntity; "
+                "print(sorted(m for m in sys.modules if m.startswith('entities')))",
+            ],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
+        # relationshipの解決に必要な、外部キーで関連するEntityもimportされる
+        assert result.stdout.strip() == (
+            "['entities', 'entities.base_entity', 'entities.user_entity', "
+            "'entities.user_password_entity']"
+        )
+
+    def test_init_with_directory(self, tmp_path):
+        # Arrange
+        (tmp_path / "schema" / "b").mkdir(parents=True)
+        (tmp_path / "schema" / "a.sql").write_text(
+            "-- users\nCREATE TABLE user (id INT PRIMARY KEY, note TEXT DEFAULT 'a;b');\n"
+            "INSERT INTO user VALUES (1, 'x;y');\n"
+        )
+        (tmp_path / "schema" / "b" / "c.sql").write_text(
+            "/* ; */ CREATE TABLE item (id INT PRIMARY KEY);\nCREATE INDEX i ON item (id);"
+        )
+        (tmp_path / "schema" / "README.md").write_text("CREATE TABLE ignored (id INT);")
+
+        # Act
+        generator = EntityGenerator(
+            str(tmp_path / "schema"), str(tmp_path / "entities"), "sqlite"
+        )
+
+        # Assert
+        assert [table.name for table in generator.tables] == ["user", "item"]
+        assert generator.tables[0].columns[1].default == "'a;b'"
+        assert generator.render().keys() == {
+            "base_entity.py",
+            "user_entity.py",
+            "item_entity.py",
+        }
+
+    def test_init_with_parse_workers(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "".join(
+                f"CREATE TABLE table_{index} (id INT PRIMARY KEY, name TEXT);\n"
+                for index in range(300)
+            )
+        )
+
+        # Act
+        sequential = EntityGenerator(
+            str(sql_file), str(tmp_path / "a"), "sqlite", parse_workers=1
+        )
+        parallel = EntityGenerator(
+            str(sql_file), str(tmp_path / "b"), "sqlite", parse_workers=2
+        )
+
+        # Assert
+        assert [table.name for table in parallel.tables] == [
+            f"table_{index}" for index in range(300)
+        ]
+        assert [table.columns for table in parallel.tables] == [
+            table.columns for table in sequential.tables
+        ]
+
+    def test_defaults_do_not_start_worker_processes(self, tmp_path, monkeypatch):
+        # Arrange
+        import src.parallel
+
+        def no_process_pool(*args, **kwargs):
+            raise AssertionError("ProcessPoolExecutor must not be used by default")
+
+        monkeypatch.setattr(src.parallel, "ProcessPoolExecutor", no_process_pool)
+        monkeypatch.setattr(os, "cpu_count", lambda: 4)
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "".join(
+                f"CREATE TABLE table_{index} (id INT PRIMARY KEY, name TEXT);\n"
+                for index in range(300)
+            )
+        )
+
+        # Act
+        generator = EntityGenerator(str(sql_file), str(tmp_path / "out"), "sqlite")
+        report = generator.execute()
+
+        # Assert
+        assert len(generator.tables) == 300
+        assert len(report.added) == 301
+
+    def test_execute_with_template_dir(self, tmp_path):
+        # Arrange
+        template_dir = tmp_path / "templates"
+        template_dir.mkdir()
+        (template_dir / "entity.py.jinja").write_text(
+            "# {{ table_name }}\n"
+            "{% for column in columns %}{{ column.name }}: {{ column.python_type }}\n"
+            "{% endfor %}"
+        )
+        cache_dir = str(tmp_path / "cache")
+
+        # Act
+        generator = EntityGenerator(
+            "tests/data/sample.sql",
+            str(tmp_path / "entities"),
+            "sqlite",
+            cache_dir=cache_dir,
+            template_dir=str(template_dir),
+            render_workers=1,
+        )
+        generator.execute()
+
+        # Assert
+        assert (tmp_path / "entities" / "user_entity.py").read_text() == (
+            "# user\nid: str\nname: str\nemail: str\ncreated_at: datetime\n"
+        )
+        # 上書きしていないテンプレートは組み込みのものを使用する
+        assert (
+            "class BaseEntity" in (tmp_path / "entities" / "base_entity.py").read_text()
+        )
+        assert os.listdir(os.path.join(cache_dir, "templates"))
+        # テンプレートを変更した場合はキャッシュを使用しない
+        (template_dir / "entity.py.jinja").write_text("# {{ class_name }}\n")
+        changed = EntityGenerator(
+            "tests/data/sample.sql",
+            str(tmp_path / "entities"),
+            "sqlite",
+            cache_dir=cache_dir,
+            template_dir=str(template_dir),
+        )
+        assert not changed.cache_hit
+        assert changed.render()["user_entity.py"] == "# UserEntity\n"
+
+    def test_render_with_render_workers(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "".join(
+                f"CREATE TABLE table_{index} (id INT PRIMARY KEY, created_at DATE);\n"
+                for index in range(150)
+            )
+        )
+
+        # Act
+        sequential = EntityGenerator(
+            str(sql_file), str(tmp_path / "a"), "sqlite", render_workers=1
+        ).render()
+        parallel = EntityGenerator(
+            str(sql_file), str(tmp_path / "a"), "sqlite", render_workers=2
+        ).render()
+
+        # Assert
+        assert len(parallel) == 151
+        assert parallel == sequential
+        assert list(parallel) == list(sequential)
+
+    def test_init_with_constraints(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE team (id INT PRIMARY KEY, code TEXT, name TEXT);\n"
+            "CREATE TABLE member (\n"
+            "    team_id INT,\n"
+            "    user_id INT,\n"
+            "    role TEXT,\n"
+            "    leader_id INT REFERENCES team ON DELETE SET NULL,\n"
+            "    PRIMARY KEY (team_id, user_id),\n"
+            "    CONSTRAINT uq_member_role UNIQUE (team_id, role),\n"
+            "    CONSTRAINT fk_member_team FOREIGN KEY (team_id) REFERENCES team (id)\n"
+            ");\n"
+            "CREATE UNIQUE INDEX ix_team_code ON team (code, name);\n"
+            "CREATE INDEX ix_member_lower_role ON member (lower(role));\n"
+            "CREATE INDEX ix_unknown ON unknown (id);\n"
+        )
+
+        # Act
+        generator = EntityGenerator(
+            str(sql_file), str(tmp_path / "entities"), "postgres"
+        )
+
+        # Assert
+        team, member = generator.tables
+        assert team.indexes == [
+            Index(
+                table_name="team",
+                columns=["code", "name"],
+                name="ix_team_code",
+                unique=True,
+            )
+        ]
+        assert member.primary_key == ["team_id", "user_id"]
+        # 複合主キーのカラムは一意にしない
+        assert [column.unique for column in member.columns] == [
+            False,
+            False,
+            False,
+            False,
+        ]
+        assert [column.nullable for column in member.columns] == [
+            False,
+            False,
+            True,
+            True,
+        ]
+        assert member.unique_constraints == [
+            UniqueConstraint(columns=["team_id", "role"], name="uq_member_role")
+        ]
+        # 参照先のカラムを省略した場合は参照先の主キー、式インデックスは無視する
+        assert member.foreign_keys == [
+            ForeignKey(
+                columns=["leader_id"],
+                referred_table="team",
+                referred_columns=["id"],
+                ondelete="SET NULL",
+            ),
+            ForeignKey(
+                columns=["team_id"],
+                referred_table="team",
+                referred_columns=["id"],
+                name="fk_member_team",
+            ),
+        ]
+        assert member.indexes == []
+
+    def test_init_with_mysql_indexes(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE item (\n"
+            "    id INT PRIMARY KEY,\n"
+            "    sku VARCHAR(20),\n"
+            "    name TEXT,\n"
+            "    KEY ix_item_sku (sku),\n"
+            "    UNIQUE KEY uq_item_name (sku, name)\n"
+            ");\n"
+        )
+
+        # Act
+        generator = EntityGenerator(str(sql_file), str(tmp_path / "entities"), "mysql")
+
+        # Assert
+        (item,) = generator.tables
+        assert item.indexes == [
+            Index(table_name="item", columns=["sku"], name="ix_item_sku")
+        ]
+        assert item.unique_constraints == [
+            UniqueConstraint(columns=["sku", "name"], name="uq_item_name")
+        ]
+
+    def test_render_with_foreign_keys(self, tmp_path):
+        # Arrange
+        output_dir = str(tmp_path / "entities")
+
+        # Act
+        files = EntityGenerator("tests/data/sample.sql", output_dir, "sqlite").render()
+        selectin = EntityGenerator(
+            "tests/data/sample.sql",
+            output_dir,
+            "sqlite",
+            relationship_loading="selectin",
+        ).render()
+        disabled = EntityGenerator(
+            "tests/data/sample.sql", output_dir, "sqlite", relationship_loading=None
+        ).render()
+
+        # Assert
+        package = output_dir.replace("/", ".")
+        assert (
+            'user_id: Mapped[str] = mapped_column(String(40), ForeignKey("user.id"), '
+            "nullable=False)\n" in files["user_password_entity.py"]
+        )
+        assert (
+            'user: Mapped["UserEntity"] = relationship('
+            'back_populates="user_passwords", lazy="raise")\n'
+            in files["user_password_entity.py"]
+        )
+        assert files["user_password_entity.py"].endswith(
+            f"from {package}.user_entity import UserEntity  # noqa: E402\n"
+        )
+        assert (
+            'user_passwords: Mapped[list["UserPasswordEntity"]] = relationship('
+            'back_populates="user", lazy="raise")\n' in files["user_entity.py"]
+        )
+        assert 'lazy="selectin"' in selectin["user_entity.py"]
+        assert "relationship" not in disabled["user_entity.py"]
+        assert 'ForeignKey("user.id")' in disabled["user_password_entity.py"]
+
+    def test_init_with_unsupported_relationship_loading(self):
+        # Act & Assert
+        with pytest.raises(ValueError):
+            EntityGenerator(
+                "tests/data/sample.sql",
+                "tests/data/entities",
+                "sqlite",
+                relationship_loading="lazy",
+            )
+
+    def test_execute_creates_indexes_and_relationships(self, tmp_path, monkeypatch):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE node (\n"
+            "    id INT PRIMARY KEY,\n"
+            "    parent_id INT REFERENCES node (id),\n"
+            "    name TEXT\n"
+            ");\n"
+            "CREATE INDEX ix_node_name ON node (name);\n"
+            "CREATE INDEX ix_node_parent ON node (parent_id, name);\n"
+        )
+        monkeypatch.chdir(tmp_path)
+        EntityGenerator(str(sql_file), "entities", "sqlite").execute()
+
+        # Act
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from sqlalchemy import create_engine, inspect, select\n"
+                "from sqlalchemy.orm import Session\n"
+                "from entities.base_entity import BaseEntity\n"
+                "from entities.node_entity import NodeEntity\n"
+                "engine = create_engine('sqlite://')\n"
+                "BaseEntity.metadata.create_all(engine)\n"
+                "print(sorted(i['name'] for i in inspect(engine).get_indexes('node')))\n"
+                "with Session(engine) as session:\n"
+                "    session.add(NodeEntity(id=1))\n"
+                "    session.commit()\n"
+                "    node = session.scalars(select(NodeEntity)).one()\n"
+                "    try:\n"
+                "        node.parent_nodes\n"
+                "    except Exception as error:\n"
+                "        print(type(error).__name__)\n",
+            ],
+            capture_output=True,
+            text=True,
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.splitlines() == [
+            "['ix_node_name', 'ix_node_parent']",
+            "InvalidRequestError",
+        ]
+
+    def test_init_with_pg_dump(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "dump.sql"
+        sql_file.write_text(
+            "SET statement_timeout = 0;\n"
+            'CREATE TABLE public."user" (\n'
+            "    id character varying(40) NOT NULL,\n"
+            "    name text\n"
+            ");\n"
+            'ALTER TABLE public."user" OWNER TO postgres;\n'
+            "CREATE TABLE public.user_password (\n"
+            "    id integer NOT NULL,\n"
+            "    user_id character varying(40) NOT NULL\n"
+            ");\n"
+            'COPY public."user" (id, name) FROM stdin;\n'
+            "u1\tit's; CREATE TABLE fake (id int);\n"
+            "\\.\n"
+            'ALTER TABLE ONLY public."user"\n'
+            "    ADD CONSTRAINT user_pkey PRIMARY KEY (id);\n"
+            "ALTER TABLE ONLY public.user_password\n"
+            "    ADD CONSTRAINT user_password_pkey PRIMARY KEY (id);\n"
+            "CREATE INDEX user_password_user_id_idx ON public.user_password "
+            "USING btree (user_id);\n"
+            "ALTER TABLE ONLY public.user_password\n"
+            "    ADD CONSTRAINT user_password_user_id_fkey FOREIGN KEY (user_id) "
+            'REFERENCES public."user"(id) ON DELETE CASCADE;\n'
+        )
+        profiler = Profiler()
+
+        # Act
+        generator = EntityGenerator(
+            str(sql_file), str(tmp_path / "entities"), "postgres", profiler=profiler
+        )
+
+        # Assert
+        user, user_password = generator.tables
+        assert user.name == "user"
+        assert user.primary_key == ["id"]
+        assert user_password.primary_key == ["id"]
+        assert user_password.foreign_keys == [
+            ForeignKey(
+                columns=["user_id"],
+                referred_table="user",
+                referred_columns=["id"],
+                name="user_password_user_id_fkey",
+                ondelete="CASCADE",
+            )
+        ]
+        assert user_password.indexes == [
+            Index(
+                table_name="user_password",
+                columns=["user_id"],
+                name="user_password_user_id_idx",
+            )
+        ]
+        # SET文・COPY文とそのデータはパースしない
+        assert profiler.report()["counters"]["statements_parsed"] == 7
+
+    def test_init_with_migrations(self, tmp_path):
+        # Arrange
+        migrations = tmp_path / "migrations"
+        migrations.mkdir()
+        (migrations / "1_create.sql").write_text(
+            "CREATE TABLE account (id INTEGER PRIMARY KEY, name TEXT);\n"
+            "CREATE TABLE tmp (id INTEGER PRIMARY KEY);\n"
+        )
+        (migrations / "2_alter.sql").write_text(
+            "ALTER TABLE account ADD COLUMN email VARCHAR(255) NOT NULL;\n"
+            "ALTER TABLE account DROP COLUMN name;\n"
+            "DROP TABLE IF EXISTS tmp;\n"
+        )
+        (migrations / "10_rename.sql").write_text(
+            "ALTER TABLE account RENAME COLUMN email TO mail;\n"
+            "ALTER TABLE account RENAME TO member;\n"
+        )
+
+        # Act
+        generator = EntityGenerator(
+            str(migrations), str(tmp_path / "entities"), "postgres", migrations=True
+        )
+
+        # Assert
+        (member,) = generator.tables
+        assert member.name == "member"
+        assert [column.name for column in member.columns] == ["id", "mail"]
+        assert member.columns[1].length == 255
+        assert not member.columns[1].nullable
+
+    def test_init_with_migrations_parse_cache(self, tmp_path):
+        # Arrange
+        migrations = tmp_path / "migrations"
+        migrations.mkdir()
+        (migrations / "1_create.sql").write_text(
+            "CREATE TABLE account (id INTEGER PRIMARY KEY);\n"
+        )
+        (migrations / "2_create.sql").write_text(
+            "CREATE TABLE post (id INTEGER PRIMARY KEY, account_id INTEGER);\n"
+        )
+        cache_dir = str(tmp_path / "cache")
+        EntityGenerator(
+            str(migrations),
+            str(tmp_path / "entities"),
+            "sqlite",
+            cache_dir=cache_dir,
+            migrations=True,
+        )
+        (migrations / "3_alter.sql").write_text(
+            "ALTER TABLE post ADD CONSTRAINT post_account_id_fkey "
+            "FOREIGN KEY (account_id) REFERENCES account (id);\n"
+        )
+        profiler = Profiler()
+
+        # Act
+        generator = EntityGenerator(
+            str(migrations),
+            str(tmp_path / "entities"),
+            "sqlite",
+            cache_dir=cache_dir,
+            profiler=profiler,
+            migrations=True,
+        )
+
+        # Assert
+        counters = profiler.report()["counters"]
+        assert counters["parse_cache_hits"] == 2
+        assert counters["files_parsed"] == 1
+        account, post = generator.tables
+        assert post.foreign_keys == [
+            ForeignKey(
+                columns=["account_id"],
+                referred_table="account",
+                referred_columns=["id"],
+                name="post_account_id_fkey",
+            )
+        ]
+
+    def test_operations_ir_round_trip(self):
+        # Arrange
+        operations, _ = parse_tables(
+            [
+                "CREATE TABLE account (id INTEGER GENERATED ALWAYS AS IDENTITY, "
+                "mail VARCHAR(255) NOT NULL, PRIMARY KEY (id))",
+                "CREATE TABLE post (id INTEGER PRIMARY KEY, account_id INTEGER "
+                "REFERENCES account (id) ON DELETE CASCADE, title TEXT, "
+                "UNIQUE (account_id, title))",
+                "CREATE INDEX ix_post_title ON post (title)",
+                "ALTER TABLE post ADD COLUMN body TEXT",
+                "ALTER TABLE post RENAME COLUMN title TO subject",
+                "DROP TABLE account",
+            ],
+            "postgres",
+        )
+
+        # Act
+        decoded = operations_from_ir(
+            decode_ir(
+                ParseResultIR,
+                json.loads(json.dumps(encode_ir(operations_to_ir(operations)))),
+            )
+        )
+
+        # Assert
+        assert [type(operation).__name__ for operation in decoded] == [
+            "Table",
+            "Table",
+            "Index",
+            "AlterTable",
+            "AlterTable",
+            "DropTable",
+        ]
+        assert repr(decoded) == repr(operations)
+
+    def test_decode_operations_rejects_unknown_format(self):
+        # Act / Assert
+        with pytest.raises(ValueError):
+            decode_ir(ParseResultIR, [[["UnknownIR", []]]])
+        with pytest.raises(ValueError):
+            decode_ir(ParseResultIR, [[["CreateTableIR", ["account"]]]])
+        with pytest.raises(ValueError):
+            operations_from_ir(
+                ParseResultIR((CreateTableIR("t", (ColumnIR("id", "unknown"),)),))
+            )
+
+    def test_reload_parses_and_renders_only_changed(self, tmp_path):
+        # Arrange
+        sql_dir = tmp_path / "sql"
+        sql_dir.mkdir()
+        (sql_dir / "account.sql").write_text(
+            "CREATE TABLE account (id INTEGER PRIMARY KEY);\n"
+        )
+        (sql_dir / "post.sql").write_text(
+            "CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT NOT NULL);\n"
+        )
+        profiler = Profiler()
+        generator = EntityGenerator(
+            str(sql_dir),
+            str(tmp_path / "entities"),
+            "sqlite",
+            profiler=profiler,
+            incremental=True,
+        )
+        initial = generator.render()
+        (sql_dir / "post.sql").write_text(
+            "CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT NULL);\n"
+        )
+        (sql_dir / "tag.sql").write_text("CREATE TABLE tag (id INTEGER PRIMARY KEY);\n")
+        before = dict(profiler.report()["counters"])
+
+        # Act
+        generator.reload()
+        files = generator.render()
+        (sql_dir / "tag.sql").unlink()
+        generator.reload()
+        removed = generator.render()
+
+        # Assert
+        counters = profiler.report()["counters"]
+        assert counters["files_parsed"] - before["files_parsed"] == 2
+        assert counters["files_rendered"] - before["files_rendered"] == 2
+        assert files["account_entity.py"] == initial["account_entity.py"]
+        assert "nullable=True" in files["post_entity.py"]
+        assert "tag_entity.py" in files
+        assert sorted(removed) == [
+            "account_entity.py",
+            "base_entity.py",
+            "post_entity.py",
+        ]
+        assert removed["post_entity.py"] == files["post_entity.py"]
+
+    def test_reload_renders_again_after_template_edit(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text("CREATE TABLE account (id INTEGER PRIMARY KEY);\n")
+        template_dir = tmp_path / "templates"
+        template_dir.mkdir()
+        template = template_dir / "entity.py.jinja"
+        template.write_text("# v1 {{ table_name }}\n")
+        generator = EntityGenerator(
+            str(sql_file),
+            str(tmp_path / "entities"),
+            "sqlite",
+            template_dir=str(template_dir),
+            incremental=True,
+        )
+        initial = generator.render()
+        template.write_text("# v2 {{ table_name }}\n")
+        stat = template.stat()
+        os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        # Act
+        generator.reload()
+        files = generator.render()
+
+        # Assert
+        assert initial["account_entity.py"].startswith("# v1 account")
+        assert files["account_entity.py"].startswith("# v2 account")
+
+    def test_reload_requires_incremental(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text("CREATE TABLE account (id INTEGER PRIMARY KEY);\n")
+        generator = EntityGenerator(str(sql_file), str(tmp_path / "entities"), "sqlite")
+
+        # Act / Assert
+        with pytest.raises(RuntimeError):
+            generator.reload()
+
+    def test_init_with_server_defaults(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE account (\n"
+            "    id BIGSERIAL PRIMARY KEY,\n"
+            "    uid UUID NOT NULL DEFAULT gen_random_uuid(),\n"
+            "    balance NUMERIC(12, 2) NOT NULL DEFAULT 0,\n"
+            "    created_at TIMESTAMP NOT NULL DEFAULT now(),\n"
+            "    seq INTEGER DEFAULT nextval('account_seq_seq'::regclass) NOT NULL\n"
+            ");\n"
+            "CREATE TABLE event (\n"
+            "    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY\n"
+            ");\n"
+        )
+
+        # Act
+        generator = EntityGenerator(
+            str(sql_file), str(tmp_path / "entities"), "postgres"
+        )
+
+        # Assert
+        account, event = generator.tables
+        id_, uid, balance, created_at, seq = account.columns
+        assert id_.data_type == DataType.BIGINT
+        assert id_.autoincrement
+        assert uid.data_type == DataType.UUID
+        assert uid.default == "GEN_RANDOM_UUID()"
+        assert balance.data_type == DataType.DECIMAL
+        assert (balance.length, balance.scale) == (12, 2)
+        assert created_at.default == "CURRENT_TIMESTAMP()"
+        assert seq.autoincrement
+        assert seq.default is None
+        assert event.columns[0].identity == Column.IDENTITY_ALWAYS
+
+    def test_identity_column_is_not_nullable(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE event (\n"
+            "    id UUID PRIMARY KEY,\n"
+            "    seq_no INTEGER GENERATED BY DEFAULT AS IDENTITY\n"
+            ");\n"
+        )
+        generator = EntityGenerator(
+            str(sql_file), str(tmp_path / "entities"), "postgres"
+        )
+
+        # Act
+        files = generator.render()
+
+        # Assert
+        seq_no = generator.tables[0].columns[1]
+        assert seq_no.identity == Column.IDENTITY_BY_DEFAULT
+        assert not seq_no.nullable
+        assert (
+            "seq_no: Mapped[int] = mapped_column(Integer, Identity()"
+            in files["event_entity.py"]
+        )
+
+    def test_execute_with_eager_defaults(self, tmp_path, monkeypatch):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            "CREATE TABLE account (\n"
+            "    id INTEGER PRIMARY KEY AUTOINCREMENT,\n"
+            "    status VARCHAR(20) NOT NULL DEFAULT 'it''s',\n"
+            "    balance DECIMAL(12, 2) NOT NULL DEFAULT 0,\n"
+            "    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP\n"
+            ");\n"
+        )
+        monkeypatch.chdir(tmp_path)
+        EntityGenerator(
+            str(sql_file), "entities", "sqlite", eager_defaults=True
+        ).execute()
+
+        # Act
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from sqlalchemy import create_engine, event\n"
+                "from sqlalchemy.orm import Session\n"
+                "from entities.base_entity import BaseEntity\n"
+                "from entities.account_entity import AccountEntity\n"
+                "engine = create_engine('sqlite://')\n"
+                "BaseEntity.metadata.create_all(engine)\n"
+                "statements = []\n"
+                "event.listen(engine, 'before_cursor_execute',\n"
+                "    lambda *args: statements.append(args[2]))\n"
+                "with Session(engine) as session:\n"
+                "    account = AccountEntity()\n"
+                "    session.add(account)\n"
+                "    session.flush()\n"
+                "    print(len(statements), 'RETURNING' in statements[0])\n"
+                "    print(account.id, account.status, account.balance,\n"
+                "        account.created_at is not None)\n",
+            ],
+            capture_output=True,
+            text=True,
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.splitlines() == ["1 True", "1 it's 0.00 True"]
+
+    def test_schema_ir_with_cache(self, tmp_path):
+        # Arrange
+        cache_dir = str(tmp_path / "cache")
+        output_dir = str(tmp_path / "entities")
+        EntityGenerator(
+            "tests/data/sample.sql", output_dir, "sqlite", cache_dir=cache_dir
+        ).execute()
+
+        # Act
+        generator = EntityGenerator(
+            "tests/data/sample.sql", output_dir, "sqlite", cache_dir=cache_dir
+        )
+        schema = generator.schema_ir()
+        dump_schema(schema, str(tmp_path / "schema.ir"))
+
+        # Assert
+        assert generator.cache_hit
+        assert [table.name for table in schema.tables] == ["user", "user_password"]
+        assert schema.tables[0].columns[0] == ColumnIR(
+            "id", "string", length=40, nullable=False, primary_key=True, unique=True
+        )
+        assert load_schema(str(tmp_path / "schema.ir")) == schema
+
+    def test_create_and_aexecute(self, tmp_path):
+        # Arrange
+        expected = EntityGenerator(
+            file_path="tests/data/sample.sql",
+            output_dir=str(tmp_path / "async"),
+            db_type="sqlite",
+        ).render()
+
+        async def generate():
+            generator = await EntityGenerator.create(
+                file_path="tests/data/sample.sql",
+                output_dir=str(tmp_path / "async"),
+                db_type="sqlite",
+            )
+            return await generator.aexecute()
+
+        # Act
+        report = asyncio.run(generate())
+
+        # Assert
+        assert sorted(report.added) == sorted(expected)
+        for file_name, content in expected.items():
+            assert (tmp_path / "async" / file_name).read_text() == content
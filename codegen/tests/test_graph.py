@@ -0,0 +1,37 @@
+from src.graph import find_cycles, strongly_connected_components
+
+
+class TestGraph:
+    def test_strongly_connected_components(self):
+        # Arrange
+        graph = {"a": ["b"], "b": ["c"], "c": ["a", "d"], "d": []}
+
+        # Act
+        components = strongly_connected_components(graph)
+
+        # Assert
+        assert [sorted(component) for component in components] == [
+            ["d"],
+            ["a", "b", "c"],
+        ]
+
+    def test_find_cycles(self):
+        # Arrange
+        graph = {"a": ["a"], "b": ["c"], "c": []}
+
+        # Act
+        cycles = find_cycles(graph)
+
+        # Assert
+        assert cycles == [["a"]]
+
+    def test_long_chain(self):
+        # Arrange
+        graph = {i: [i + 1] for i in range(100000)}
+
+        # Act
+        components = strongly_connected_components(graph)
+
+        # Assert
+        assert len(components) == 100001
+        assert components[0] == [100000]
@@ -0,0 +1,55 @@
+import os
+
+from src.loader import clear_document_cache, iter_schema_files, load_document
+
+
+class TestLoader:
+    def test_load_document_yaml_and_json(self, tmp_path):
+        # Arrange
+        yaml_file = tmp_path / "user.yaml"
+        yaml_file.write_text("type: object\nproperties:\n  id:\n    type: integer\n")
+        json_file = tmp_path / "other.json"
+        json_file.write_text('{"type": "object", "properties": {}}')
+
+        # Act
+        yaml_document = load_document(yaml_file)
+        json_document = load_document(json_file)
+
+        # Assert
+        assert yaml_document == {
+            "type": "object",
+            "properties": {"id": {"type": "integer"}},
+        }
+        assert json_document == {"type": "object", "properties": {}}
+
+    def test_load_document_is_cached_until_file_changes(self, tmp_path):
+        # Arrange
+        clear_document_cache()
+        schema_file = tmp_path / "user.yaml"
+        schema_file.write_text("type: object\n")
+        first = load_document(schema_file)
+
+        # Act
+        second = load_document(schema_file)
+        schema_file.write_text("type: string\n")
+        os.utime(schema_file, ns=(0, 1_000_000_000))
+        third = load_document(schema_file)
+
+        # Assert
+        assert second is first
+        assert third == {"type": "string"}
+
+    def test_iter_schema_files_skips_other_suffixes(self, tmp_path):
+        # Arrange
+        (tmp_path / "inner").mkdir()
+        (tmp_path / "user.yaml").write_text("type: object\n")
+        (tmp_path / "inner" / "other.yml").write_text("type: object\n")
+        (tmp_path / "inner" / "other2.json").write_text("{}")
+        (tmp_path / "README.md").write_text("# schemas\n")
+        (tmp_path / ".DS_Store").write_bytes(b"\x00\x01")
+
+        # Act
+        files = sorted(p.name for p in iter_schema_files(tmp_path))
+
+        # Assert
+        assert files == ["other.yml", "other2.json", "user.yaml"]
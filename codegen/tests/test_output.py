@@ -0,0 +1,198 @@
+import os
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from src.output import (
+    MANIFEST_FILE_NAME,
+    OutputSink,
+    emit_files,
+    manifest_path,
+    write_files,
+    write_outputs,
+)
+
+
+class TestEmitFiles:
+    def test_output_is_deterministic(self, tmp_path):
+        # Arrange
+        items = list(range(200))
+
+        def render(item):
+            return f"model_{item}.py", f"class Model{item}: ...\n"
+
+        # Act
+        results = []
+        for index, (max_workers, batch_size) in enumerate(
+            [(1, 1), (4, 7), (16, 64), (None, 1000)]
+        ):
+            output_dir = tmp_path / str(index)
+            output_dir.mkdir()
+            files = emit_files(
+                str(output_dir),
+                items,
+                render,
+                max_workers=max_workers,
+                batch_size=batch_size,
+            )
+            written = {p.name: p.read_text() for p in output_dir.iterdir()}
+            results.append((list(files), written))
+
+        # Assert
+        assert all(result == results[0] for result in results)
+        assert len(results[0][1]) == 200
+
+    def test_skips_none_and_keeps_last_duplicate(self, tmp_path):
+        # Arrange
+        items = ["a", None, "b", "a2"]
+
+        def render(item):
+            if item is None:
+                return None
+            return f"{item[0]}.py", item
+
+        # Act
+        files = emit_files(str(tmp_path), items, render, max_workers=4, batch_size=1)
+
+        # Assert
+        assert files == {"a.py": "a2", "b.py": "b"}
+        assert (tmp_path / "a.py").read_text() == "a2"
+
+    def test_renders_in_calling_thread(self, tmp_path):
+        # Arrange
+        threads = set()
+
+        def render(item):
+            threads.add(threading.get_ident())
+            return f"{item}.py", str(item)
+
+        # Act
+        emit_files(str(tmp_path), range(20), render, max_workers=4, batch_size=2)
+
+        # Assert
+        assert threads == {threading.get_ident()}
+        assert len(list(tmp_path.iterdir())) == 20
+
+    def test_write_files(self, tmp_path):
+        # Act
+        write_files(str(tmp_path), {"a.py": "a", "b.py": "b"}, max_workers=2)
+
+        # Assert
+        assert (tmp_path / "a.py").read_text() == "a"
+        assert (tmp_path / "b.py").read_text() == "b"
+
+
+class TestOutputSink:
+    def test_writes_only_changed_files(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "out"
+        write_outputs(str(output_dir), {"a.py": "a", "b.py": "b", "c.py": "c"})
+        os.utime(output_dir / "a.py", ns=(0, 0))
+
+        # Act
+        report = write_outputs(str(output_dir), {"a.py": "a", "b.py": "B", "d.py": "d"})
+
+        # Assert
+        assert report.to_dict() == {
+            "added": ["d.py"],
+            "changed": ["b.py"],
+            "removed": [],
+            "unchanged": ["a.py"],
+        }
+        assert (output_dir / "a.py").stat().st_mtime_ns == 0
+        assert (output_dir / "b.py").read_text() == "B"
+        assert (output_dir / "c.py").exists()
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            f".out{MANIFEST_FILE_NAME}",
+            "out",
+        ]
+
+    def test_delete_stale_removes_only_previous_outputs(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "out"
+        output_dir.mkdir()
+        (output_dir / "handwritten.py").write_text("keep")
+        write_outputs(str(output_dir), {"a.py": "a", "b.py": "b"})
+
+        # Act
+        report = write_outputs(str(output_dir), {"a.py": "a"}, delete_stale=True)
+
+        # Assert
+        assert report.removed == ["b.py"]
+        assert not (output_dir / "b.py").exists()
+        assert (output_dir / "handwritten.py").read_text() == "keep"
+        assert '"a.py"' in manifest_path(str(output_dir)).read_text()
+        assert not (output_dir / MANIFEST_FILE_NAME).exists()
+
+    def test_legacy_manifest_is_moved_out_of_output_dir(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "out"
+        output_dir.mkdir()
+        (output_dir / "b.py").write_text("b")
+        (output_dir / MANIFEST_FILE_NAME).write_text('{"files": ["b.py"]}')
+
+        # Act
+        report = write_outputs(str(output_dir), {"a.py": "a"}, delete_stale=True)
+
+        # Assert
+        assert report.removed == ["b.py"]
+        assert not (output_dir / MANIFEST_FILE_NAME).exists()
+        assert '"a.py"' in manifest_path(str(output_dir)).read_text()
+
+    def test_error_before_commit_leaves_output_untouched(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "models"
+        write_outputs(str(output_dir), {"a.py": "a"})
+
+        def render(item):
+            if item == "boom":
+                raise ValueError(item)
+            return "a.py", item
+
+        # Act
+        with pytest.raises(ValueError):
+            with OutputSink(str(output_dir)) as sink:
+                sink.emit(["changed", "boom"], render)
+                sink.commit()
+
+        # Assert
+        assert (output_dir / "a.py").read_text() == "a"
+        assert [p.name for p in output_dir.iterdir()] == ["a.py"]
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            f".models{MANIFEST_FILE_NAME}",
+            "models",
+        ]
+
+    def test_cancelled_before_commit_leaves_output_untouched(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "out"
+        write_outputs(str(output_dir), {"a.py": "a"})
+        cancelled = threading.Event()
+
+        def render(item):
+            cancelled.set()
+            return "a.py", item
+
+        # Act
+        with pytest.raises(CancelledError):
+            with OutputSink(str(output_dir), cancelled=cancelled) as sink:
+                sink.emit(["changed"], render)
+                sink.commit()
+
+        # Assert
+        assert (output_dir / "a.py").read_text() == "a"
+        assert [p.name for p in output_dir.iterdir()] == ["a.py"]
+        assert not [p for p in tmp_path.iterdir() if p.name.startswith(".modelgen-")]
+
+    def test_write_after_commit_raises(self, tmp_path):
+        # Arrange
+        output_dir = tmp_path / "out"
+        sink = OutputSink(str(output_dir))
+        sink.write_all({"a.py": "a"})
+        sink.commit()
+
+        # Act / Assert
+        with pytest.raises(RuntimeError):
+            sink.write_all({"b.py": "b"})
+        assert not (output_dir / "b.py").exists()
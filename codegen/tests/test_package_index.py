@@ -0,0 +1,78 @@
+import subprocess
+import sys
+
+from src.package_index import PackageIndex, render_package_init
+
+
+class TestPackageIndex:
+    def test_add(self):
+        # Arrange
+        index = PackageIndex()
+
+        # Act
+        index.add(
+            "user.py",
+            "from pydantic import BaseModel\n\n\nclass User(BaseModel):\n    id: int\n",
+        )
+        index.add("user_group.py", "class UserGroup:\n    class Meta:\n        pass\n")
+        index.add("__init__.py", "class Ignored:\n    pass\n")
+        index.add("README.md", "class Ignored:\n")
+
+        # Assert
+        assert index.exports == {"User": "user", "UserGroup": "user_group"}
+
+    def test_render(self):
+        # Act
+        files = render_package_init(
+            [
+                ("user.py", "class User:\n    pass\n"),
+                ("address.py", "class Address:\n    pass\n"),
+            ]
+        )
+
+        # Assert
+        assert set(files) == {"__init__.py", "__init__.pyi"}
+        assert '__all__ = [\n    "Address",\n    "User",\n]' in files["__init__.py"]
+        assert '"User": "user",' in files["__init__.py"]
+        assert "from .user import User as User\n" in files["__init__.pyi"]
+
+    def test_lazy_import(self, tmp_path):
+        # Arrange
+        package = tmp_path / "models"
+        package.mkdir()
+        sources = {
+            "user.py": "class User:\n    pass\n",
+            "address.py": "class Address:\n    pass\n",
+        }
+        for file_name, content in {
+            **sources,
+            **render_package_init(sources.items()),
+        }.items():
+            (package / file_name).write_text(content)
+        script = """
+import sys
+from models import User
+print(sorted(name for name in sys.modules if name.startswith("models")))
+import models
+print("Address" in dir(models), "Address" in vars(models))
+try:
+    models.Missing
+except AttributeError as error:
+    print(error)
+"""
+
+        # Act
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.splitlines() == [
+            "['models', 'models.user']",
+            "True False",
+            "module 'models' has no attribute 'Missing'",
+        ]
@@ -0,0 +1,30 @@
+from functools import partial
+
+import pytest
+
+from src.parallel import map_chunks
+
+
+def _scale(factor, values):
+    return [value * factor for value in values]
+
+
+class TestMapChunks:
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_preserves_order(self, max_workers):
+        # Act
+        results = list(
+            map_chunks(partial(_scale, 2), range(100), max_workers, chunk_size=7)
+        )
+
+        # Assert
+        assert [value for chunk in results for value in chunk] == [
+            value * 2 for value in range(100)
+        ]
+        assert len(results) == 15
+
+    def test_empty(self):
+        # Act / Assert
+        assert list(map_chunks(partial(_scale, 2), [], 2)) == []
+        with pytest.raises(ValueError):
+            list(map_chunks(partial(_scale, 2), [1], 2, chunk_size=0))
@@ -0,0 +1,57 @@
+import json
+
+from src.profiling import NULL_PROFILER, Profiler
+
+
+class TestProfiler:
+    def test_records_nested_spans_and_counters(self):
+        # Arrange
+        finished = []
+        profiler = Profiler(on_span=finished.append)
+
+        # Act
+        with profiler.span("outer", spec="a.yaml"):
+            with profiler.span("inner") as attributes:
+                attributes["classes"] = 3
+            profiler.count("files_loaded", 2)
+            profiler.count("files_loaded")
+        render = profiler.timed("render", lambda x: x * 2)
+        results = [render(i) for i in range(4)]
+        report = json.loads(profiler.to_json())
+
+        # Assert
+        assert results == [0, 2, 4, 6]
+        assert [span.name for span in finished] == ["inner", "outer"]
+        assert [(s["name"], s["depth"]) for s in report["spans"]] == [
+            ("outer", 0),
+            ("inner", 1),
+        ]
+        assert report["spans"][0]["attributes"] == {"spec": "a.yaml"}
+        assert report["spans"][1]["attributes"] == {"classes": 3}
+        assert set(report["phases"]) == {"outer", "inner"}
+        assert report["counters"] == {"files_loaded": 3}
+        assert report["timers"]["render"]["count"] == 4
+
+    def test_trace_memory(self):
+        # Arrange
+        profiler = Profiler(trace_memory=True)
+
+        # Act
+        with profiler.span("allocate"):
+            data = [bytes(1024) for _ in range(1024)]
+        del data
+        report = profiler.report()
+        profiler.close()
+
+        # Assert
+        assert report["spans"][0]["tracemalloc_peak_bytes"] >= 1024 * 1024
+        assert report["peak_rss_bytes"] > 0
+
+    def test_null_profiler_records_nothing(self):
+        # Act
+        with NULL_PROFILER.span("phase"):
+            NULL_PROFILER.count("files_loaded")
+
+        # Assert
+        assert NULL_PROFILER.report()["spans"] == []
+        assert NULL_PROFILER.report()["counters"] == {}
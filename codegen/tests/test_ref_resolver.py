@@ -0,0 +1,163 @@
+import sys
+
+import yaml
+
+from src.loader import load_document
+from src.ref_resolver import RefResolver, scan_ref_files
+
+
+def write_yaml(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml.safe_dump(data), encoding="utf-8")
+
+
+class TestRefResolver:
+    def test_merge_sample(self):
+        # Act
+        resolver = RefResolver("tests/data/sample.yaml", "tests/data/schemas/")
+        openapi_spec = resolver.merge()
+
+        # Assert
+        schemas = openapi_spec["components"]["schemas"]
+        assert set(schemas) == {"user", "user_create", "user_update", "other", "other2"}
+        assert schemas["user_update"]["properties"]["created_by"] == {
+            "$ref": "#/components/schemas/user"
+        }
+        assert resolver.cycles == []
+
+    def test_follows_nested_refs_and_json_pointers(self, tmp_path):
+        # Arrange
+        write_yaml(
+            tmp_path / "api.yaml",
+            {
+                "openapi": "3.0.3",
+                "paths": {
+                    "/orders": {
+                        "get": {
+                            "responses": {
+                                "200": {
+                                    "content": {
+                                        "application/json": {
+                                            "schema": {"$ref": "schemas/order.yaml"}
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                },
+                "components": {"schemas": {"Local": {"type": "string"}}},
+            },
+        )
+        write_yaml(
+            tmp_path / "schemas" / "order.yaml",
+            {
+                "type": "object",
+                "properties": {
+                    "item": {"$ref": "common/defs.yaml#/definitions/Item"},
+                    "local": {"$ref": "../api.yaml#/components/schemas/Local"},
+                },
+            },
+        )
+        write_yaml(
+            tmp_path / "schemas" / "common" / "defs.yaml",
+            {
+                "definitions": {
+                    "Item": {
+                        "type": "object",
+                        "properties": {"price": {"$ref": "#/definitions/Price"}},
+                    },
+                    "Price": {"type": "number"},
+                }
+            },
+        )
+
+        # Act
+        openapi_spec = RefResolver(str(tmp_path / "api.yaml")).merge()
+
+        # Assert
+        schemas = openapi_spec["components"]["schemas"]
+        assert schemas["Local"] == {"type": "string"}
+        assert schemas["order"]["properties"]["item"] == {
+            "$ref": "#/components/schemas/Item"
+        }
+        assert schemas["Item"]["properties"]["price"] == {
+            "$ref": "#/components/schemas/Price"
+        }
+        assert schemas["Price"] == {"type": "number"}
+
+    def test_detects_cycles(self, tmp_path):
+        # Arrange
+        write_yaml(
+            tmp_path / "api.yaml",
+            {"paths": {"/a": {"$ref": "a.yaml"}}},
+        )
+        write_yaml(tmp_path / "a.yaml", {"properties": {"b": {"$ref": "b.yaml"}}})
+        write_yaml(tmp_path / "b.yaml", {"properties": {"a": {"$ref": "a.yaml"}}})
+
+        # Act
+        resolver = RefResolver(str(tmp_path / "api.yaml"))
+        openapi_spec = resolver.merge()
+
+        # Assert
+        assert len(resolver.cycles) == 1
+        assert sorted(resolver.names[target] for target in resolver.cycles[0]) == [
+            "a",
+            "b",
+        ]
+        assert set(openapi_spec["components"]["schemas"]) == {"a", "b"}
+
+    def test_deep_spec_does_not_hit_recursion_limit(self, tmp_path):
+        # Arrange
+        depth = 500
+        schema = '{"type": "array", "items": ' * depth + '{"$ref": "leaf.yaml"}'
+        schema += "}" * depth
+        api_file = tmp_path / "api.json"
+        api_file.write_text('{"paths": {"/deep": {"schema": %s}}}' % schema)
+        write_yaml(tmp_path / "leaf.yaml", {"type": "string"})
+        load_document(api_file)
+        load_document(tmp_path / "leaf.yaml")
+        recursion_limit = sys.getrecursionlimit()
+
+        # Act
+        sys.setrecursionlimit(200)
+        try:
+            openapi_spec = RefResolver(str(api_file)).merge()
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        # Assert
+        assert openapi_spec["components"]["schemas"] == {"leaf": {"type": "string"}}
+
+    def test_scan_ref_files_matches_resolver_files(self, tmp_path):
+        # Arrange
+        write_yaml(
+            tmp_path / "api.yaml",
+            {
+                "openapi": "3.0.0",
+                "paths": {},
+                "components": {
+                    "schemas": {"User": {"$ref": "schemas/user.yaml"}},
+                },
+            },
+        )
+        write_yaml(
+            tmp_path / "schemas" / "user.yaml",
+            {"properties": {"group": {"$ref": "./group.yaml#/definitions/Group"}}},
+        )
+        # 正規表現では読み取れない書き方の$ref(フロースタイルの複数行)
+        (tmp_path / "schemas" / "group.yaml").write_text(
+            'definitions:\n  Group: {"$ref":\n    "member.yaml"}\n', encoding="utf-8"
+        )
+        write_yaml(tmp_path / "schemas" / "member.yaml", {"type": "object"})
+        write_yaml(tmp_path / "models" / "extra.yaml", {"$ref": "../schemas/user.yaml"})
+
+        # Act
+        files = scan_ref_files(str(tmp_path / "api.yaml"), str(tmp_path / "models"))
+
+        # Assert
+        assert (
+            files
+            == RefResolver(str(tmp_path / "api.yaml"), str(tmp_path / "models")).files()
+        )
+        assert len(files) == 5
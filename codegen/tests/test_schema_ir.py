@@ -0,0 +1,92 @@
+import pytest
+
+from src.schema_ir import (
+    ColumnIR,
+    FieldIR,
+    ForeignKeyIR,
+    IndexIR,
+    ModelIR,
+    SchemaIR,
+    TableIR,
+    dump_schema,
+    dumps_schema,
+    load_schema,
+    loads_schema,
+)
+
+SCHEMA = SchemaIR(
+    tables=(
+        TableIR(
+            "post",
+            columns=(
+                ColumnIR("id", "bigint", nullable=False, primary_key=True),
+                ColumnIR("user_id", "int"),
+            ),
+            foreign_keys=(
+                ForeignKeyIR(("user_id",), "user", ("id",), ondelete="CASCADE"),
+            ),
+            indexes=(IndexIR(("user_id",), "ix_post_user_id"),),
+        ),
+    ),
+    models=(
+        ModelIR(
+            "Pet",
+            bases=("BaseModel",),
+            fields=(FieldIR("owner", "User | None", "None"),),
+            references=("User",),
+        ),
+    ),
+)
+
+
+class TestSchemaIR:
+    def test_hashable_and_immutable(self):
+        # Arrange
+        column = ColumnIR("id", "int")
+
+        # Act
+        same = ColumnIR("id", "int")
+
+        # Assert
+        assert column == same
+        assert {column, same} == {column}
+        assert column != ColumnIR("id", "bigint")
+        with pytest.raises(AttributeError):
+            column.name = "other"  # type: ignore[misc]
+
+    def test_dump_and_load(self, tmp_path):
+        # Arrange
+        path = str(tmp_path / "schema.ir")
+
+        # Act
+        dump_schema(SCHEMA, path)
+        schema = load_schema(path)
+
+        # Assert
+        assert schema == SCHEMA
+        assert schema.tables[0].foreign_keys[0].referred_columns == ("id",)
+        assert schema.models[0].fields[0] == FieldIR("owner", "User | None", "None")
+
+    def test_loads_unsupported_version(self):
+        # Arrange
+        data = bytearray(dumps_schema(SCHEMA))
+        data[5] += 1
+
+        # Act / Assert
+        with pytest.raises(ValueError):
+            loads_schema(bytes(data))
+        with pytest.raises(ValueError):
+            loads_schema(b"not a schema")
+
+    def test_loads_rejects_unexpected_values(self):
+        # Arrange
+        header = dumps_schema(SchemaIR())[:6]
+
+        # Act / Assert
+        for content in (
+            b"[[], [[1]]]",
+            b'[[[{"__class__": "x"}, [], [], [], []]], []]',
+            b"[[], []",
+        ):
+            with pytest.raises(ValueError):
+                loads_schema(header + content)
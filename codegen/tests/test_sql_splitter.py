@@ -0,0 +1,209 @@
+import os
+
+from src.sql_splitter import (
+    drop_table_names,
+    is_create_index,
+    is_create_table,
+    iter_schema_statements,
+    iter_sql_files,
+    iter_sql_statements,
+)
+
+SQL = """\
+-- header; comment
+CREATE TABLE a (
+    id INT, -- trailing; comment
+    note TEXT DEFAULT 'it''s; fine'
+);
+/* block
+   comment; */
+INSERT INTO a VALUES (1, "x;y"), (2, `z;`);
+CREATE FUNCTION f() RETURNS void AS $body$ BEGIN; END; $body$ LANGUAGE plpgsql;
+;
+-- only a comment;
+SELECT 1
+"""
+
+
+class TestIterSqlStatements:
+    def test_splits_statements(self):
+        # Act
+        statements = list(iter_sql_statements(SQL.splitlines(keepends=True)))
+
+        # Assert
+        assert len(statements) == 4
+        assert statements[0].startswith("-- header; comment\nCREATE TABLE a (")
+        assert statements[0].endswith("note TEXT DEFAULT 'it''s; fine'\n)")
+        assert statements[1].startswith("/* block")
+        assert statements[1].endswith("(2, `z;`)")
+        assert statements[2].endswith("$body$ LANGUAGE plpgsql")
+        # 空の文は返さず、コメント中のセミコロンは区切りとしない
+        assert statements[3] == "-- only a comment;\nSELECT 1"
+
+    def test_mysql_escapes(self):
+        # Arrange
+        sql = "# comment;\nINSERT INTO a VALUES ('a\\';b');\nSELECT 2;\n"
+
+        # Act
+        statements = list(
+            iter_sql_statements(
+                sql.splitlines(keepends=True),
+                hash_comments=True,
+                backslash_escapes=True,
+            )
+        )
+
+        # Assert
+        assert statements == [
+            "# comment;\nINSERT INTO a VALUES ('a\\';b')",
+            "SELECT 2",
+        ]
+
+
+class TestIterSchemaStatements:
+    def test_schema_statements_only(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(
+            SQL
+            + ";\ncreate unique index i on a (id);\n"
+            + "ALTER TABLE ONLY a ADD CONSTRAINT a_pkey PRIMARY KEY (id);\n"
+        )
+
+        # Act
+        statements = list(iter_schema_statements(str(sql_file)))
+
+        # Assert
+        # 先頭のコメントと末尾のセミコロンは含めない
+        assert statements == [
+            "CREATE TABLE a (\n"
+            "    id INT, -- trailing; comment\n"
+            "    note TEXT DEFAULT 'it''s; fine'\n"
+            ")",
+            "create unique index i on a (id)",
+            "ALTER TABLE ONLY a ADD CONSTRAINT a_pkey PRIMARY KEY (id)",
+        ]
+
+    def test_skips_copy_data(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "dump.sql"
+        sql_file.write_text(
+            "COPY public.a (id, note) FROM stdin;\n"
+            "1\tit's; CREATE TABLE b (id INT);\n"
+            "\\.\n"
+            "CREATE TABLE c (id INT);\n"
+        )
+
+        # Act
+        statements = list(iter_schema_statements(str(sql_file)))
+
+        # Assert
+        assert statements == ["CREATE TABLE c (id INT)"]
+
+    def test_mysql_escapes(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "dump.sql"
+        sql_file.write_bytes(
+            b"# comment; CREATE TABLE x (id INT);\n"
+            b"INSERT INTO a VALUES ('a\\';CREATE TABLE y (id INT);', '\xff');\n"
+            b"CREATE TABLE b (id INT);\n"
+        )
+
+        # Act
+        statements = list(
+            iter_schema_statements(
+                str(sql_file), hash_comments=True, backslash_escapes=True
+            )
+        )
+
+        # Assert
+        # データの文はデコードしないため、UTF-8でないバイト列を含んでもよい
+        assert statements == ["CREATE TABLE b (id INT)"]
+
+    def test_same_as_iter_sql_statements(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql = SQL + ";\nCREATE TABLE b (note TEXT DEFAULT '; unterminated);\n"
+        sql_file.write_text(sql)
+
+        # Act
+        statements = list(iter_schema_statements(str(sql_file)))
+
+        # Assert
+        expected = [
+            statement
+            for statement in iter_sql_statements(sql.splitlines(keepends=True))
+            if is_create_table(statement)
+        ]
+        assert len(statements) == len(expected) == 2
+        assert expected[0].endswith(statements[0])
+        # 閉じていない引用符はファイルの末尾までを1つの文とする
+        assert statements[1] == expected[1]
+
+    def test_empty_file(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "empty.sql"
+        sql_file.write_text("")
+
+        # Act & Assert
+        assert list(iter_schema_statements(str(sql_file))) == []
+
+
+class TestIsCreateTable:
+    def test_is_create_table(self):
+        # Assert
+        assert is_create_table("-- c\n/* d */ create temporary table a (id int)")
+        assert is_create_table("CREATE TABLE IF NOT EXISTS a (id INT)")
+        assert not is_create_table("CREATE INDEX i ON a (id)")
+        assert not is_create_table("INSERT INTO a VALUES ('CREATE TABLE')")
+
+
+class TestIsCreateIndex:
+    def test_is_create_index(self):
+        # Assert
+        assert is_create_index("/* i */ create unique index i on a (id)")
+        assert is_create_index("CREATE INDEX CONCURRENTLY i ON a (id)")
+        assert not is_create_index("CREATE TABLE a (id INT, INDEX i (id))")
+        assert not is_create_index("CREATE INDEXES")
+
+
+class TestIterSqlFiles:
+    def test_directory(self, tmp_path):
+        # Arrange
+        (tmp_path / "b").mkdir()
+        (tmp_path / "b" / "2.sql").write_text("")
+        (tmp_path / "1.sql").write_text("")
+        (tmp_path / "note.txt").write_text("")
+
+        # Act
+        files = iter_sql_files(str(tmp_path))
+
+        # Assert
+        assert files == [str(tmp_path / "1.sql"), str(tmp_path / "b" / "2.sql")]
+        assert iter_sql_files(str(tmp_path / "1.sql")) == [str(tmp_path / "1.sql")]
+
+    def test_natural_order(self, tmp_path):
+        # Arrange
+        for name in ["V10__c.sql", "V2__b.sql", "V1__a.sql"]:
+            (tmp_path / name).write_text("")
+
+        # Act
+        files = iter_sql_files(str(tmp_path), natural=True)
+
+        # Assert
+        assert [os.path.basename(file) for file in files] == [
+            "V1__a.sql",
+            "V2__b.sql",
+            "V10__c.sql",
+        ]
+
+
+class TestDropTableNames:
+    def test_drop_table_names(self):
+        # Assert
+        assert drop_table_names('DROP TABLE IF EXISTS public."a", `b` CASCADE') == [
+            "a",
+            "b",
+        ]
+        assert drop_table_names("-- c\ndrop temporary table c") == ["c"]
+        assert drop_table_names("DROP INDEX i") is None
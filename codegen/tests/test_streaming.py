@@ -0,0 +1,176 @@
+import os
+
+from src.code_generator import CodeGenerator
+from src.streaming import StreamingSplitter, iter_top_level_statements, split_stream
+
+SOURCE = '''# generated by datamodel-codegen:
+#   filename:  sample.yaml
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class User(BaseModel):
+    id: str
+    profile: Optional[Profile] = Field(
+        None,
+        description="""
+# not a comment
+""",
+    )
+
+# trailing comment
+
+
+@dataclass
+class Profile(BaseModel):
+    name: str
+
+
+User.model_rebuild()
+'''
+
+
+def _render(class_source):
+    return class_source.name, (
+        class_source.source,
+        [ast_node.names[0].name for ast_node in class_source.imports],
+        class_source.dependencies,
+        class_source.cyclic_dependencies,
+    )
+
+
+class TestIterTopLevelStatements:
+    def test_splits_statements(self):
+        # Act
+        statements = list(iter_top_level_statements(SOURCE.splitlines(keepends=True)))
+
+        # Assert
+        assert statements[0] == "from __future__ import annotations"
+        assert statements[4].startswith("class User(BaseModel):\n")
+        assert statements[4].endswith('""",\n    )')
+        assert statements[5] == "@dataclass\nclass Profile(BaseModel):\n    name: str"
+        assert statements[6] == "User.model_rebuild()"
+        assert len(statements) == 7
+
+
+class TestStreamingSplitter:
+    def test_waits_for_forward_references(self):
+        # Act
+        files = dict(split_stream(SOURCE.splitlines(keepends=True), _render))
+
+        # Assert
+        assert list(files) == ["Profile", "User"]
+        assert files["User"][1] == ["Optional", "BaseModel"]
+        assert files["User"][2] == ["Profile"]
+        assert files["Profile"][1] == ["dataclass", "BaseModel"]
+        assert files["Profile"][2] == []
+
+    def test_memory_is_bounded_by_pending_classes(self):
+        # Arrange
+        def lines():
+            yield "from pydantic import BaseModel\n"
+            for index in range(2000):
+                yield f"class Model{index}(BaseModel):\n"
+                if index:
+                    yield f"    previous: Model{index - 1}\n"
+                yield "    value: int\n"
+
+        splitter = StreamingSplitter(_render)
+        max_pending = 0
+
+        # Act
+        emitted = 0
+        for statement in iter_top_level_statements(lines()):
+            emitted += len(list(splitter.feed(statement)))
+            max_pending = max(max_pending, len(splitter._pending))
+        emitted += len(list(splitter.finish()))
+
+        # Assert
+        assert emitted == 2000
+        assert max_pending <= 1
+
+    def test_forward_references_are_released_in_dependency_order(self):
+        # Arrange
+        def lines():
+            yield "from pydantic import BaseModel\n"
+            for index in range(1000):
+                yield f"class Model{index}(BaseModel):\n"
+                if index < 999:
+                    yield f"    next: Model{index + 1} | None = None\n"
+                yield "    value: int\n"
+
+        # Act
+        files = list(split_stream(lines(), _render))
+
+        # Assert
+        assert [name for name, _ in files] == [
+            f"Model{index}" for index in reversed(range(1000))
+        ]
+        assert files[-1][1][2:] == (["Model1"], [])
+
+    def test_cyclic_dependencies(self):
+        # Arrange
+        source = """from pydantic import BaseModel
+
+
+class Group(BaseModel):
+    members: list[Member]
+    owner: Owner
+
+
+class Member(BaseModel):
+    group: Group
+
+
+class Owner(BaseModel):
+    name: str
+"""
+        splitter = StreamingSplitter(_render)
+
+        # Act
+        emitted = []
+        for statement in iter_top_level_statements(source.splitlines(keepends=True)):
+            emitted.append([name for name, _ in splitter.feed(statement)])
+        emitted.append([name for name, _ in splitter.finish()])
+
+        # Assert
+        # Ownerが確定するまでは、Group・Memberの循環が閉じているか判定できない
+        assert emitted == [[], [], [], ["Owner", "Member", "Group"], []]
+        files = dict(split_stream(source.splitlines(keepends=True), _render))
+        assert files["Group"][2:] == (["Member", "Owner"], ["Member"])
+        assert files["Member"][2:] == (["Group"], ["Group"])
+        assert files["Owner"][2:] == ([], [])
+
+
+class TestCodeGeneratorStreaming:
+    def test_matches_non_streaming_output(self, tmp_path):
+        # Arrange
+        parameters = ["--use-union-operator", "--use-double-quotes"]
+        outputs = {}
+
+        # Act
+        for engine in ("inprocess", "subprocess"):
+            for streaming in (False, True):
+                output_dir = "tests/data/sample_dir/"
+                generator = CodeGenerator(
+                    openapi_file_path="tests/data/sample.yaml",
+                    output_dir=output_dir,
+                    parameters=parameters,
+                    include_models_dir="tests/data/schemas/",
+                    engine=engine,
+                    streaming=streaming,
+                )
+                outputs[(engine, streaming)] = generator.render()
+                report = generator.execute()
+                assert report.removed == []
+
+        # Assert
+        assert outputs[("inprocess", True)] == outputs[("inprocess", False)]
+        assert outputs[("subprocess", True)] == outputs[("subprocess", False)]
+        assert len(outputs[("subprocess", True)]) == 5
+        assert not os.path.exists("tests/data/sample_dir/temporary_model.py")
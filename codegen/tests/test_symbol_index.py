@@ -0,0 +1,146 @@
+import ast
+import time
+
+from src.symbol_index import SymbolIndex
+
+SOURCE_CODE = """\
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class Address(BaseModel):
+    city: str | None = None
+
+
+class Tag(BaseModel):
+    name: Literal["Address"]
+
+
+class User(BaseModel):
+    addresses: list[Address] = Field(default_factory=list)
+    tags: dict[str, Tag] | None = None
+    created_at: datetime | None = None
+
+
+class Group(BaseModel):
+    owner: "User"
+    default_tag: Tag = Field(default_factory=lambda: Tag(name="Address"))
+"""
+
+
+class TestSymbolIndex:
+    def test_class_dependencies(self):
+        # Act
+        index = SymbolIndex(SOURCE_CODE)
+
+        # Assert
+        assert [node.name for node in index.classes] == [
+            "Address",
+            "Tag",
+            "User",
+            "Group",
+        ]
+        assert index.class_dependencies == {
+            "Address": [],
+            "Tag": [],
+            "User": ["Address", "Tag"],
+            "Group": ["Tag", "User"],
+        }
+        assert index.dependents["Tag"] == {"User", "Group"}
+        assert index.dependents["Address"] == {"User"}
+
+    def test_cyclic_dependencies(self):
+        # Arrange
+        source_code = """\
+from pydantic import BaseModel, Field
+
+
+class Group(BaseModel):
+    members: list[Member]
+    owner: Owner
+
+
+class Member(BaseModel):
+    group: Group | None = None
+    tags: list[Tag] = Field(default_factory=lambda: [Tag()])
+
+
+class Tag(BaseModel):
+    name: str = ""
+
+
+class Owner(BaseModel):
+    name: str
+"""
+        index = SymbolIndex(source_code)
+        classes = {node.name: node for node in index.classes}
+
+        # Act
+        group = index.class_source(classes["Group"])
+        member = index.class_source(classes["Member"])
+        owner = index.class_source(classes["Owner"])
+
+        # Assert
+        assert index.components["Group"] == {"Group", "Member"}
+        assert group.dependencies == ["Member", "Owner"]
+        assert group.cyclic_dependencies == ["Member"]
+        assert member.cyclic_dependencies == ["Group"]
+        # 型ヒントのみの参照は、実行時の参照に含めない
+        assert "Group" not in member.runtime_references
+        assert {"BaseModel", "Field", "Tag"} <= member.runtime_references
+        assert owner.cyclic_dependencies == []
+
+    def test_imports_for(self):
+        # Arrange
+        index = SymbolIndex(SOURCE_CODE)
+
+        # Act
+        imports = [ast.unparse(node) for node in index.imports_for("User")]
+
+        # Assert
+        assert imports == [
+            "from datetime import datetime",
+            "from pydantic import BaseModel, Field",
+        ]
+        assert [ast.unparse(node) for node in index.imports_for("Tag")] == [
+            "from typing import Literal",
+            "from pydantic import BaseModel",
+        ]
+
+    def test_source_segment(self):
+        # Arrange
+        index = SymbolIndex(SOURCE_CODE)
+
+        # Act
+        segment = index.source_segment(index.classes[0])
+
+        # Assert
+        assert segment == ast.get_source_segment(SOURCE_CODE, index.classes[0])
+
+    def test_large_source(self):
+        # Arrange
+        header = "from pydantic import BaseModel, Field\n\n\n"
+        classes = [
+            f"class Model{i}(BaseModel):\n"
+            f"    name: str | None = None\n"
+            f"    items: list[Model{max(i - 1, 0)}] = Field(default_factory=list)\n"
+            for i in range(3000)
+        ]
+        source_code = header + "\n\n".join(classes)
+
+        # Act
+        started = time.perf_counter()
+        index = SymbolIndex(source_code)
+        for class_node in index.classes:
+            index.imports_for(class_node.name)
+            index.source_segment(class_node)
+        elapsed = time.perf_counter() - started
+
+        # Assert
+        assert len(index.classes) == 3000
+        assert index.class_dependencies["Model10"] == ["Model9"]
+        assert elapsed < 1.0
@@ -0,0 +1,40 @@
+from src.templates import (
+    ENTITY_TEMPLATE_NAME,
+    get_environment,
+    render_templates,
+    template_sources,
+)
+
+
+class TestTemplates:
+    def test_environment_is_shared(self, tmp_path):
+        # Act
+        environment = get_environment(None, str(tmp_path / "bytecode"))
+
+        # Assert
+        assert get_environment(None, str(tmp_path / "bytecode")) is environment
+        assert environment.get_template(ENTITY_TEMPLATE_NAME) is (
+            environment.get_template(ENTITY_TEMPLATE_NAME)
+        )
+
+    def test_render_user_template(self, tmp_path):
+        # Arrange
+        (tmp_path / ENTITY_TEMPLATE_NAME).write_text("{{ class_name }}\n")
+
+        # Act
+        rendered = render_templates(
+            ENTITY_TEMPLATE_NAME,
+            [("a.py", {"class_name": "A"}), ("b.py", {"class_name": "B"})],
+            template_dir=str(tmp_path),
+        )
+
+        # Assert
+        assert [(name, content) for name, content, _ in rendered] == [
+            ("a.py", "A\n"),
+            ("b.py", "B\n"),
+        ]
+        assert template_sources(str(tmp_path)) == [
+            ENTITY_TEMPLATE_NAME,
+            "{{ class_name }}\n",
+        ]
+        assert template_sources(None) == []
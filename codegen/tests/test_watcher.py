@@ -0,0 +1,286 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.watcher import (
+    EntityWatchJob,
+    GenerationWatcher,
+    InotifyWatcher,
+    ModelWatchJob,
+    PollingWatcher,
+    WatchJob,
+)
+
+SQL = """CREATE TABLE user (
+    id VARCHAR(40) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE post (
+    id VARCHAR(40) PRIMARY KEY,
+    title TEXT NOT NULL
+);
+"""
+
+
+def _touch(path, content):
+    path.write_text(content)
+    # mtimeの分解能が粗いファイルシステムでも変更を検出できるようにする
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestFileWatchers:
+    def test_polling_watcher_detects_changes(self, tmp_path):
+        # Arrange
+        target = tmp_path / "a.yaml"
+        target.write_text("a: 1")
+        watcher = PollingWatcher(interval=0.01)
+        watcher.set_directories({str(tmp_path)})
+
+        # Act
+        unchanged = watcher.read(timeout=0.01)
+        _touch(target, "a: 2")
+        (tmp_path / "b.yaml").write_text("b: 1")
+        changed = watcher.read(timeout=0.01)
+
+        # Assert
+        assert unchanged == set()
+        assert changed == {str(target), str(tmp_path / "b.yaml")}
+
+    def test_inotify_watcher_detects_changes(self, tmp_path):
+        # Arrange
+        target = tmp_path / "a.yaml"
+        target.write_text("a: 1")
+        watcher = InotifyWatcher()
+        watcher.set_directories({str(tmp_path)})
+
+        # Act
+        target.write_text("a: 2")
+        changed = watcher.read(timeout=1.0)
+        watcher.close()
+
+        # Assert
+        assert changed == {str(target)}
+
+
+class TestGenerationWatcher:
+    def test_regenerates_only_changed_files(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(SQL)
+        output_dir = tmp_path / "entities"
+        job = EntityWatchJob(str(sql_file), str(output_dir), "sqlite")
+        watcher = GenerationWatcher(
+            [job], debounce=0.01, use_polling=True, poll_interval=0.01
+        )
+
+        # Act
+        initial = watcher.generate_all()
+        _touch(sql_file, SQL.replace("title TEXT NOT NULL", "title TEXT NULL"))
+        results = watcher.poll(timeout=0.01)
+        watcher.close()
+
+        # Assert
+        assert initial[0].written == [
+            "base_entity.py",
+            "post_entity.py",
+            "user_entity.py",
+        ]
+        assert len(results) == 1
+        assert results[0].error is None
+        assert results[0].written == ["post_entity.py"]
+        assert "nullable=True" in (output_dir / "post_entity.py").read_text()
+
+    def test_unaffected_jobs_are_skipped(self, tmp_path):
+        # Arrange
+        class CountingJob(WatchJob):
+            def __init__(self, output_dir, file):
+                super().__init__(output_dir)
+                self.files = {file}
+                self.count = 0
+
+            def render(self):
+                self.count += 1
+                return {"out.py": str(self.count)}
+
+        first = tmp_path / "first.yaml"
+        second = tmp_path / "second.yaml"
+        first.write_text("a: 1")
+        second.write_text("b: 1")
+        first_job = CountingJob(str(tmp_path / "first_out"), str(first))
+        second_job = CountingJob(str(tmp_path / "second_out"), str(second))
+        watcher = GenerationWatcher(
+            [first_job, second_job], debounce=0.01, use_polling=True, poll_interval=0.01
+        )
+        watcher.generate_all()
+
+        # Act
+        _touch(first, "a: 2")
+        results = watcher.poll(timeout=0.01)
+        watcher.close()
+
+        # Assert
+        assert [result.job for result in results] == [first_job]
+        assert (first_job.count, second_job.count) == (2, 1)
+
+    def test_render_error_keeps_previous_output(self, tmp_path):
+        # Arrange
+        class FailingJob(WatchJob):
+            def render(self):
+                raise ValueError("invalid input")
+
+        job = FailingJob(str(tmp_path))
+        job.rendered = {"out.py": "previous"}
+        watcher = GenerationWatcher([job], use_polling=True)
+
+        # Act
+        start = time.perf_counter()
+        results = watcher.generate_all()
+        watcher.close()
+
+        # Assert
+        assert isinstance(results[0].error, ValueError)
+        assert job.rendered == {"out.py": "previous"}
+        assert time.perf_counter() - start < 1.0
+
+    def test_model_job_tracks_referenced_files(self, tmp_path):
+        # Arrange
+        job = ModelWatchJob(
+            openapi_file_path="tests/data/sample.yaml",
+            output_dir=str(tmp_path),
+            parameters=["--use-union-operator", "--use-double-quotes"],
+            include_models_dir="tests/data/schemas/",
+        )
+
+        # Act
+        files = job.render()
+        inner_file = os.path.abspath("tests/data/schemas/inner/new_model.yaml")
+
+        # Assert
+        assert len(files) == 5
+        assert os.path.abspath("tests/data/schemas/user.yaml") in job.files
+        assert job.is_affected({inner_file})
+        assert not job.is_affected({os.path.abspath("tests/data/schemas/notes.txt")})
+
+    def test_entity_job_with_directory(self, tmp_path):
+        # Arrange
+        sql_dir = tmp_path / "sql"
+        sql_dir.mkdir()
+        (sql_dir / "schema.sql").write_text(SQL)
+        job = EntityWatchJob(str(sql_dir), str(tmp_path / "entities"), "sqlite")
+
+        # Act
+        files = job.render()
+
+        # Assert
+        assert "post_entity.py" in files
+        assert str(sql_dir) in job.watched_directories()
+        assert job.is_affected({str(sql_dir / "new.sql")})
+        assert not job.is_affected({str(sql_dir / "notes.txt")})
+
+    def test_removed_table_is_deleted_with_delete_stale(self, tmp_path):
+        # Arrange
+        sql_file = tmp_path / "schema.sql"
+        sql_file.write_text(SQL)
+        output_dir = tmp_path / "entities"
+        job = EntityWatchJob(str(sql_file), str(output_dir), "sqlite")
+        watcher = GenerationWatcher(
+            [job],
+            debounce=0.01,
+            use_polling=True,
+            poll_interval=0.01,
+            delete_stale=True,
+        )
+        watcher.generate_all()
+
+        # Act
+        _touch(sql_file, SQL[: SQL.index("CREATE TABLE post")])
+        results = watcher.poll(timeout=0.01)
+        _touch(sql_file, SQL.replace("name VARCHAR(100)", "name VARCHAR(200)"))
+        restored = watcher.poll(timeout=0.01)
+        watcher.close()
+
+        # Assert
+        assert results[0].written == []
+        assert results[0].removed == ["post_entity.py"]
+        assert restored[0].written == ["post_entity.py", "user_entity.py"]
+        assert restored[0].removed == []
+        assert sorted(path.name for path in output_dir.glob("*.py")) == [
+            "base_entity.py",
+            "post_entity.py",
+            "user_entity.py",
+        ]
+
+    def test_model_job_renders_only_changed_classes(self, tmp_path, monkeypatch):
+        # Arrange
+        from src.code_generator import CodeGenerator
+
+        rendered_names = []
+        render_models = CodeGenerator.render_models
+
+        def recording_render_models(self, names, models_dir):
+            names = list(names)
+            rendered_names.append(sorted(names))
+            return render_models(self, names, models_dir)
+
+        monkeypatch.setattr(CodeGenerator, "render_models", recording_render_models)
+        job = ModelWatchJob(
+            openapi_file_path="tests/data/sample.yaml",
+            output_dir=str(tmp_path),
+            parameters=["--use-union-operator", "--use-double-quotes"],
+            include_models_dir="tests/data/schemas/",
+        )
+
+        # Act
+        initial = job.render()
+        files = job.render()
+
+        # Assert
+        assert files == initial
+        assert len(rendered_names[0]) == 5
+        assert rendered_names[1] == []
+
+    def test_model_job_in_background_thread(self, tmp_path):
+        # Arrange
+        # datamodel-codegenのCLIが未importの状態で、監視をスレッドで実行する
+        script = """
+import sys
+import threading
+
+from src.watcher import GenerationWatcher, ModelWatchJob
+
+job = ModelWatchJob(
+    openapi_file_path="tests/data/sample.yaml",
+    output_dir=sys.argv[1],
+    parameters=["--use-union-operator"],
+    include_models_dir="tests/data/schemas/",
+)
+watcher = GenerationWatcher([job], use_polling=True)
+results = []
+thread = threading.Thread(target=lambda: results.extend(watcher.generate_all()))
+thread.start()
+thread.join()
+watcher.close()
+assert results[0].error is None, results
+"""
+
+        # Act
+        result = subprocess.run(
+            [sys.executable, "-c", script, str(tmp_path / "models")],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert (tmp_path / "models" / "user.py").exists()
+
+    def test_watch_job_requires_render(self, tmp_path):
+        # Act / Assert
+        with pytest.raises(TypeError):
+            WatchJob(str(tmp_path))